@@ -0,0 +1,81 @@
+import sys
+import time
+import numpy as np
+from utils.geodetic import cartographic_to_cartesian
+from utils.pnts import encode_pnts
+from utils.glb import encode_glb, meshoptimizer
+from utils.draco import encode_draco_pnts, DracoPy
+
+# ------ Benchmark: tile encoders on a radar curtain --------------------
+# usage: python -m benchmarks.bench_draco [no. of profiles] [range gates]  (from the repo root)
+# a synthetic nadir curtain (profiles along a 600 km track, gates from  -
+# 0 to 20 km) encoded as one tile: plain .pnts, glb and Draco .pnts     -
+# with several quantization bits and compression levels                 -
+# ---------------------------------------------------------------------
+
+
+def curtain(profiles=4000, gates=500):
+    """lon/lat/alt/value/time of a radar curtain, value smooth along track and height"""
+    track = np.linspace(0, 1, profiles)
+    lon = np.repeat(-80.0 + 4.0 * track, gates)
+    lat = np.repeat(30.0 + 3.0 * track + 0.2 * np.sin(8 * np.pi * track), gates)
+    alt = np.tile(np.linspace(0, 20000, gates), profiles)
+    time = np.repeat(np.arange(profiles, dtype=np.float64) * 0.5, gates)
+    value = (30 * np.sin(alt / 3000.0) * np.cos(lon * 5) + np.random.normal(0, 2, lon.size)).astype(np.float32)
+    return lon, lat, alt, value, time
+
+
+def tile_arrays(lon, lat, alt, value, time):
+    """the feature/batch arrays PointCloud.encode writes for one tile"""
+    cartesian, offset, scale, cartographic, region = cartographic_to_cartesian(lon, lat, alt)
+    length = lon.size
+    feature_table = {
+        "POINTS_LENGTH": length,
+        "BATCH_LENGTH": length,
+        "QUANTIZED_VOLUME_OFFSET": offset,
+        "QUANTIZED_VOLUME_SCALE": scale
+    }
+    feature_arrays = [
+        ("BATCH_ID", np.arange(length, dtype=np.uint32), {"componentType": "UNSIGNED_INT"}),
+        ("POSITION_QUANTIZED", cartesian, {})
+    ]
+    batch_arrays = [
+        ("value", value, {"componentType": "FLOAT", "type": "SCALAR"}),
+        ("time", time, {"componentType": "FLOAT", "type": "SCALAR"}),
+        ("location", cartographic, {"componentType": "SHORT", "type": "VEC3"})
+    ]
+    return feature_table, feature_arrays, batch_arrays
+
+
+def main(profiles=4000, gates=500):
+    feature_table, feature_arrays, batch_arrays = tile_arrays(*curtain(profiles, gates))
+    args = (feature_table, feature_arrays, {}, batch_arrays)
+
+    cases = [("pnts", lambda: encode_pnts(*args))]
+    if (meshoptimizer is not None):
+        cases.append(("glb meshopt", lambda: encode_glb(*args)))
+    cases.append(("glb", lambda: encode_glb(*args, meshopt=False)))
+    if (DracoPy is not None):
+        for bits, level in [(16, 7), (14, 7), (12, 7), (16, 1), (16, 10)]:
+            cases.append(("draco {}b L{}".format(bits, level),
+                          lambda bits=bits, level=level: encode_draco_pnts(*args, bits={"POSITION": bits}, level=level)))
+        quantized = {"POSITION": 14, "value": 10, "time": 16}
+        cases.append(("draco 14/10/16b L7", lambda: encode_draco_pnts(*args, bits=quantized)))
+    else:
+        print("DracoPy not installed, skipping the Draco cases")
+
+    print("{} points".format(feature_table["POINTS_LENGTH"]))
+    print("{:>20} {:>10} {:>12} {:>10} {:>8}".format("case", "seconds", "bytes", "bytes/pt", "ratio"))
+    base = None
+    for name, function in cases:
+        start = time.perf_counter()
+        size = len(function())
+        seconds = time.perf_counter() - start
+        base = base or size
+        print("{:>20} {:>10.3f} {:>12} {:>10.2f} {:>8.2f}".format(name, seconds, size,
+                                                                   size / feature_table["POINTS_LENGTH"],
+                                                                   base / size))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
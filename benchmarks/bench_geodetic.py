@@ -0,0 +1,125 @@
+import sys
+import time
+import numpy as np
+from utils.geodetic import cartographic_to_cartesian, numba
+
+# ------ Micro-benchmark: geodetic -> quantized ECEF --------------------
+# usage: python -m benchmarks.bench_geodetic [no. of points] [repeats]  (from the repo root)
+# compares the kernel against the implementation it replaced
+# ---------------------------------------------------------------------
+
+to_rad = np.pi / 180.0
+
+
+def reference(lon, lat, alt):
+    """the copy-pasted implementation from tileset.py/pcloud_subs.py/*_subcode.py"""
+    size = lon.size
+
+    cartographic = np.zeros(shape=(size, 3), dtype=np.int16)
+    cartographic[:, 0] = (lon * 32767 / 180).astype(np.int16)
+    cartographic[:, 1] = (lat * 32767 / 180).astype(np.int16)
+    cartographic[:, 2] = (alt / 10).astype(np.int16)
+
+    lon = lon * to_rad
+    lat = lat * to_rad
+
+    radiiSquared = np.array([40680631590769, 40680631590769, 40408299984661.445], dtype=np.float64)
+
+    N1 = np.multiply(np.cos(lat), np.cos(lon))
+    N2 = np.multiply(np.cos(lat), np.sin(lon))
+    N3 = np.sin(lat)
+
+    magnitude = np.sqrt(np.square(N1) + np.square(N2) + np.square(N3))
+
+    N1 = N1 / magnitude
+    N2 = N2 / magnitude
+    N3 = N3 / magnitude
+
+    K1 = radiiSquared[0] * N1
+    K2 = radiiSquared[1] * N2
+    K3 = radiiSquared[2] * N3
+
+    gamma = np.sqrt(np.multiply(N1, K1) + np.multiply(N2, K2) + np.multiply(N3, K3))
+
+    K1 = K1 / gamma
+    K2 = K2 / gamma
+    K3 = K3 / gamma
+
+    N1 = np.multiply(N1, alt)
+    N2 = np.multiply(N2, alt)
+    N3 = np.multiply(N3, alt)
+
+    x = N1 + K1
+    y = N2 + K2
+    z = N3 + K3
+
+    offset = [float(np.min(x)), float(np.min(y)), float(np.min(z))]
+
+    x = x - offset[0]
+    y = y - offset[1]
+    z = z - offset[2]
+
+    scale = [float(abs(np.max(x))), float(abs(np.max(y))), float(abs(np.max(z)))]
+
+    cartesian = np.zeros(shape=(size, 3), dtype=np.uint16)
+    cartesian[:, 0] = (x / scale[0] * 65535.0).astype(np.uint16)
+    cartesian[:, 1] = (y / scale[1] * 65535.0).astype(np.uint16)
+    cartesian[:, 2] = (z / scale[2] * 65535.0).astype(np.uint16)
+
+    region = [
+        float(np.min(lon)),
+        float(np.min(lat)),
+        float(np.max(lon)),
+        float(np.max(lat)),
+        float(np.min(alt)),
+        float(np.max(alt))
+    ]
+
+    return cartesian, offset, scale, cartographic, region
+
+
+def timeit(function, repeats):
+    function()  # <--warm up (and JIT compile)
+    start = time.perf_counter()
+    for i in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats
+
+
+def main(size=1000000, repeats=5):
+    lon = np.random.uniform(-125, -65, size)
+    lat = np.random.uniform(25, 50, size)
+    alt = np.random.uniform(0, 20000, size)
+
+    cartesian = np.empty(shape=(size, 3), dtype=np.uint16)
+    cartographic = np.empty(shape=(size, 3), dtype=np.int16)
+    work = np.empty(shape=(3, size), dtype=np.float64)
+    work32 = np.empty(shape=(3, size), dtype=np.float32)
+
+    cases = [
+        ("reference", lambda: reference(lon, lat, alt)),
+        ("numpy float64", lambda: cartographic_to_cartesian(lon, lat, alt, jit=False)),
+        ("numpy float64 out=", lambda: cartographic_to_cartesian(lon, lat, alt, jit=False, cartesian=cartesian,
+                                                                 cartographic=cartographic, work=work)),
+        ("numpy float32 out=", lambda: cartographic_to_cartesian(lon, lat, alt, np.float32, jit=False,
+                                                                 cartesian=cartesian, cartographic=cartographic,
+                                                                 work=work32)),
+    ]
+    if (numba is not None):
+        cases.append(("numba float64 out=", lambda: cartographic_to_cartesian(lon, lat, alt, cartesian=cartesian,
+                                                                             cartographic=cartographic, work=work)))
+    else:
+        print("numba not installed, skipping the JIT kernel")
+
+    expected = reference(lon, lat, alt)[0]
+    print("{:>20} {:>12} {:>8} {:>10}".format("case", "Mpoints/s", "speedup", "max diff"))
+    base = None
+    for name, function in cases:
+        seconds = timeit(function, repeats)
+        base = base or seconds
+        diff = int(np.abs(function()[0].astype(np.int32) - expected).max())  # <--in uint16 quantization steps
+        print("{:>20} {:>12.2f} {:>8.2f} {:>10}".format(name, size / seconds / 1e6, base / seconds, diff))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
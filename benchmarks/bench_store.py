@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+from utils.store import write_store, open_store
+
+# ------ Benchmark: ingest zarr store options ---------------------------
+# usage: python -m benchmarks.bench_store [scale]  (from the repo root)
+# synthetic CRS/CPL curtains and an NPOL volume scan (sizes times scale) -
+# written with write_store under several codec, chunk and shard options -
+# reports write and read time, size on disk and no. of files            -
+# ---------------------------------------------------------------------
+
+
+def curtain(profiles, gates, top, seconds=1.0):
+    """lon/lat/alt/value/time of a nadir curtain along a track, one profile every `seconds`"""
+    track = np.linspace(0, 1, profiles)
+    lon = np.repeat(-124.0 + 3.0 * track, gates)
+    lat = np.repeat(46.0 + 2.0 * track + 0.1 * np.sin(8 * np.pi * track), gates)
+    alt = np.tile(np.linspace(top, 0, gates), profiles)
+    time = np.repeat(1447000000 + (np.arange(profiles) * seconds).astype(np.int64), gates)
+    value = 30 * np.sin(alt / 3000.0) * np.cos(lon * 5) + np.random.normal(0, 2, lon.size)
+    value[alt < top / 20] = np.nan  # <--surface clutter
+    return lon, lat, alt, value, time
+
+
+def volume(rays, elevations, gates):
+    """lon/lat/alt/value/time of a radar volume scan, one ray per 0.1 s"""
+    azimuth = np.repeat(np.tile(np.linspace(0, 2 * np.pi, rays, endpoint=False), elevations), gates)
+    elevation = np.repeat(np.radians(np.linspace(0.5, 20, elevations)), rays * gates)
+    distance = np.tile(np.linspace(1000, 150000, gates), rays * elevations)
+    lon = -124.21 + distance * np.cos(elevation) * np.sin(azimuth) / (111000 * np.cos(np.radians(47.28)))
+    lat = 47.28 + distance * np.cos(elevation) * np.cos(azimuth) / 111000
+    alt = distance * np.sin(elevation)
+    time = np.repeat(1447000000 + np.arange(rays * elevations) // 10, gates).astype(np.int64)
+    value = 40 * np.exp(-alt / 4000.0) * np.cos(azimuth * 3) ** 2 + np.random.normal(0, 1.5, lon.size)
+    return lon, lat, alt, value, time
+
+
+def shapes(scale=1.0):
+    """name to the points of a representative store of each instrument"""
+    return {
+        "CRS": curtain(int(12000 * scale), 500, 15000),
+        "CPL": curtain(int(8000 * scale), 757, 20000, seconds=0.5),
+        "NPOL": volume(int(360 * scale), 10, 1000)
+    }
+
+
+cases = [
+    ("zarr default", {"codec": None, "delta": False, "consolidated": False}),
+    ("lz4 byte", {"codec": "lz4", "shuffle": "byte"}),
+    ("lz4 bit", {"codec": "lz4", "shuffle": "bit"}),
+    ("zstd byte", {"codec": "zstd", "shuffle": "byte"}),
+    ("zstd bit", {}),
+    ("zstd bit L1", {"level": 1}),
+    ("zstd bit 1M", {"chunk": 1048576}),
+    ("zstd bit shard 4", {"shard": 4})
+]
+
+
+def files(folder):
+    """no. of files and bytes under folder"""
+    count, size = 0, 0
+    for path, _, names in os.walk(folder):
+        count += len(names)
+        size += sum(os.path.getsize(os.path.join(path, name)) for name in names)
+    return count, size
+
+
+def read(folder, variable="ref"):
+    """open the store and read every point back"""
+    root = open_store(folder)
+    return root["location"][:], root["value"][variable][:], root["time"][:]
+
+
+def main(scale=1.0):
+    workdir = tempfile.mkdtemp()
+    try:
+        for instr, (lon, lat, alt, value, time_) in shapes(scale).items():
+            order = np.argsort(time_, kind="stable")
+            mask = np.isfinite(value[order])
+            points = [array[order][mask] for array in (lon, lat, alt, value, time_)]
+            print("{}: {} points".format(instr, points[0].size))
+            print("{:>20} {:>8} {:>8} {:>10} {:>8} {:>8}".format("case", "write s", "read s", "MB", "files", "ratio"))
+            base = None
+            for name, options in cases:
+                folder = os.path.join(workdir, instr, name.replace(" ", "_"))
+                start = time.perf_counter()
+                write_store(folder, *points[:3], points[4], {"ref": points[3]}, {}, **options)
+                written = time.perf_counter() - start
+                start = time.perf_counter()
+                read(folder)
+                loaded = time.perf_counter() - start
+                count, size = files(folder)
+                base = base or size
+                print("{:>20} {:>8.3f} {:>8.3f} {:>10.2f} {:>8} {:>8.2f}".format(name, written, loaded, size / 2 ** 20,
+                                                                                 count, base / size))
+                shutil.rmtree(folder)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if (len(sys.argv) > 1) else 1.0)
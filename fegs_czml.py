@@ -104,7 +104,7 @@ def makeCZML(fdate):
     instr = "fegs"
     s3name = f"{os.environ['OUTPUT_DATA_BUCKET_KEY']}/fieldcampaign/goesrplt/{fdate}/{instr}/{filename}"
     print(f"s3name={s3name}, filename={filepath}")
-    upload_to_s3(filepath, os.environ['OUTPUT_DATA_BUCKET'], s3_name=s3name)
+    upload_to_s3(filepath, os.environ['OUTPUT_DATA_BUCKET'], s3_name=s3name, encoding="gzip")
 
 
 dates = ['2017-04-16','2017-04-18', '2017-04-20', '2017-04-22', '2017-05-07',
@@ -3,6 +3,7 @@ from copy import deepcopy
 import json
 import boto3
 import os
+from utils.compress import put_compressed
 
 model = {
     "id": "Flight Track",
@@ -191,7 +192,7 @@ def process_tracks():
         output_name = os.path.splitext(os.path.basename(infile))[0]
         outfile = f"{os.environ['OUTPUT_DATA_BUCKET_KEY']}/fieldcampaign/goesrplt/czml/flight_track/{output_name}"
 
-        s3_client.put_object(Body=writer.get_string(), Bucket=os.environ['OUTPUT_DATA_BUCKET'], Key=outfile)
+        put_compressed(s3_client, os.environ['OUTPUT_DATA_BUCKET'], outfile, writer.get_string())
 
 
 process_tracks()
@@ -1,12 +1,14 @@
 import xarray as xr
 from glm_subcode import *
+from utils.sink import S3Sink, TeeSink
+from utils.timeline import TimelineSink
 
 np.random.seed(123)
 
 def dictkey(dictlist, val):
     return list(dictlist.keys())[list(dictlist.values()).index(val)]
 
-def makePointCloud(fdate):
+def makePointCloud(fdate, refine="REPLACE", format="pnts", sink=None, archive=False, consolidate=False):
 
     instr = 'GLM'
     Dt_show = 10
@@ -25,7 +27,9 @@ def makePointCloud(fdate):
 
     fdatej = datetime.strptime(fdate, "%Y-%m-%d").strftime("%Y%j")
 
-    mkfolder(folder)
+    if (sink is None):
+        sink = S3Sink(s3path, encoding="gzip")  # <--tiles are uploaded while the next ones are encoded
+    timeline = TimelineSink(sink, "GLM Lightning") if (consolidate) else None  # <--one tileset.json
 
     # ----get CRS/flight track location & time
     CRSlat, CRSlon, CRStime, crstime = get_CRS(fdate, s3bucket)
@@ -90,8 +94,11 @@ def makePointCloud(fdate):
         if (len(filesGLM) == 0): continue  # <---no data, skip it
 
         itile += 1
-        folder2 = folder + 'tile' + str(itile) + '/'
-        mkfolder(folder2)
+        tile_sink = (timeline or sink).subfolder('tile' + str(itile))
+        if (archive):
+            # tileN.3tz next to tileN/, one object per tileset for a tile server (utils.archive serve);
+            # CesiumJS cannot load a .3tz itself, so the czml keeps pointing at the tileset.json
+            tile_sink = TeeSink(tile_sink, sink.archive('tile' + str(itile) + '.3tz'))
 
         tileset = Tileset(bigbox, sec1, instr)
 
@@ -121,22 +128,13 @@ def makePointCloud(fdate):
             if len(LTN[typ].Lon) > 0: LTN[typ].cartographic_to_cartesian()
 
         # ---Making point cloud for each step
-        for step in steps:
-            Ldata = LTN[usetype[step]]
-            skip = useskip[step]
-
-            if (len(Ldata.Lon) == 0): continue
-
-            MK_cloud_czml(itile, step, tileset, Ldata, skip, folder2)
+        MK_levels(itile, steps, tileset, LTN, usetype, useskip, refine, format, sink=tile_sink)
 
         # print(tileset_json)
-        outfile = open(folder2 + "/tileset.json", "w")
-        outfile.write(json.dumps(tileset.json))
-        outfile.close()
+        tile_sink.write("tileset.json", json.dumps(tileset.json))
+        tile_sink.close()
 
-    logfile = open(folder + "/logfile.json", "w")
-    logfile.write(json.dumps(log))
-    logfile.close()
+    sink.write("logfile.json", json.dumps(log))
 
     ##########################
     # GLM tile czml
@@ -148,27 +146,26 @@ def makePointCloud(fdate):
         log = json.load(f)
         f.close()
 
-    czmlBody = [{"id": "document",
-                 "name": "GLM Lightning",
-                 "version": "1.0", }]
+    if (consolidate):
+        timeline.close()
+        czmlBody = timeline.czml("GLM Lightning", s3uri + fdate + "/glm_czml_1min/tileset.json")
+    else:
+        czmlBody = [{"id": "document",
+                     "name": "GLM Lightning",
+                     "version": "1.0", }]
 
-    print(czmlBody)
+        print(czmlBody)
 
-    for tile, tstr in log.items():
-        packet = {"id": tile,
-                  "availability": tstr,
-                  "tileset": {"uri": s3uri + fdate + "/glm_czml_1min/" + tile + "/tileset.json", },
-                  }
-        czmlBody.append(packet)
+        for tile, tstr in log.items():
+            packet = {"id": tile,
+                      "availability": tstr,
+                      "tileset": {"uri": s3uri + fdate + "/glm_czml_1min/" + tile + "/tileset.json", },
+                      }
+            czmlBody.append(packet)
 
     GLMczml = json.dumps(czmlBody)
-    filename = folder + "GLM_tiles.czml"
-    CZMLfile = open(filename, "w")
-    CZMLfile.write(GLMczml)
-    CZMLfile.close()
-
-    os.system(
-        f"aws s3 sync {folder} {s3path}/")
+    sink.write("GLM_tiles.czml", GLMczml)
+    sink.close()
 
 
 dates = ['2017-04-11', '2017-04-13', '2017-04-16', '2017-04-18', '2017-04-20', '2017-04-22', '2017-05-07',
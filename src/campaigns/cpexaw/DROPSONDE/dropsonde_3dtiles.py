@@ -1,3 +1,4 @@
+import sys
 import os
 import shutil
 
@@ -5,8 +6,11 @@ import boto3
 from boto3 import client as boto_client
 from botocore.exceptions import ClientError, NoCredentialsError
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../.."))  # <--repo root, for the shared utils package
 from helper.ingestToZarr import ingest
-from helper.pointcloud import generate_point_cloud
+from utils.point_cloud import generate_point_cloud
+from utils.sink import S3Sink
+from utils.manifest import ManifestSink, load_manifest
 
 class Dropsonde3DTiles:
   def __init__(self):
@@ -65,11 +69,10 @@ def main():
         shutil.rmtree(path)
         os.makedirs(path)
       ingest(path, data, date, time)
-      # generaete pointcloud
-      point_cloud_folder = f"{path}/point_cloud"
-      generate_point_cloud("ref",  0,  1000000000000, path, point_cloud_folder)
-      # upload the generated 3dtile
-      ds.upload_file(f"{path}/point_cloud", bucket_name="ghrc-fcx-field-campaigns-szg", prefix=f"CPEX-AW/instrument-processed-data/dropsonde/3dtiles/{date}")
+      # generaete pointcloud, the 3dtiles are uploaded as they are encoded
+      s3path = f"s3://ghrc-fcx-field-campaigns-szg/CPEX-AW/instrument-processed-data/dropsonde/3dtiles/{date}"
+      with S3Sink(s3path, encoding=None) as s3, ManifestSink(s3, load_manifest(s3path)) as sink:
+        generate_point_cloud("ref",  0,  1000000000000, path, None, sink=sink)
       # ds.upload_file(f"{path}/point_cloud", bucket_name="ghrc-fcx-field-campaigns-szg", prefix=f"CPEX-AW/instrument-processed-data/dropsonde/3dtiles/{date}/dropsonde-{time}")
       print("Generated skewT for: ", s3_url)
     except Exception as e:
@@ -3,6 +3,7 @@ import numpy as np
 import xarray as xr
 from datetime import datetime, timedelta
 from metpy.units import units
+from utils.store import write_store
 
 # META needed for ingest
 campaign = 'CPEX-AW'
@@ -10,11 +11,10 @@ collection = "AirborneRadar"
 dataset = "cpexaw_dropsonde"
 variables = ["zku"]
 renderers = ["point_cloud"]
-chunk = 262144
 to_rad = np.pi / 180
 to_deg = 180 / np.pi
 
-def ingest(folder, file, date, time):
+def ingest(folder, file, date, time, options=None):
     """
     Converts Level 1B crs data from s3 to zarr file and then stores it in the provided folder
     Args:
@@ -22,18 +22,8 @@ def ingest(folder, file, date, time):
         file (string): file to open
         date (string): date when dropsonde was dropped
         time (string): time when dropsonde was dropped
+        options (dict): codec, chunk size, sharding of the zarr store (see store.write_store).
     """
-    store = zarr.DirectoryStore(folder)
-    root = zarr.group(store=store)
-    
-    # Create empty rows for modified data    
-    z_chunk_id = root.create_dataset('chunk_id', shape=(0, 2), chunks=None, dtype=np.int64)
-    z_location = root.create_dataset('location', shape=(0, 3), chunks=(chunk, None), dtype=np.float32)
-    z_time = root.create_dataset('time', shape=(0), chunks=(chunk), dtype=np.int32)
-    z_vars = root.create_group('value')
-    z_ref = z_vars.create_dataset('ref', shape=(0), chunks=(chunk), dtype=np.float32)
-    n_time = np.array([], dtype=np.int64)
-
     base_time = stringToDateTime(date, time)
 
     # open dataset.
@@ -79,31 +69,13 @@ def ingest(folder, file, date, time):
     ref = ref[mask]
     time = time[mask]
 
-    # Now populate (append) the empty rows with modified data.
-    z_location.append(np.stack([lon, lat, alt], axis=-1))
-    z_ref.append(ref)
-    n_time = np.append(n_time, time)
-
-    idx = np.arange(0, n_time.size, chunk)
-    chunks = np.zeros(shape=(idx.size, 2), dtype=np.int64)
-    chunks[:, 0] = idx
-    chunks[:, 1] = n_time[idx]
-    z_chunk_id.append(chunks)
-
-    epoch = np.min(n_time)
-    n_time = (n_time - epoch).astype(np.int32)
-    z_time.append(n_time)
-
-    # save it.
-    root.attrs.put({
+    write_store(folder, lon, lat, alt, time, {"ref": ref.magnitude}, {
         "campaign": campaign,
         "collection": collection,
         "dataset": dataset,
         "variables": variables,
-        "renderers": renderers,
-        "epoch": int(epoch)
-
-    })
+        "renderers": renderers
+    }, **(options or {}))
 
 # UTILS
 
@@ -3,6 +3,7 @@ nav_to_czml takes in nav data from various aricrafts (dc-8) of CPHEX camapign.
 The generated czml can be used to plot the flight track in the CESIUM.
 """
 
+import gzip
 import boto3
 import os
 
@@ -54,7 +55,8 @@ def data_pre_process(bucket_name="ghrc-fcx-field-campaigns-szg", field_campaign
         output_czml = writer.get_string()
         output_name = os.path.splitext(os.path.basename(infile))[0]
         outfile = f"{field_campaign}/{output_data_dir}/{instrument_name}/{output_name}.czml"
-        s3_client.put_object(Body=output_czml, Bucket=bucket_name, Key=outfile)
+        s3_client.put_object(Body=gzip.compress(output_czml.encode(), mtime=0), Bucket=bucket_name, Key=outfile,
+                             ContentType="application/json", ContentEncoding="gzip")
         print(infile+" conversion done.")
 
 def dc8():
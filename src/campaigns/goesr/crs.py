@@ -3,24 +3,14 @@ import zarr
 import numpy as np
 import xarray as xr
 import shutil
-import boto3
 
 from utils.ingest_utils import add24hr,  CRSaccess
 from utils.point_cloud import generate_point_cloud
-from utils.s3_updnload import upload_to_s3
+from utils.store import write_store, complete
+from utils.sink import S3Sink
+from utils.manifest import ManifestSink, load_manifest
 
-def ingest(folder, file):
-
-    store = zarr.DirectoryStore(folder)
-
-    root = zarr.group(store=store)
-
-    z_chunk_id = root.create_dataset('chunk_id', shape=(0, 2), chunks=None, dtype=np.int64)
-    z_location = root.create_dataset('location', shape=(0, 3), chunks=(chunk, None), dtype=np.float32)
-    z_time = root.create_dataset('time', shape=(0), chunks=(chunk), dtype=np.int32)
-    z_vars = root.create_group('value')
-    z_ref = z_vars.create_dataset('ref', shape=(0), chunks=(chunk), dtype=np.float32)
-    n_time = np.array([], dtype=np.int64)
+def ingest(folder, file, options=None):
 
     date = file.split("_")[3]
     base_time = np.datetime64('{}-{}-{}'.format(date[:4], date[4:6], date[6:]))
@@ -80,28 +70,13 @@ def ingest(folder, file):
     ref = ref[mask]
     time = time[mask]
 
-    z_location.append(np.stack([lon, lat, alt], axis=-1))
-    z_ref.append(ref)
-    n_time = np.append(n_time, time)
-
-    idx = np.arange(0, n_time.size, chunk)
-    chunks = np.zeros(shape=(idx.size, 2), dtype=np.int64)
-    chunks[:, 0] = idx
-    chunks[:, 1] = n_time[idx]
-    z_chunk_id.append(chunks)
-
-    epoch = np.min(n_time)
-    n_time = (n_time - epoch).astype(np.int32)
-    z_time.append(n_time)
-
-    root.attrs.put({
+    write_store(folder, lon, lat, alt, time, {"ref": ref}, {
         "campaign": campaign,
         "collection": collection,
         "dataset": dataset,
         "variables": variables,
-        "renderers": renderers,
-        "epoch": int(epoch)
-    })
+        "renderers": renderers
+    }, **(options or {}))
 
 
 def down_vector(roll, pitch, head):
@@ -117,7 +92,7 @@ collection = "AirborneRadar"
 dataset = "goesrpltcrs"
 variables = ["ref"]
 renderers = ["point_cloud"]
-chunk = 262144
+storage_options = None  # <--fsspec options of an s3:// CRS_OUTPUT_PATH (key, secret, client_kwargs), see utils.store
 to_rad = np.pi / 180
 to_deg = 180 / np.pi
 
@@ -139,20 +114,15 @@ for fdate in dates:
     os.environ['CRS_OUTPUT_FLIGHT_PATH'] = f"{os.getenv('CRS_OUTPUT_PATH')}/{sdate}"
 
     folder = os.environ['CRS_OUTPUT_FLIGHT_PATH']
-    point_cloud_folder = f"{folder}/point_cloud"
-    if os.path.exists(folder): shutil.rmtree(f"{folder}")
-
-    os.mkdir(folder)
-
-    ingest(folder, s3_raw_file_key)
-    generate_point_cloud("ref",  0,  1000000000000,folder, point_cloud_folder)
+    if ("://" not in folder):  # <--an s3:// store is kept, an existing one is tiled again without re-ingesting
+        if os.path.exists(folder): shutil.rmtree(f"{folder}")
 
-    files = os.listdir(point_cloud_folder)
+        os.mkdir(folder)
 
-    s3 = boto3.client('s3')
+    if (not complete(folder, storage_options)):
+        ingest(folder, s3_raw_file_key, {"storage_options": storage_options})
     instr = "crs"
-    for file in files:
-        fname = os.path.join(point_cloud_folder, file)
-        s3name = f"{os.environ['OUTPUT_DATA_BUCKET_KEY']}/fieldcampaign/goesrplt/{fdate}/{instr}/{file}"
-        print(f"s3name={s3name}, fname={fname}")
-        upload_to_s3(fname, os.environ['OUTPUT_DATA_BUCKET'], s3_name=s3name)
+    s3path = f"s3://{os.environ['OUTPUT_DATA_BUCKET']}/{os.environ['OUTPUT_DATA_BUCKET_KEY']}/fieldcampaign/goesrplt/{fdate}/{instr}"
+    with S3Sink(s3path, encoding="gzip") as s3, ManifestSink(s3, load_manifest(s3path)) as sink:  # <--unchanged tiles are not re-uploaded
+        generate_point_cloud("ref",  0,  1000000000000,folder, None, sink=sink,
+                             storage_options=storage_options)
@@ -1,5 +1,8 @@
 import xarray as xr
 from lis_subcode import *
+from utils.sink import S3Sink
+from utils.timeline import TimelineSink
+from utils.partition import Partitioner
 
 np.random.seed(12345)
 
@@ -11,11 +14,19 @@ def Subset3(Org, start, end):
 
     subs = lightning(Org.ltype, Org.instr)
     for item in items:
-        subs.__dict__[item] = DF[item]
+        subs.__dict__[item] = DF[item].to_numpy()  # <--positional, the ADD levels index it by arrays
     return subs
 
 
-def makePointCloud(fdate):
+def SubsetRows(Org, order, start, stop):
+    """points order[start:stop] of Org: an index range of its time-sorted points, see Partitioner.split"""
+    subs = lightning(Org.ltype, Org.instr)
+    for item in ['Lon', 'Lat', 'Alt', 'Time', 'Rad']:
+        subs.__dict__[item] = np.asarray(Org.__dict__[item])[order[start:stop]]
+    return subs
+
+
+def makePointCloud(fdate, refine="REPLACE", partitioner=None, format="pnts", sink=None, consolidate=False):
     instr = 'LIS'
     Dt_show = 10  # <--dislpay time extended 10 sec for the tile
 
@@ -23,8 +34,13 @@ def makePointCloud(fdate):
 
     fdatej = datetime.strptime(fdate, "%Y-%m-%d").strftime("%Y%j")
 
-    folder = os.getenv('LIS_OUTPUT_PATH') + '/' + fdate + '_czml/'
-    mkfolder(folder)
+    s3uri = f"https://{os.environ['OUTPUT_DATA_BUCKET']}.s3-{os.environ['AWS_REGION']}.amazonaws.com/fieldcampaign/goesrplt/"
+
+    s3path = f"s3://{os.environ['OUTPUT_DATA_BUCKET']}/{os.environ['OUTPUT_DATA_BUCKET_KEY']}/fieldcampaign/goesrplt/{fdate}/iss-lis_czml"
+
+    if (sink is None):
+        sink = S3Sink(s3path, encoding="gzip")  # <--tiles are uploaded while the next ones are encoded
+    timeline = TimelineSink(sink, "ISS-LIS Lightning") if (consolidate) else None  # <--one tileset.json
 
     # ----get CRS/flight track & box region
     CRSlat, CRSlon, CRStime, crstime = get_CRS(fdate, s3bucket)
@@ -77,18 +93,36 @@ def makePointCloud(fdate):
         Tsize[typ] = int(np.ceil(LTN[typ].Time.size / nTile))
     Trng = [LTN['event'].Time[0], LTN['event'].Time[-1]]
 
+    # ---tile windows: nTile equal time spans, or index ranges the partitioner cuts from the time-sorted
+    #    events; flashes and groups are cut at the same times, half open, so a point on a cut is in one tile
+    if (partitioner is None):
+        windows = [(Trng[0] + tile * (Trng[1] - Trng[0]) / nTile,
+                    min(Trng[0] + tile * (Trng[1] - Trng[0]) / nTile + (Trng[1] - Trng[0]) / nTile, Trng[1]))
+                   for tile in range(nTile)]
+    else:
+        orders = {typ: np.argsort(LTN[typ].Time, kind='stable') for typ in types}
+        order = orders['event']
+        time = np.asarray(LTN['event'].Time)[order]
+        ranges = {'event': partitioner.split(time, np.asarray(LTN['event'].Lon)[order],
+                                             np.asarray(LTN['event'].Lat)[order])}
+        cuts = [time[start] for start, _ in ranges['event'][1:]]
+        for typ in ('flash', 'group'):
+            edges = np.r_[0, np.searchsorted(np.asarray(LTN[typ].Time)[orders[typ]], cuts), LTN[typ].Time.size]
+            ranges[typ] = list(zip(edges[:-1], edges[1:]))
+        windows = ranges['event']
+
     log = {}
-    for tile in range(nTile):
+    for tile, (start, end) in enumerate(windows):
 
-        folder2 = folder + 'tile' + str(tile) + '/'
-        mkfolder(folder2)
+        tile_sink = (timeline or sink).subfolder('tile' + str(tile))
         tileset = Tileset(bigbox, LTN['event'].Time[0], instr)
 
         subLTN = {}
         for typ in types:
-            start = Trng[0] + tile * (Trng[1] - Trng[0]) / nTile
-            end = min(start + (Trng[1] - Trng[0]) / nTile, Trng[1])
-            subLTN[typ] = Subset3(LTN[typ], start, end)
+            if (partitioner is None):
+                subLTN[typ] = Subset3(LTN[typ], start, end)
+            else:
+                subLTN[typ] = SubsetRows(LTN[typ], orders[typ], *ranges[typ][tile])
             if (typ == 'flash'): print('typ range: ', start, end)
 
             subLTN[typ].cartographic_to_cartesian()
@@ -100,48 +134,34 @@ def makePointCloud(fdate):
         print(sec2Z(epoch), sec2Z(end))
         log['tile' + str(tile)] = sec2Z(epoch) + '/' + sec2Z(end)
 
-        for step in steps:
-            Ldata = subLTN[usetype[step]]
-            skip = useskip[step]
-            if (len(Ldata.Lon) == 0): print('zero length')
-            if (len(Ldata.Lon) == 0): continue
-
-            MK_cloud_czml(instr, tile, step, tileset, Ldata, skip, folder2)
+        MK_levels(instr, tile, steps, tileset, subLTN, usetype, useskip, refine, format, sink=tile_sink)
 
-        outfile = open(folder2 + "/tileset.json", "w")
-        outfile.write(json.dumps(tileset.json))
-        outfile.close()
+        tile_sink.write("tileset.json", json.dumps(tileset.json))
 
     ##########################
     # LIS tile czml
     ##########################
 
-    s3uri = f"https://{os.environ['OUTPUT_DATA_BUCKET']}.s3-{os.environ['AWS_REGION']}.amazonaws.com/fieldcampaign/goesrplt/"
-
-    s3path = f"s3://{os.environ['OUTPUT_DATA_BUCKET']}/{os.environ['OUTPUT_DATA_BUCKET_KEY']}/fieldcampaign/goesrplt/{fdate}/iss-lis_czml"
-
-    czmlBody = [{"id": "document",
-                 "name": "ISS-LIS Lightning",
-                 "version": "1.0", }]
+    if (consolidate):
+        timeline.close()
+        czmlBody = timeline.czml("ISS-LIS Lightning", s3uri + fdate + "/iss-lis_czml/tileset.json")
+    else:
+        czmlBody = [{"id": "document",
+                     "name": "ISS-LIS Lightning",
+                     "version": "1.0", }]
 
-    for tile, tstr in log.items():
-        packet = {"id": tile,
-                  "availability": tstr,
-                  "tileset": {"uri": s3uri + fdate + "/iss-lis_czml/" + tile + "/tileset.json", },
-                  }
-        czmlBody.append(packet)
+        for tile, tstr in log.items():
+            packet = {"id": tile,
+                      "availability": tstr,
+                      "tileset": {"uri": s3uri + fdate + "/iss-lis_czml/" + tile + "/tileset.json", },
+                      }
+            czmlBody.append(packet)
 
     LISczml = json.dumps(czmlBody)
 
     filename = "LIS_tiles.czml"
-    filepath = f"{folder}/{filename}"
-
-    CZMLfile = open(filepath, "w")
-    CZMLfile.write(LISczml)
-    CZMLfile.close()
-
-    os.system(
-        f"aws s3 sync {folder} {s3path}/")
+    sink.write(filename, LISczml)
+    sink.close()
 
 
 dates = ['2017-04-11', '2017-04-13', '2017-04-16', '2017-04-18', '2017-04-20', '2017-04-22', '2017-05-07', '2017-05-08',
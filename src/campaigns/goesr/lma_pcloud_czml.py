@@ -1,12 +1,15 @@
 import pandas as pd
 from lma_subcode import *
+from utils.sink import S3Sink
+from utils.timeline import TimelineSink
+from utils.partition import Partitioner
 
 
 # ------ LMA CZML----------------------------------------------
 # - Use multiple tiles for a file (5/10 min)                  -
 # - Each tile is 60 sec                                       -
 # - Current display is color-coded with alt                   -
-# - point cloud tiles and czml file save to local LMA/ subdir -
+# - point cloud tiles and czml file go to the sink (S3)       -
 # -------------------------------------------------------------
 
 Dt_show = 10
@@ -20,15 +23,31 @@ def Subset3(Org, start, end):
     return subs
 
 
-def makePointCloud(fdate, network):
+def SubsetRows(Org, start, stop):
+    """rows start:stop of Org's time-sorted DF, an index range of Partitioner.split"""
+    subs = lightning(Org.network)
+    subs.DF = Org.DF.iloc[start:stop]
+    print("Length:", len(subs.DF['Time']))
+    return subs
+
+
+def makePointCloud(fdate, network, refine="REPLACE", partitioner=None, format="pnts", sink=None,
+                   consolidate=False):
 
     fdate = fdate  # Flight date, in yyyy-mm-dd string
     s3bucket = os.getenv('RAW_DATA_BUCKET')
 
     # ---------------------------------------------------------------
 
-    folder = os.getenv('LMA_OUTPUT_PATH') + '/' + fdate + '_rgba/' + network + "/"
-    mkfolder(folder)
+    lma = 'lma'
+
+    s3uri = f"https://{os.environ['OUTPUT_DATA_BUCKET']}.s3-{os.environ['AWS_REGION']}.amazonaws.com/fieldcampaign/goesrplt/"
+
+    s3path = f"s3://{os.environ['OUTPUT_DATA_BUCKET']}/{os.environ['OUTPUT_DATA_BUCKET_KEY']}/fieldcampaign/goesrplt/{fdate}/{lma}/{network}"
+
+    if (sink is None):
+        sink = S3Sink(s3path, encoding="gzip")  # <--tiles are uploaded while the next ones are encoded
+    timeline = TimelineSink(sink, network + " Lightning") if (consolidate) else None  # <--one tileset.json
 
     # ----get CRS/flight track & box region
     CRSlat, CRSlon, CRStime, crstime = get_CRS(fdate, s3bucket)
@@ -48,6 +67,8 @@ def makePointCloud(fdate, network):
     steps = [1]
     usetype = {32: 'flash', 16: 'flash', 8: 'group', 4: 'group', 2: 'event', 1: 'event'}
     useskip = {32: 4, 16: 4, 8: 2, 4: 2, 2: 1, 1: 1}
+    if (refine == "ADD"):
+        _, useskip = nested_levels(useskip, network)  # <--ADD levels are strides of the one DF, see lod
 
     to_rad = np.pi / 180.0
     to_deg = 180.0 / np.pi
@@ -79,19 +100,30 @@ def makePointCloud(fdate, network):
     t1 = datetime(int(fdate[0:4]), int(fdate[5:7]), int(fdate[8:10]))
     dSecs = (t1 - t1970).total_seconds()
 
+    # ---tile windows: every Tsize sec, or the index ranges the partitioner cuts from the time-sorted DF
+    #    (a point on a cut is in one tile, not in the closed time windows of both)
+    if (partitioner is None):
+        windows = [(sec0 + tile * Tsize, min(sec0 + tile * Tsize + Tsize, secf), None) for tile in range(nTile)]
+    else:
+        sortedLTN = lightning(network)
+        DF = LTN.DF[(LTN.DF['Time'] >= sec0 - dSecs) & (LTN.DF['Time'] <= secf - dSecs)]
+        sortedLTN.DF = DF.sort_values('Time', kind='stable')
+        time = sortedLTN.DF['Time'].to_numpy()
+        windows = [(dSecs + time[start], dSecs + time[stop - 1], (start, stop)) for start, stop in
+                   partitioner.split(time, sortedLTN.DF['Lon'].to_numpy(), sortedLTN.DF['Lat'].to_numpy())]
+
     # ---get thru each tile
     log = {}
-    for tile in range(nTile):
-
-        epoch = sec0 + tile * Tsize
-        end = min(epoch + Tsize, secf)
+    for tile, (epoch, end, rows) in enumerate(windows):
 
-        subLTN = Subset3(LTN, epoch - dSecs, end - dSecs)
+        if (rows is None):
+            subLTN = Subset3(LTN, epoch - dSecs, end - dSecs)
+        else:
+            subLTN = SubsetRows(sortedLTN, *rows)
 
         if (len(subLTN.DF) < 2): continue
 
-        folder2 = folder + 'tile' + str(tile) + '/'
-        mkfolder(folder2)
+        tile_sink = (timeline or sink).subfolder('tile' + str(tile))
 
         tileset = Tileset(bigbox, epoch, network)
 
@@ -102,49 +134,43 @@ def makePointCloud(fdate, network):
         log['tile' + str(tile)] = sec2Z(epoch) + '/' + sec2Z(end)
         subLTN.cartographic_to_cartesian()
 
+        written = {}  # <--strides already written per data set, for ADD
         for step in steps:
             skip = useskip[step]
             if (len(subLTN.DF) == 0): print('zero length')
             if (len(subLTN.DF) <= 2): continue  # <--need 2 points to get range
 
-            MK_cloud_czml(network, tile, step, tileset, subLTN, skip, folder2)
+            MK_cloud_czml(network, tile, step, tileset, subLTN, skip, None, refine,
+                          tuple(written.setdefault(network, [])), format, sink=tile_sink)
+            written[network].append(skip)
 
-        outfile = open(folder2 + "/tileset.json", "w")
-        outfile.write(json.dumps(tileset.json))
-        outfile.close()
+        tile_sink.write("tileset.json", json.dumps(tileset.json))
 
-    logfile = open(folder + "/logfile.json", "w")
-    logfile.write(json.dumps(log))
-    logfile.close()
-
-    lma = 'lma'
+    sink.write("logfile.json", json.dumps(log))
 
     ##########################
     # LMA tile czml
     ##########################
 
-    s3uri = f"https://{os.environ['OUTPUT_DATA_BUCKET']}.s3-{os.environ['AWS_REGION']}.amazonaws.com/fieldcampaign/goesrplt/"
-
-    s3path = f"s3://{os.environ['OUTPUT_DATA_BUCKET']}/{os.environ['OUTPUT_DATA_BUCKET_KEY']}/fieldcampaign/goesrplt/{fdate}/{lma}/{network}"
-
-    czmlBody = [{"id": "document",
-                 "name": network + " Lightning",
-                 "version": "1.0", }]
+    if (consolidate):
+        timeline.close()
+        czmlBody = timeline.czml(network + " Lightning",
+                                 s3uri + fdate + "/" + lma + "/" + network + "/tileset.json")
+    else:
+        czmlBody = [{"id": "document",
+                     "name": network + " Lightning",
+                     "version": "1.0", }]
 
-    for tile, tstr in log.items():
-        packet = {"id": tile,
-                  "availability": tstr,
-                  "tileset": {"uri": s3uri + fdate + "/" + lma + "/" + network + "/" + tile + "/tileset.json"},
-                  }
-        czmlBody.append(packet)
+        for tile, tstr in log.items():
+            packet = {"id": tile,
+                      "availability": tstr,
+                      "tileset": {"uri": s3uri + fdate + "/" + lma + "/" + network + "/" + tile + "/tileset.json"},
+                      }
+            czmlBody.append(packet)
 
     LMAczml = json.dumps(czmlBody)
-    filename = f"{folder}/{network}_tiles.czml"
-    CZMLfile = open(filename, "w")
-    CZMLfile.write(LMAczml)
-    CZMLfile.close()
-
-    os.system(f"aws s3 sync {folder} {s3path}/")
+    sink.write(f"{network}_tiles.czml", LMAczml)
+    sink.close()
 
 makePointCloud('2017-04-18', "NALMA")
 makePointCloud('2017-04-20', "SOLMA")
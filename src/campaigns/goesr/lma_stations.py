@@ -6,6 +6,7 @@ import os
 import boto3
 from numpy import deg2rad, rad2deg, cos, sin, tan, arctan
 from utils.s3_updnload import upload_to_s3
+from utils.compress import sync_to_s3
 
 s3 = boto3.resource('s3')
 
@@ -173,7 +174,7 @@ for nw in Networks:
     CZMLfile.write(LMAczml)
     CZMLfile.close()
 
-os.system(f"aws s3 sync {output_folder} {s3path}")
+sync_to_s3(output_folder, s3path, encoding="gzip")
 
 s3name = f"{os.environ['OUTPUT_DATA_BUCKET_KEY']}/fieldcampaign/goesrplt/LMA_asset/LMASensor.glb"
 
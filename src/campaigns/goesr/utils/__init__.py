@@ -0,0 +1,5 @@
+import os
+
+# the tile writing modules (tileset, pnts, sink, store, ...) are not copied here: the
+# top-level utils package is searched after this one, so utils.<module> is the shared one
+__path__.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../utils"))
@@ -15,7 +15,7 @@ to_deg = 180.0 / np.pi
 
 
 def regionrad(region):
-    return [r * to_rad for r in region]
+    return [r * to_rad for r in region[:4]] + list(region[4:])  # <--bottom/top stay in meters
 
 
 def sec2Z(t):
@@ -1,3 +1,7 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../.."))  # <--repo root, for the shared utils package
 from hiwrap_utils.tiles_rad_range import HIWRAPTilesPointCloudDataProcess, get_date_from_url
 from hiwrap_utils.s3_updnload import download_from_s3, upload_folder_to_s3, get_keys
 
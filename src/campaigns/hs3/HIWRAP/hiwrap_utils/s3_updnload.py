@@ -5,6 +5,7 @@ from pathlib import Path
 
 from boto3 import client as boto_client
 from botocore.exceptions import ClientError, NoCredentialsError
+from utils.compress import upload_compressed
 
 def download_from_s3(bucket_name, s3_key, dest_dir):
     """Download a file from an S3 bucket
@@ -36,21 +37,26 @@ def upload_folder_to_s3(folder, bucket_name, s3_key):
         fname = os.path.join(folder, file) # SOURCE
         s3_key_f = f"{s3_key}/{file}" # can have hiecharchical destination as key
         # print(f"uploaded {file} to {s3_key}.")
-        upload_to_s3(fname, bucket_name, s3_key_f)
+        upload_to_s3(fname, bucket_name, s3_key_f, encoding="gzip")
     print("Folder uploaded.")
 
 
-def upload_to_s3(file_name, bucket, key=None):
+def upload_to_s3(file_name, bucket, key=None, encoding=None):
     """Upload a file to an S3 bucket
      file_name: File to upload
      bucket: S3 bucket to upload to
      object_name: S3 object name. If not specified then file_name is used
+     encoding: "gzip" or "br" uploads a compressed copy with Content-Encoding set
+               (small and already compressed files go as they are, see compress.py)
     """
     if key is None: key = file_name
 
     s3 = boto3.client('s3')
     try:
-        s3.upload_file(file_name, bucket, key)
+        if (encoding):
+            upload_compressed(s3, file_name, bucket, key, encoding)
+        else:
+            s3.upload_file(file_name, bucket, key)
     except ClientError as e:
        print(e)
     except NoCredentialsError:
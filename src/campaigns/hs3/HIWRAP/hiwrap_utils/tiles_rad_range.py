@@ -5,8 +5,12 @@ import xarray as xr
 from typing import Generator
 
 from fcx_playground.fcx_dataprocess.tiles_rad_range import RadRangeTilesPointCloudDataProcess
+from utils.voxel import decimate
 
 class HIWRAPTilesPointCloudDataProcess(RadRangeTilesPointCloudDataProcess):
+    voxel = (250.0, 250.0, 150.0) # voxel edges (east, north, up) in meters of the decimation
+    reduce = "max" # ref of a voxel: "max" keeps the peak of the echo cores, "mean" averages
+
     def _cleaning(self, data: xr.Dataset) -> xr.Dataset:
       # data extraction
       # scrape necessary data columns 
@@ -73,13 +77,22 @@ class HIWRAPTilesPointCloudDataProcess(RadRangeTilesPointCloudDataProcess):
       lat = lat[mask]
       alt = alt[mask]
 
-      # sample one data point for each 20 data points. done as the file has large data rows.
+      # one data point per voxel (instead of every 20th point). done as the file has large data rows.
+      # voxel grid on a local east/north/up frame in meters
+
+      if ref.size > 0:
+        east = (lon - np.min(lon)) * 111000 * np.cos(np.mean(lat) * self.to_rad)
+        north = (lat - np.min(lat)) * 111000
+        ref, time, lon, lat, alt = decimate(np.column_stack((east, north, alt)), self.voxel,
+                                            ref, time, lon, lat, alt, reduce=self.reduce)
+        sort_idx = np.argsort(time, kind='stable') # mean voxel times can step back a little
+        ref, time, lon, lat, alt = ref[sort_idx], time[sort_idx], lon[sort_idx], lat[sort_idx], alt[sort_idx]
       df = pd.DataFrame(data = {
-        'time': time[::20],
-        'lon': lon[::20],
-        'lat': lat[::20],
-        'alt': alt[::20],
-        'ref': ref[::20]
+        'time': time,
+        'lon': lon,
+        'lat': lat,
+        'alt': alt,
+        'ref': ref
       })
       return df
 
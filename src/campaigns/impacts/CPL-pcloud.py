@@ -9,6 +9,7 @@ from glob import glob
 from datetime import time,datetime,timedelta
 from utils.Utils import *
 from utils.pcloud_subs import *
+from utils.partition import Partitioner
 
 
 
@@ -18,11 +19,12 @@ from utils.pcloud_subs import *
 CPLpath= '/Storage/Impacts/data/'
 outDir0 = '/Storage/Impacts/VISdata/'   #head dir for outputs
 
-def mk_CPLpcloud(fdate):
+def mk_CPLpcloud(fdate, refine='REPLACE', partitioner=None, format='pnts', profile='full', sink=None):
     fileobj = glob(CPLpath+'IMPACTS_CPL_ATB*'+fdate.replace('-','')+'*.hdf5')[0]
     print('file:',fileobj)
     folder= outDir0+fdate+'/cpl/atb/'
-    mkfolder(folder)
+    if(sink is None):
+        mkfolder(folder)
 
     CPL, _, _ = ER2CPL(fileobj)
 
@@ -46,21 +48,22 @@ def mk_CPLpcloud(fdate):
     tileset=Tileset('CPL_atb',bigbox, SecS)
 
     steps = [32, 16, 8, 4, 2, 1]
-    Tsize = 50000
     nPoints = len(CPL)
-    nTile = int(nPoints/Tsize) + 1
+    if(partitioner is None):
+        partitioner = Partitioner(max_points=50000)
+    tiles = partitioner.split(CPL['Time'].to_numpy(), CPL['lon'].to_numpy(), CPL['lat'].to_numpy())
 
-    for tile in range (nTile):
+    for tile, (start, stop) in enumerate(tiles):
         #--epoch and end are seconds from (1970,1,1)
         if(tile ==0):
             epoch = SecS
         else:
-            epoch =  CPL['Time'][tile*Tsize]   #SecS + tile*Tsize
-        end = CPL['Time'][min((tile+1)*Tsize, nPoints-1)]
-        subCPL = CPL[(CPL['Time'] >= epoch) & (CPL['Time'] < end)]
+            epoch =  CPL['Time'].iloc[start]
+        end = CPL['Time'].iloc[min(stop, nPoints-1)]
+        subCPL = CPL.iloc[start:stop]
         #print(sec2Z(epoch),sec2Z(end),len(subCPL))
 
-        make_pcloudTile('atb',tile, tileset, subCPL, epoch, end, folder)
+        make_pcloudTile('atb',tile, tileset, subCPL, epoch, end, folder, refine, format, profile, sink)
     
     return CPL
 
@@ -9,6 +9,7 @@ from datetime import datetime, timedelta
 
 sys.path.append("../")
 from utils.s3_updnload import backup_file_s3
+from utils.compress import put_compressed
 
 model = {
     "id": "Flight Track",
@@ -185,7 +186,7 @@ def process_tracks(fDates, plane):
 
         backup_file_s3(bucketOut, outfile)
         print(f'uploading new {outfile} in {bucketOut} bucket.')
-        s3_client.put_object(Body=writer.get_string(), Bucket=bucketOut, Key=outfile)
+        put_compressed(s3_client, bucketOut, outfile, writer.get_string())
         print(f'Upload complete.\n\n')
 
 fDatesP3B = ['2020-02-25', '2020-02-20', '2020-02-18', '2020-02-13', '2020-02-07', '2020-02-05', '2020-02-01', '2020-01-25', '2020-01-18']
@@ -7,6 +7,7 @@ from glob import glob
 from datetime import datetime, timedelta
 from pycode.Utils import *
 from pycode.pcloud_subs import *
+from pycode.partition import Partitioner
 
 
 hpref = {'HIWRAP':'IMPACTS_HIWRAP_L1B_RevA_',
@@ -27,7 +28,10 @@ units = {'dBZe':'dBZ',
          'spW': 'm/s' }
 
 
-def mk_RADpcloud(Radar, fdate, dataDir, outDir0):
+def mk_RADpcloud(Radar, fdate, dataDir, outDir0, refine='REPLACE', partitioner=None, format='pnts', profile='full',
+                 sink=None, combined=False):
+    #--combined: one tileset per band (<band>_all) holding every variable as a batch attribute over one set of
+    #            positions, colored by dBZe; tileset.json "styles" switch the viewer to another variable
                   
     sdate = fdate.replace('-','')
     Hfile = glob(dataDir+hpref[Radar]+sdate+'*.h5')[0]
@@ -63,29 +67,41 @@ def mk_RADpcloud(Radar, fdate, dataDir, outDir0):
         bigbox = [lonw, lats, lone, latn, altb, altu] #*to_rad
 
         nPoints = len(RAD)
-        Tsize = 500000
-        nTile = nPoints//Tsize
-        if(nPoints%Tsize > 0): nTile += 1
+        if(partitioner is None):
+            partitioner = Partitioner(max_points=500000)
+        tiles = partitioner.split(RAD['Time'].to_numpy(), RAD['lon'].to_numpy(), RAD['lat'].to_numpy())
         print(' Valid data points:',nPoints)
 
         #----Make pointcloud tiles
-        for vname in Vars:
+        vnames = [Vars] if combined else Vars
+        folders, var_sinks, tilesets = {}, {}, {}
+        for vname in vnames:
+            vtag = 'all' if combined else vname
             print(' -Making pointcloud tileset for',vname)
-            folder= outDir0+ '/'+bandSel+'_'+vname
-            mkfolder(folder)
-
-            tileset = Tileset(bandSel+'_'+vname,bigbox, SecS)
-
-            for tile in range (nTile):
-                if(tile ==0):
-                    epoch = SecS         #--epoch and end are seconds from (1970,1,1)
-                else:
-                    epoch =  RAD['Time'][tile*Tsize]   #SecS + tile*Tsize
-                end = RAD['Time'][min((tile+1)*Tsize, nPoints-1)]
-                subset = RAD[(RAD['Time'] >= epoch) & (RAD['Time'] < end)]
-                print(sec2Z(epoch),sec2Z(end),len(subset))
-
-                make_pcloudTile(vname, tile, tileset, subset, epoch, end, folder)
+            folders[vtag] = outDir0+ '/'+bandSel+'_'+vtag
+            if(sink is None):
+                mkfolder(folders[vtag])
+                var_sinks[vtag] = None
+            else:
+                var_sinks[vtag] = sink.subfolder(bandSel+'_'+vtag)  #<--e.g. S3Sink of outDir0's s3 path
+
+            tilesets[vtag] = Tileset(bandSel+'_'+vtag,bigbox, SecS)
+
+        #----tile by tile, so the variables of a tile share its geometry (computed once per tile)
+        for tile, (start, stop) in enumerate(tiles):
+            if(tile ==0):
+                epoch = SecS         #--epoch and end are seconds from (1970,1,1)
+            else:
+                epoch =  RAD['Time'].iloc[start]
+            end = RAD['Time'].iloc[min(stop, nPoints-1)]
+            subset = RAD.iloc[start:stop]
+            print(sec2Z(epoch),sec2Z(end),len(subset))
+
+            geometry = cartographic_to_cartesian(subset['lon'], subset['lat'], subset['alt'])
+            for vname in vnames:
+                vtag = 'all' if combined else vname
+                make_pcloudTile(vname, tile, tilesets[vtag], subset, epoch, end, folders[vtag], refine, format,
+                                profile, var_sinks[vtag], geometry)
 
     return RAD
 
@@ -3,12 +3,20 @@ import numpy as np
 import json
 from datetime import datetime, timedelta
 from matplotlib import cm
+from .tile_format import encode_tile, tile_filename, versions
+from .lod import level_selector
+from .geodetic import cartographic_to_cartesian
+from .hierarchy import assemble
+from .spacing import extents, level_errors, region_error
+from .stats import value_stats
+from .compact import compact, grid_value, Palette
+from .sink import LocalSink
 
 to_rad = np.pi / 180
 to_deg = 180 / np.pi
 
 def regionrad(region): 
-    return [r*to_rad for r in region]
+    return [r * to_rad for r in region[:4]] + list(region[4:])  # <--bottom/top stay in meters
 
 def sec2Z(t): 
     return "{}Z".format(datetime.utcfromtimestamp(t).isoformat())
@@ -19,29 +27,41 @@ class Tileset:
         self.json = {
             "asset": {"version": "1.0",
                      "type": Dataset },
-            "root": {"geometricError": 1000000,
+            "root": {"geometricError": region_error(regionrad(bigbox)),
                      "refine" : "REPLACE",
                      "boundingVolume": {"region": regionrad(bigbox)},
                      "children": []  },
             "properties": {"epoch": "{}Z".format(datetime.utcfromtimestamp(time0).isoformat()),
                            "refined": [] }  }
         self.parent=self.json["root"]
+        self.palette = Palette()  # <--RGBA of the class indices of compact tiles
         print("{}Z".format(datetime.utcfromtimestamp(time0).isoformat()))
 
 
-def make_pcloudTile(vname, tile, tileset, DF, epoch, end, folder):
+def make_pcloudTile(vname, tile, tileset, DF, epoch, end, folder, refine="REPLACE", format="pnts", profile="full",
+                    sink=None, geometry=None):
+    # vname: a variable, or a list of them written as one batch attribute each over the same positions
+    #        (colored by the first, the others are a style away, see variable_style)
+    # geometry: cartographic_to_cartesian of DF's lon/lat/alt if already known (shared by the variables of a tile)
+    names = [vname] if isinstance(vname, str) else list(vname)
+    vname = names[0]
 
     epochZ = "{}Z".format(datetime.utcfromtimestamp(epoch).isoformat())
     endZ   = "{}Z".format(datetime.utcfromtimestamp(end).isoformat())
    #print(sec2Z(epoch),sec2Z(end),len(DF))
     
+    if(sink is None):
+        sink = LocalSink(folder)  # <--or S3Sink/ArchiveSink, see sink
     parent_tile = tileset.json["root"]
-    cartesian, offset, scale, cartographic, region = cartographic_to_cartesian(DF['lon'],DF['lat'],DF['alt'])
+    tileset.json["asset"]["version"] = versions[format]  # <--glb content needs 3D Tiles 1.1
+    if(geometry is None):
+        geometry = cartographic_to_cartesian(DF['lon'],DF['lat'],DF['alt'])
+    cartesian, offset, scale, cartographic, region = geometry
     
     value = DF[vname].to_numpy()
+    variables = [(name, DF[name].to_numpy(dtype=np.float32)) for name in names] if (len(names) > 1) else []
     timep =  DF['timeP'].to_numpy()
     
-    csize = 4
     if(vname=='dBZe'):
         ccode = color_encodeDBZ(DF[vname].copy())
     elif(vname=='CPL' or vname.lower()=='atb'):
@@ -49,197 +69,92 @@ def make_pcloudTile(vname, tile, tileset, DF, epoch, end, folder):
     else:
         ccode = color_encodeOthers(DF[vname].copy(), vname)
     
-    header_length = 28
-    magic = np.string_("pnts")
-    version = 1
-
+    ranges = {name: style_range(name) for name, _ in variables}  # <--compact: one grid per tileset, see variable_style
     steps = [32, 16, 8, 4, 2, 1]
-    for step in steps:
-        filename = "{}_{}.pnts".format(tile, step)
+    errors = level_errors(extents(DF['lon'], DF['lat'], DF['alt']), value.size, steps)  # <--see spacing
+    for i, step in enumerate(steps):
+        select = level_selector(value.size, step, steps[:i], refine)  # <--ADD: only points not in coarser levels
+        filename = tile_filename(tile, step, format)
         child_tile = {
             "availability": "{}/{}".format(epochZ, endZ),
-            "geometricError": step * 500,
+            "geometricError": errors[i],
             "boundingVolume": {
                 "region": region
             },
             "content": {
                 "uri": filename
             },
-            "refine": "REPLACE"
+            "refine": refine
         }
         if step == 1:
             tileset.json["properties"]["refined"].append(filename)
         else:
             child_tile["children"] = []
+        if (i == 0):
+            child_tile["extras"] = {"statistics": value_stats(value)}  # <--of the whole chain, see stats
         
         parent_tile["children"].append(child_tile)
         parent_tile = child_tile
 
-        tile_length = 0
-        feature_table_binary_byte_length = 0
-        batch_table_binary_byte_length = 0
-        length = value[::step].size
+        length = value[select].size
 
-        feature_table_json = {
+        feature_table = {
             "POINTS_LENGTH": length,
             "BATCH_LENGTH": length,
-            "BATCH_ID": {
-                "byteOffset": 0,
-                "componentType": "UNSIGNED_INT"
-            },
-            "POSITION_QUANTIZED": {
-                "byteOffset": length * 4
-            },
             "QUANTIZED_VOLUME_OFFSET": offset,
             "QUANTIZED_VOLUME_SCALE": scale,
-            "RGBA": {
-                "byteOffset": length * 4 + length * 3 * 2
-            },
-        }
-
-        batch_table_json = {
-            "time": {
-                "byteOffset": length * 0,
-                "componentType": "FLOAT",
-                "type": "SCALAR"
-            },
-            "location": {
-                "byteOffset": length * 4,
-                "componentType": "SHORT",
-                "type": "VEC3"
-            }
         }
-
-        tile_length += header_length
-
-        feature_table_json_min = json.dumps(feature_table_json, separators=(",", ":")) + "       "
-        feature_table_trim = (tile_length + len(feature_table_json_min)) % 8
-        if feature_table_trim != 0:
-            feature_table_json_min = feature_table_json_min[:-feature_table_trim]
-
-        tile_length += len(feature_table_json_min)
-
-        feature_table_binary_byte_length = length * 4 + length * 3 * 2 + length * csize
-        tile_length += feature_table_binary_byte_length
-        feature_table_padding = tile_length % 8
-        if feature_table_padding != 0:
-            feature_table_padding = 8 - feature_table_padding
-        tile_length += feature_table_padding
-
-        batch_table_json_min = json.dumps(batch_table_json, separators=(",", ":")) + "       "
-        batch_table_trim = (tile_length + len(batch_table_json_min)) % 8
-        if batch_table_trim != 0:
-            batch_table_json_min = batch_table_json_min[:-batch_table_trim]
-
-        tile_length += len(batch_table_json_min)
-
-        batch_table_binary_byte_length = length * 4 + length * 2 * 3
-        tile_length += batch_table_binary_byte_length
-        batch_table_padding = tile_length % 8
-        if batch_table_padding != 0:
-            batch_table_padding = 8 - batch_table_padding
-        tile_length += batch_table_padding
-
-        with open('{}/{}'.format(folder, filename), mode='wb+') as outfile:
-            outfile.write(np.string_(magic).tobytes())
-            outfile.write(np.uint32(version).tobytes())
-            outfile.write(np.uint32(tile_length).tobytes())
-            outfile.write(np.uint32(len(feature_table_json_min)).tobytes())
-            outfile.write(np.uint32(feature_table_binary_byte_length + feature_table_padding).tobytes())
-            outfile.write(np.uint32(len(batch_table_json_min)).tobytes())
-            outfile.write(np.uint32(batch_table_binary_byte_length + batch_table_padding).tobytes())
-            outfile.write(np.string_(feature_table_json_min).tobytes())
-            outfile.write(np.arange(length, dtype=np.uint32).tobytes())
-            outfile.write(cartesian[::step, :].tobytes())
-            outfile.write(ccode[::step, :].tobytes())
-            for _ in range(feature_table_padding):
-                outfile.write(np.string_(" ").tobytes())
-            outfile.write(np.string_(batch_table_json_min).tobytes())
-            outfile.write(timep[::step].astype(np.float32).tobytes())
-            outfile.write(cartographic[::step, :].tobytes())
-            for _ in range(batch_table_padding):
-                outfile.write(np.string_(" ").tobytes())
-            outfile.seek(0)
+        feature_arrays = [
+            ("BATCH_ID", np.arange(length, dtype=np.uint32), {"componentType": "UNSIGNED_INT"}),
+            ("POSITION_QUANTIZED", cartesian[select, :], {}),
+            ("RGBA", ccode[select, :], {})
+        ]
+        batch_arrays = [(name, array[select], {"componentType": "FLOAT", "type": "SCALAR"}) for name, array in variables]
+        batch_arrays += [
+            ("time", timep[select], {"componentType": "FLOAT", "type": "SCALAR"}),
+            ("location", cartographic[select, :], {"componentType": "SHORT", "type": "VEC3"})
+        ]
+
+        feature_table, feature_arrays, batch_arrays = compact(feature_table, feature_arrays, batch_arrays,
+                                                              profile, tileset.palette, ranges)
+        sink.write(filename, encode_tile(format, feature_table, feature_arrays, {}, batch_arrays))
  
-    outfile = open(folder+"/tileset.json", "w")
-    outfile.write(json.dumps(tileset.json))
-
-
-def cartographic_to_cartesian(lon,lat,alt):
-    size = lon.size
-
-    cartographic = np.zeros(shape=(size, 3), dtype=np.int16)
-    cartographic[:, 0] = (lon * 32767 / 180).astype(np.int16)
-    cartographic[:, 1] = (lat * 32767 / 180).astype(np.int16)
-    cartographic[:, 2] = (alt / 10).astype(np.int16)
-
-    lon = lon * to_rad
-    lat = lat * to_rad
-
-    radiiSquared = np.array([40680631590769, 40680631590769, 40408299984661.445], dtype=np.float64)
-
-    N1 = np.multiply(np.cos(lat), np.cos(lon))
-    N2 = np.multiply(np.cos(lat), np.sin(lon))
-    N3 = np.sin(lat)
-
-    magnitude = np.sqrt(np.square(N1) + np.square(N2) + np.square(N3))
-
-    N1 = N1 / magnitude
-    N2 = N2 / magnitude
-    N3 = N3 / magnitude
-
-    K1 = radiiSquared[0] * N1
-    K2 = radiiSquared[1] * N2
-    K3 = radiiSquared[2] * N3
-
-    gamma = np.sqrt(np.multiply(N1, K1) + np.multiply(N2, K2) + np.multiply(N3, K3))
-
-    K1 = K1 / gamma
-    K2 = K2 / gamma
-    K3 = K3 / gamma
-
-    N1 = np.multiply(N1, alt)
-    N2 = np.multiply(N2, alt)
-    N3 = np.multiply(N3, alt)
-
-    # x = np.multiply((N1 + K1), np.random.normal(1, .00005, N1.size))
-    # y = np.multiply((N2 + K2), np.random.normal(1, .00005, N1.size))
-    # z = np.multiply((N3 + K3), np.random.normal(1, .00005, N1.size))
-
-    x = N1 + K1
-    y = N2 + K2
-    z = N3 + K3
-
-    offset = [float(np.min(x)), float(np.min(y)), float(np.min(z))]
-
-    x = x - offset[0]
-    y = y - offset[1]
-    z = z - offset[2]
-
-    scale = [float(abs(np.max(x))), float(abs(np.max(y))), float(abs(np.max(z)))]
-
-    cartesian = np.zeros(shape=(size, 3), dtype=np.uint16)
-    cartesian[:, 0] = (x / scale[0] * 65535.0).astype(np.uint16)
-    cartesian[:, 1] = (y / scale[1] * 65535.0).astype(np.uint16)
-    cartesian[:, 2] = (z / scale[2] * 65535.0).astype(np.uint16)
-
-    region = [
-        float(np.min(lon)),
-        float(np.min(lat)),
-        float(np.max(lon)),
-        float(np.max(lat)),
-        float(np.min(alt)),
-        float(np.max(alt))
-    ]
-
-    return cartesian, offset, scale, cartographic, region
+    if(tileset.palette.colors):
+        tileset.json["properties"]["palette"] = tileset.palette.colors  # <--class index -> RGBA
+        tileset.json["properties"]["style"] = tileset.palette.style()
+    if(variables):
+        tileset.json["properties"]["variables"] = names
+        tileset.json["properties"]["styles"] = {name: variable_style(name, profile) for name in names}  # <--one per variable
+    sink.write("tileset.json", json.dumps(assemble(tileset.json)))  # <--chains grouped into a balanced tree
+
+
+KWS = {'Vel': {'bot':-10, 'top':10, 'intv':1,'cmap': 'bwr'},  #'bwr', 'cool'
+       'spW': {'bot':  0, 'top':20, 'intv':1,'cmap': 'cool'}, #'winter', 'cool', 'YlGnBu'
+       'LDR': {'bot':-30, 'top': 0, 'intv':1,'cmap': 'YlGnBu'},
+       'dBZe': {'bot':-25, 'top':50, 'intv':1},  #<--color_encodeDBZ
+       }
+
+def style_range(vname):
+    """(low, high) of the compact grid of vname: a step past the style's classes, so values outside stay uncolored"""
+    kws = KWS[vname]
+    return kws['bot'] - kws['intv'], kws['top'] + kws['intv']
 
+def variable_style(vname, profile="full"):
+    """Cesium 3D Tiles style coloring points by their vname batch attribute, in the colors of the tiles"""
+    kws = KWS[vname]
+    vbot, vtop, vint = kws['bot'], kws['top'], kws['intv']
+    lows = vbot + np.arange(int((vtop - vbot)/vint)) * vint
+    mids = lows + vint/2.
+    colors = color_encodeDBZ(mids) if(vname=='dBZe') else color_encodeOthers(mids, vname)
+    bounds = np.append(lows, lows[-1] + vint)
+    if(profile != "full"):
+        bounds = grid_value(bounds, *style_range(vname))  # <--compact tiles store uint16 on the grid of style_range
+    conditions = [["${{{0}}} > {1} && ${{{0}}} <= {2}".format(vname, low, high),
+                   "rgba({}, {}, {}, {})".format(r, g, b, a / 255.0)]
+                  for low, high, (r, g, b, a) in zip(bounds[:-1].tolist(), bounds[1:].tolist(), colors.tolist())]
+    return {"color": {"conditions": conditions + [["true", "rgba(0, 0, 0, 0)"]]}}
 
 def color_encodeOthers(var, vname):
-    KWS = {'Vel': {'bot':-10, 'top':10, 'intv':1,'cmap': 'bwr'},  #'bwr', 'cool'
-           'spW': {'bot':  0, 'top':20, 'intv':1,'cmap': 'cool'}, #'winter', 'cool', 'YlGnBu'
-           'LDR': {'bot':-30, 'top': 0, 'intv':1,'cmap': 'YlGnBu'},
-           }
     kws = KWS[vname]
     
     if('spW' in vname or 'Vel' in vname or 'DOP' in vname or 'LDR' in vname):
@@ -1,3 +1,4 @@
+import sys
 import os
 import zarr
 import numpy as np
@@ -9,9 +10,12 @@ import s3fs
 import h5py
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../.."))  # <--repo root, for the shared utils package
 from cpl_utils.ingest_utils import add24hr,  CRSaccess
-from cpl_utils.point_cloud import generate_point_cloud
-from cpl_utils.s3_updnload import upload_to_s3
+from utils.point_cloud import generate_point_cloud
+from utils.store import write_store, complete
+from utils.sink import S3Sink
+from utils.manifest import ManifestSink, load_manifest
 
 
 # META needed for ingest
@@ -20,28 +24,17 @@ collection = "AirborneRadar"
 dataset = "gpmValidationOlympexcrs"
 variables = ["ref"]
 renderers = ["point_cloud"]
-chunk = 262144
 to_rad = np.pi / 180
 to_deg = 180 / np.pi
 
-def ingest(folder, file, s3bucket):
+def ingest(folder, file, s3bucket, options=None):
     """
     Converts Level 1B crs data from s3 to zarr file and then stores it in the provided folder
     Args:
         folder (string): name to hold the raw files.
         file (string): the s3 url to the raw file. WHAT FORMAT IS IT IN in hdf5 format
+        options (dict): codec, chunk size, sharding of the zarr store (see store.write_store).
     """
-    store = zarr.DirectoryStore(folder)
-    root = zarr.group(store=store)
-    
-    # Create empty rows for modified data    
-    z_chunk_id = root.create_dataset('chunk_id', shape=(0, 2), chunks=None, dtype=np.int64)
-    z_location = root.create_dataset('location', shape=(0, 3), chunks=(chunk, None), dtype=np.float32)
-    z_time = root.create_dataset('time', shape=(0), chunks=(chunk), dtype=np.int32)
-    z_vars = root.create_group('value')
-    z_ref = z_vars.create_dataset('atb', shape=(0), chunks=(chunk), dtype=np.float32)
-    n_time = np.array([], dtype=np.int64)
-
     date = file.split("_")[5].split(".")[0]
     base_time = np.datetime64('{}-{}-{}'.format(date[:4], date[4:6], date[6:]))
 
@@ -99,30 +92,13 @@ def ingest(folder, file, s3bucket):
     atb = atb[mask]
     time = time[mask]
 
-    # Now populate (append) the empty rows with modified data.
-    z_location.append(np.stack([lon, lat, alt], axis=-1))
-    z_ref.append(atb)
-    n_time = np.append(n_time, time)
-
-    idx = np.arange(0, n_time.size, chunk)
-    chunks = np.zeros(shape=(idx.size, 2), dtype=np.int64)
-    chunks[:, 0] = idx
-    chunks[:, 1] = n_time[idx]
-    z_chunk_id.append(chunks)
-
-    epoch = np.min(n_time)
-    n_time = (n_time - epoch).astype(np.int32)
-    z_time.append(n_time)
-
-    # save it.
-    root.attrs.put({
+    write_store(folder, lon, lat, alt, time, {"atb": atb}, {
         "campaign": campaign,
         "collection": collection,
         "dataset": dataset,
         "variables": variables,
-        "renderers": renderers,
-        "epoch": int(epoch)
-    })
+        "renderers": renderers
+    }, **(options or {}))
 
 #UTILS
 def down_vector(roll, pitch, head):
@@ -134,7 +110,8 @@ def down_vector(roll, pitch, head):
 
 # ------------------START--------------------------------
 
-def data_pre_process(bucket_name, field_campaign, input_data_dir, output_data_dir, instrument_name):
+def data_pre_process(bucket_name, field_campaign, input_data_dir, output_data_dir, instrument_name, zarr_path=None,
+                     storage_options=None):
     s3_resource = boto3.resource('s3')
     s3bucket = s3_resource.Bucket(bucket_name)    
     keys = []
@@ -148,25 +125,25 @@ def data_pre_process(bucket_name, field_campaign, input_data_dir, output_data_di
         sdate = s3_raw_file_key.split("_")[5].split(".")[0]
         print(f'processing CRS file {s3_raw_file_key}')
 
-        # CREATE A LOCAL DIR TO HOLD RAW DATA AND CONVERTED DATA
-        folder = f"/tmp/cpl_olympex/zarr/{sdate}"
-        point_cloud_folder = f"{folder}/point_cloud"
-        if os.path.exists(folder): shutil.rmtree(f"{folder}")
-        # os.mkdir(folder)
-        Path(folder).mkdir(parents=True, exist_ok=True)
+        if (zarr_path):
+            # KEEP THE ZARR STORE ON S3, AN EXISTING ONE IS TILED AGAIN WITHOUT RE-INGESTING.
+            folder = f"{zarr_path}/{field_campaign}/{instrument_name}/{sdate}"
+        else:
+            # CREATE A LOCAL DIR TO HOLD RAW DATA AND CONVERTED DATA
+            folder = f"/tmp/cpl_olympex/zarr/{sdate}"
+            if os.path.exists(folder): shutil.rmtree(f"{folder}")
+            # os.mkdir(folder)
+            Path(folder).mkdir(parents=True, exist_ok=True)
         # LOAD FROM SOURCE WITH NECESSARY PRE PROCESSING. CONVERT LEVEL 1B RAW FILES INTO ZARR FILE.
         src_s3_path = f"s3://{bucket_name}/{s3_raw_file_key}"
-        ingest(folder, src_s3_path, bucket_name)
-        # CONVERT ZARR FILE INTO 3D TILESET JSON.
-        generate_point_cloud("atb",  0,  1000000000000, folder, point_cloud_folder)
-        # UPLOAD CONVERTED FILES.
-        files = os.listdir(point_cloud_folder)
-        s3 = boto3.client('s3')
-        for file in files:
-            fname = os.path.join(point_cloud_folder, file) # SOURCE
-            s3name = f"{field_campaign}/{output_data_dir}/cpl/{sdate}/{file}" # DESTINATION
-            print(f"uploaded to {s3name}.")
-            upload_to_s3(fname, bucket_name, s3_name=s3name)
+        if (not complete(folder, storage_options)):
+            ingest(folder, src_s3_path, bucket_name, {"storage_options": storage_options})
+        # CONVERT ZARR FILE INTO 3D TILESET JSON, UPLOADED WHILE THE TILES ARE ENCODED.
+        s3path = f"s3://{bucket_name}/{field_campaign}/{output_data_dir}/cpl/{sdate}" # DESTINATION
+        with S3Sink(s3path, encoding="gzip") as s3, ManifestSink(s3, load_manifest(s3path)) as sink:
+            generate_point_cloud("atb",  0,  1000000000000, folder, None, sink=sink,
+                                 storage_options=storage_options)
+        print(f"uploaded to {s3path}.")
 
 
 def cpl():
@@ -176,7 +153,8 @@ def cpl():
     input_data_dir = "instrument-raw-data"
     output_data_dir = "instrument-processed-data"
     instrument_name = "cpl"
-    data_pre_process(bucket_name, field_campaign, input_data_dir, output_data_dir, instrument_name)
+    data_pre_process(bucket_name, field_campaign, input_data_dir, output_data_dir, instrument_name,
+                     os.getenv('ZARR_STORE_PATH'))
 
 
 cpl()
\ No newline at end of file
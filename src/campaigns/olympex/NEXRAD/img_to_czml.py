@@ -1,3 +1,4 @@
+import gzip
 import boto3
 import os
 from nexrad_czml_writer import NexradCzmlWriter
@@ -46,7 +47,8 @@ def data_pre_process(bucket_name, field_campaign, input_data_dir, output_data_di
         output_czml = czml_writer.get_string()
         output_name = f"olympex_Level2_{group_date}"
         outfile = f"{field_campaign}/{output_data_dir}/{instrument_name}/{instrument_location}/{output_name}.czml"
-        s3_client.put_object(Body=output_czml, Bucket=bucket_name, Key=outfile)
+        s3_client.put_object(Body=gzip.compress(output_czml.encode(), mtime=0), Bucket=bucket_name, Key=outfile,
+                             ContentType="application/json", ContentEncoding="gzip")
         print(f"NEXRAD czml conversion for {group_date} done.")
     print(f"***All NEXRAD conversion for {instrument_location} Complete!***")
 
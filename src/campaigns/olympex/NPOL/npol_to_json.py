@@ -1,4 +1,6 @@
+import sys
 import os
+import json
 import zarr
 import numpy as np
 import shutil
@@ -8,8 +10,13 @@ from boto3 import client as boto_client
 import tarfile
 import glob
 
-from npol_utils.point_cloud import generate_point_cloud
-from npol_utils.s3_updnload import upload_to_s3
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../.."))  # <--repo root, for the shared utils package
+from utils.point_cloud import generate_point_cloud
+from utils.store import write_store, complete
+from utils.sink import S3Sink
+from utils.manifest import ManifestSink, load_manifest
+from utils.timeline import TimelineSink
+from utils.compress import put_compressed
 from uf_reader import Reader as UFReader
 
 from npol_czml_writer import NpolCzmlWriter
@@ -23,28 +30,17 @@ collection = "AirborneRadar"
 dataset = "gpmValidationOlympexcrs"
 variables = ["ref"]
 renderers = ["point_cloud"]
-chunk = 262144
 to_rad = np.pi / 180
 to_deg = 180 / np.pi
 
-def ingest(folder, filePath):
+def ingest(folder, filePath, options=None):
     """
     Converts Level 1B crs data from s3 to zarr file and then stores it in the provided folder
     Args:
         folder (string): name to hold the raw files.
         file (string): the s3 url to the raw file. WHAT FORMAT IS IT IN in hdf5 format
+        options (dict): codec, chunk size, sharding of the zarr store (see store.write_store).
     """
-    store = zarr.DirectoryStore(folder)
-    root = zarr.group(store=store)
-    
-    # Create empty rows for modified data    
-    z_chunk_id = root.create_dataset('chunk_id', shape=(0, 2), chunks=None, dtype=np.int64)
-    z_location = root.create_dataset('location', shape=(0, 3), chunks=(chunk, None), dtype=np.float32)
-    z_time = root.create_dataset('time', shape=(0), chunks=(chunk), dtype=np.int32)
-    z_vars = root.create_group('value')
-    z_ref = z_vars.create_dataset('atb', shape=(0), chunks=(chunk), dtype=np.float32)
-    n_time = np.array([], dtype=np.int64)
-
     print("Accessing file to convert to zarr ")
 
     ufr = UFReader(filePath)
@@ -82,31 +78,13 @@ def ingest(folder, filePath):
     atb = atb[sort_idx]
     time = time[sort_idx]
 
-    # Now populate (append) the empty rows with modified data.
-    z_location.append(np.stack([lon, lat, alt], axis=-1))
-    z_ref.append(atb)
-
-    n_time = np.append(n_time, time)
-
-    idx = np.arange(0, n_time.size, chunk)
-    chunks = np.zeros(shape=(idx.size, 2), dtype=np.int64)
-    chunks[:, 0] = idx
-    chunks[:, 1] = n_time[idx]
-    z_chunk_id.append(chunks)
-
-    epoch = np.min(n_time)
-    n_time = (n_time - epoch).astype(np.int32)
-    z_time.append(n_time)
-
-    # save it.
-    root.attrs.put({
+    write_store(folder, lon, lat, alt, time, {"atb": atb}, {
         "campaign": campaign,
         "collection": collection,
         "dataset": dataset,
         "variables": variables,
-        "renderers": renderers,
-        "epoch": int(epoch)
-    })
+        "renderers": renderers
+    }, **(options or {}))
 
 def downloadFromS3(bucket_name, s3_key, dest_dir):
     s3 = boto_client('s3')
@@ -135,7 +113,8 @@ def untarr(raw_file_dir, raw_file_path, filename):
 
 # ------------------START--------------------------------
 
-def data_pre_process(bucket_name, field_campaign, input_data_dir, output_data_dir, instrument_name):
+def data_pre_process(bucket_name, field_campaign, input_data_dir, output_data_dir, instrument_name, consolidate=False,
+                     zarr_path=None, storage_options=None):
     # for s3_raw_file_key in keys:
     # download each input file.
     # unzip it
@@ -170,40 +149,57 @@ def data_pre_process(bucket_name, field_campaign, input_data_dir, output_data_di
         filtered_files.sort()
         # for the list of uf files within a single day, find the availability date time for each of them.
         availability_time_range = collectAvailabilityDateTimeRange(filtered_files)
+        # consolidated: one tileset.json for the day, a child per volume (see timeline)
+        timeline = None
         for index, minute_data_path in enumerate(filtered_files):
         # iterate to create 3d tiles.
             print(f"\n{index}. converting for {minute_data_path}")
             # convert and save.
             # # SOURCE DIR.
             sdate = minute_data_path.split("/")[-1].split("_")[2]
-            # CREATE A LOCAL DIR TO HOLD RAW DATA AND CONVERTED DATA
             tileFolder = minute_data_path.split("/")[-1].split(".")[0]
-            folder = f"/tmp/npol_olympex/zarr/{sdate}/{tileFolder}" # intermediate folder for zarr file (date + time), time rep by index.
-            point_cloud_folder = f"{folder}/point_cloud" # intermediate folder for 3d tiles, point cloud
-            if os.path.exists(folder): shutil.rmtree(f"{folder}")
-            # os.mkdir(folder)
-            Path(folder).mkdir(parents=True, exist_ok=True)
+            if (zarr_path):
+                # KEEP THE ZARR STORE ON S3, AN EXISTING ONE IS TILED AGAIN WITHOUT RE-INGESTING.
+                folder = f"{zarr_path}/{field_campaign}/{instrument_name}/{sdate}/{tileFolder}"
+            else:
+                # CREATE A LOCAL DIR TO HOLD RAW DATA AND CONVERTED DATA
+                folder = f"/tmp/npol_olympex/zarr/{sdate}/{tileFolder}" # intermediate folder for zarr file (date + time), time rep by index.
+                if os.path.exists(folder): shutil.rmtree(f"{folder}")
+                # os.mkdir(folder)
+                Path(folder).mkdir(parents=True, exist_ok=True)
             # LOAD FROM SOURCE WITH NECESSARY PRE PROCESSING. CONVERT LEVEL 1B RAW FILES INTO ZARR FILE.
-            ingest(folder, minute_data_path)
-            # # CONVERT ZARR FILE INTO 3D TILESET JSON.
-            generate_point_cloud("atb",  0,  1000000000000, folder, point_cloud_folder)
-            # # UPLOAD CONVERTED 3d Tiles (Pointcloud) FILES.
-            files = os.listdir(point_cloud_folder)
-            for file in files:
-                fname = os.path.join(point_cloud_folder, file) # SOURCE
-                s3name = f"{field_campaign}/{output_data_dir}/npol/{sdate}/{tileFolder}/{file}" # DESTINATION
-                print(f"uploaded to {s3name}.")
-                upload_to_s3(fname, bucket_name, s3_name=s3name)
-            # after uploading the 3d tile point cloud, track them in the czml.
-            tileLocation = f"https://{bucket_name}.s3.amazonaws.com/{field_campaign}/{output_data_dir}/{instrument_name}/{sdate}/{tileFolder}/tileset.json"
+            if (not complete(folder, storage_options)):
+                ingest(folder, minute_data_path, {"storage_options": storage_options})
             avail_start = availability_time_range[index][0]
             avail_end = availability_time_range[index][1]
+            # # CONVERT ZARR FILE INTO 3D TILESET JSON, UPLOADED WHILE THE TILES ARE ENCODED.
+            if (consolidate):
+                if (timeline is None):
+                    day_sink = S3Sink(f"s3://{bucket_name}/{field_campaign}/{output_data_dir}/npol/{sdate}", encoding="gzip")
+                    timeline = TimelineSink(day_sink, "NPOL")
+                volume_sink = timeline.subfolder(tileFolder, f"{avail_start}/{avail_end}")
+                generate_point_cloud("atb",  0,  1000000000000, folder, None, sink=volume_sink,
+                                     storage_options=storage_options)
+                continue
+            s3path = f"s3://{bucket_name}/{field_campaign}/{output_data_dir}/npol/{sdate}/{tileFolder}" # DESTINATION
+            with S3Sink(s3path, encoding="gzip") as s3, ManifestSink(s3, load_manifest(s3path)) as sink:
+                generate_point_cloud("atb",  0,  1000000000000, folder, None, sink=sink,
+                                     storage_options=storage_options)
+            print(f"uploaded to {s3path}.")
+            # after uploading the 3d tile point cloud, track them in the czml.
+            tileLocation = f"https://{bucket_name}.s3.amazonaws.com/{field_campaign}/{output_data_dir}/{instrument_name}/{sdate}/{tileFolder}/tileset.json"
             czml_writer.add3dTiles(index, tileLocation, avail_start, avail_end)
             print(f"NPOL 3d tile conversion for {sdate} done.")
         # upload the czml.
-        output_czml = czml_writer.get_string()
+        if (timeline is not None):
+            timeline.close()
+            day_sink.close()
+            tileLocation = f"https://{bucket_name}.s3.amazonaws.com/{field_campaign}/{output_data_dir}/{instrument_name}/{sdate}/tileset.json"
+            output_czml = json.dumps(timeline.czml("CZML NPOL", tileLocation))
+        else:
+            output_czml = czml_writer.get_string()
         outfile = f"{field_campaign}/{output_data_dir}/{instrument_name}/{sdate}/knit.czml"
-        s3_client.put_object(Body=output_czml, Bucket=bucket_name, Key=outfile)
+        put_compressed(s3_client, bucket_name, outfile, output_czml)
         print(f"NPOL CZML conversion for {sdate} done.")
 
 def npol():
@@ -213,7 +209,8 @@ def npol():
     input_data_dir = "instrument-raw-data"
     output_data_dir = "instrument-processed-data"
     instrument_name = "npol"
-    data_pre_process(bucket_name, field_campaign, input_data_dir, output_data_dir, instrument_name)
+    data_pre_process(bucket_name, field_campaign, input_data_dir, output_data_dir, instrument_name,
+                     zarr_path=os.getenv('ZARR_STORE_PATH'))
 
 
 npol()
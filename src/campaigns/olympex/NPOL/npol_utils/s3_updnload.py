@@ -2,6 +2,7 @@ import os
 import boto3
 from botocore.exceptions import ClientError, NoCredentialsError
 import os.path
+from utils.compress import upload_compressed
 
 def download_s3(bucket, s3key, dirPath, filename=None):
     """download a file from an S3 bucket to local disk
@@ -38,17 +39,22 @@ def downloadBatch_s3(bucket, s3prefix, dirPath):
             #print(f'file {destination_file} already exists')
 
 
-def upload_to_s3(file_name, bucket, s3_name=None):
+def upload_to_s3(file_name, bucket, s3_name=None, encoding=None):
     """Upload a file to an S3 bucket
      file_name: File to upload
      bucket: S3 bucket to upload to
      object_name: S3 object name. If not specified then file_name is used
+     encoding: "gzip" or "br" uploads a compressed copy with Content-Encoding set
+               (small and already compressed files go as they are, see compress.py)
     """
     if s3_name is None: s3_name = file_name
 
     s3 = boto3.client('s3')
     try:
-        s3.upload_file(file_name, bucket, s3_name)
+        if (encoding):
+            upload_compressed(s3, file_name, bucket, s3_name, encoding)
+        else:
+            s3.upload_file(file_name, bucket, s3_name)
     except ClientError as e:
        print(e)
     except NoCredentialsError:
@@ -0,0 +1,49 @@
+import os
+import json
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # <--repo root, for utils
+from utils.store import write_store
+
+epoch = 1447000000
+
+
+def points(n, seed=0):
+    """lon/lat/alt/value/time of n time-sorted points along a track"""
+    rng = np.random.default_rng(seed)
+    track = np.linspace(0, 1, n)
+    lon = -124.0 + 3.0 * track
+    lat = 46.0 + 2.0 * track
+    alt = rng.uniform(0, 15000, n)
+    value = rng.normal(20, 10, n)
+    time = epoch + np.arange(n, dtype=np.int64) // 10
+    return lon, lat, alt, value, time
+
+
+@pytest.fixture
+def store(tmp_path):
+    """an ingest store of 5000 points (variable "ref"), chunk 1000"""
+    lon, lat, alt, value, time = points(5000)
+    location = str(tmp_path / "store.zarr")
+    write_store(location, lon, lat, alt, time, {"ref": value}, {}, chunk=1000)
+    return location
+
+
+def parse_pnts(tile):
+    """(feature table, feature binary, batch table, batch binary) of a .pnts tile, checking its header"""
+    tile = bytes(tile)
+    assert tile[:4] == b"pnts"
+    version, length, feature_json, feature_bin, batch_json, batch_bin = np.frombuffer(tile, np.uint32, 6, 4)
+    assert version == 1 and length == len(tile)
+    offset = 28
+    feature_table = json.loads(tile[offset:offset + feature_json])
+    offset += feature_json
+    assert offset % 8 == 0
+    feature_body = tile[offset:offset + feature_bin]
+    offset += feature_bin
+    batch_table = json.loads(tile[offset:offset + batch_json]) if (batch_json) else {}
+    offset += batch_json
+    assert offset % 8 == 0 and offset + batch_bin == length
+    return feature_table, feature_body, batch_table, tile[offset:]
@@ -0,0 +1,75 @@
+import io
+import json
+import zipfile
+import numpy as np
+import pytest
+from utils.archive import pack, write_index, path_hash, parse_range, value_filter, TilesetArchive, index_name
+
+
+def tileset_folder(path):
+    (path / "tiles").mkdir(parents=True)
+    (path / "tileset.json").write_text(json.dumps({"root": {"content": {"uri": "tiles/0.pnts"}}}))
+    (path / "tiles" / "0.pnts").write_bytes(b"pnts" * 100)
+    (path / "tiles" / "1.pnts").write_bytes(bytes(range(256)))
+    return path
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_pack_and_read(tmp_path, compression):
+    folder = tileset_folder(tmp_path / "tileset")
+    filename = str(tmp_path / "tileset.3tz")
+    assert pack(str(folder), filename, compression) == 3
+    archive = TilesetArchive(filename)
+    assert sorted(archive.names()) == ["tiles/0.pnts", "tiles/1.pnts", "tileset.json"]
+    for name in archive.names():
+        assert archive.read(name) == (folder / name).read_bytes()
+    with pytest.raises(KeyError):
+        archive.read("tiles/2.pnts")
+    assert archive.read_range(0, 4) == b"PK\x03\x04"
+    archive.close()
+
+
+def test_index_is_sorted_by_path_hash():
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, mode='w') as archive:
+        for i in range(50):
+            archive.writestr("{}.pnts".format(i), b"x")
+        write_index(archive)
+    with zipfile.ZipFile(data) as archive:
+        assert archive.namelist()[-1] == index_name
+        index = np.frombuffer(archive.read(index_name), dtype=np.uint64).reshape(-1, 3)
+        offsets = {info.filename: info.header_offset for info in archive.infolist()}
+    assert len(index) == 50
+    keys = [tuple(entry[:2]) for entry in index]
+    assert keys == sorted(keys)
+    for low, high, offset in index:
+        name = [name for name in offsets if (path_hash(name) == (low, high))][0]
+        assert offsets[name] == offset
+
+
+def test_not_an_archive():
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, mode='w') as archive:
+        archive.writestr("tileset.json", b"{}")
+    with pytest.raises(ValueError):
+        TilesetArchive(data)
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 10)
+    assert parse_range("bytes=90-", 100) == (90, 100)
+    assert parse_range("bytes=-10", 100) == (90, 100)
+    assert parse_range("bytes=0-999", 100) == (0, 100)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+def test_value_filter():
+    child = {"content": {"uri": "1.pnts"}, "extras": {"statistics": {"count": 5, "minimum": 50, "maximum": 60}}}
+    root = {"content": {"uri": "0.pnts"}, "extras": {"statistics": {"count": 10, "minimum": 0, "maximum": 60}},
+            "children": [child]}
+    body = json.dumps({"root": root}).encode()
+    assert json.loads(value_filter(body, "0,10"))["root"]["children"] == []
+    assert json.loads(value_filter(body, "55,"))["root"]["children"] == [child]
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from conftest import epoch, points
+from utils.chunk_index import ChunkIndex, select_ranges, read_ranges, point_mask
+from utils.store import open_store
+
+
+def test_index_of_the_store(store):
+    index = ChunkIndex.load(open_store(store))
+    lon, lat, alt, value, time = points(5000)
+    assert index.start.tolist() == [0, 1000, 2000, 3000, 4000]
+    assert index.time[1].tolist() == [time[1000], time[1999]]
+    assert index.bbox[0].tolist() == pytest.approx([lon[0], lat[0], lon[999], lat[999],
+                                                    alt[:1000].min(), alt[:1000].max()], rel=1e-6)
+    assert index.value["ref"][4].tolist() == pytest.approx([value[4000:].min(), value[4000:].max()], rel=1e-6)
+
+
+def test_select(store):
+    index = ChunkIndex.load(open_store(store))
+    assert index.select().tolist() == [0, 1, 2, 3, 4]
+    assert index.select(epoch + 150, epoch + 250).tolist() == [1, 2]
+    assert index.select(epoch + 100, epoch + 100).tolist() == [1]  # <--the first second of chunk 1
+    assert index.select(epoch + 1000, epoch + 2000).tolist() == []
+    lon, lat, _, _, _ = points(5000)
+    assert index.select(bbox=[lon[2500], 40, lon[3500], 50]).tolist() == [2, 3]
+    assert index.select(bbox=[-130, 40, -110, 50, 20000, 30000]).tolist() == []
+    assert index.select(variable="ref", value_range=[1000, None]).tolist() == []
+    assert index.ranges([0, 1, 3]) == [(0, 2000), (3000, 4000)]
+
+
+@pytest.mark.parametrize("window, bbox, value_range", [
+    ((epoch + 120, epoch + 330), None, None),
+    ((epoch, epoch + 500), [-123.5, 40, -122.5, 50], None),
+    ((epoch, epoch + 500), None, [45, None]),
+])
+def test_ranges_hold_every_selected_point(store, window, bbox, value_range):
+    root = open_store(store)
+    ranges = select_ranges(root, *window, bbox, "ref", value_range)
+    lon, lat, alt, value, time = points(5000)
+    wanted = (time >= window[0]) & (time <= window[1]) & point_mask(lon, lat, alt, value, bbox, value_range)
+    selected = np.zeros(5000, dtype=bool)
+    for start, end in ranges:
+        selected[start:end] = True
+    assert wanted.any() and not (wanted & ~selected).any()
+    assert read_ranges(root["time"], ranges).size == selected.sum()
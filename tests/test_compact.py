@@ -0,0 +1,83 @@
+import json
+import numpy as np
+import pytest
+from conftest import epoch, points, parse_pnts
+from utils.compact import compact, quantize, grid_value, Palette
+from utils.point_cloud import generate_point_cloud
+from utils.partition import Partitioner
+from utils.tileset import PointCloud
+from utils.sink import MemorySink
+
+
+def tile(value):
+    n = value.size
+    feature_table = {"POINTS_LENGTH": n, "BATCH_LENGTH": n}
+    feature_arrays = [("BATCH_ID", np.arange(n, dtype=np.uint32), {"componentType": "UNSIGNED_INT"}),
+                      ("RGBA", np.tile([[255, 0, 0, 255]], (n, 1)).astype(np.uint8), {})]
+    batch_arrays = [("value", value, {"componentType": "FLOAT", "type": "SCALAR"}),
+                    ("location", np.zeros((n, 3), dtype=np.int16), {"componentType": "SHORT", "type": "VEC3"})]
+    return feature_table, feature_arrays, batch_arrays
+
+
+def test_compact_drops_batch_id_and_location():
+    palette = Palette()
+    feature_table, features, batch = compact(*tile(np.linspace(-5, 5, 11)), palette=palette)
+    assert "BATCH_LENGTH" not in feature_table
+    assert [name for name, _, _ in features] == []
+    assert [name for name, _, _ in batch] == ["class", "value"]
+    assert palette.colors == [(255, 0, 0, 255)]
+
+
+def test_quantize_round_trip():
+    value = np.random.default_rng(1).normal(0, 10, 1000)
+    q, offset, scale = quantize(value)
+    assert q.dtype == np.uint16
+    assert np.abs(offset + q * scale - value).max() <= scale / 2 + 1e-9
+
+
+def test_threshold_survives_round_trip():
+    # two tiles with different value spans share the grid of ranges, so a style threshold
+    # written in its quantized units classifies their points as the physical one does
+    # (values stay 0.05 off the thresholds, more than the quantization error)
+    low, high = -26, 51
+    threshold = grid_value(np.array([10.0, 20.0]), low, high)
+    for values in (np.linspace(-20, 30, 501) + 0.05, np.linspace(5, 45, 401) - 0.05):
+        _, _, batch = compact(*tile(values), palette=Palette(), ranges={"value": (low, high)})
+        _, q, properties = batch[1]
+        assert (properties["offset"], properties["scale"]) == (low, (high - low) / 65535)
+        assert ((q > threshold[0]) & (q <= threshold[1]) == (values > 10) & (values <= 20)).all()
+        assert np.abs(properties["offset"] + q * properties["scale"] - values).max() <= properties["scale"]
+
+
+def test_values_outside_the_range_are_clipped():
+    q, offset, scale = quantize(np.array([-100.0, 0.0, 100.0]), 16, -10, 10)
+    assert q.tolist() == [0, 32768, 65535]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_chain_tiles_share_the_tileset_grid(store, stream):
+    sink = MemorySink()
+    generate_point_cloud("ref", epoch + 100, epoch + 400, store, "out", profile="compact", stream=stream,
+                         partitioner=Partitioner(max_points=1000), sink=sink)
+    grids = json.loads(sink.contents["tileset.json"])["properties"]["grids"]
+    _, _, _, value, time = points(5000)
+    assert grids["value"]["offset"] == pytest.approx(value.astype(np.float32).min())
+    assert grids["time"]["offset"] == 100
+    tiles = [name for name in sink.contents if (name.endswith(".pnts"))]
+    assert len(tiles) > 6
+    for name in tiles:
+        _, _, batch_table, _ = parse_pnts(sink.contents[name])
+        for array in ("value", "time"):
+            assert batch_table[array]["offset"] == grids[array]["offset"]
+            assert batch_table[array]["scale"] == grids[array]["scale"]
+
+
+def test_compact_cloud_needs_its_grids():
+    lon, lat, alt, value, time = points(10)
+    with pytest.raises(ValueError):
+        PointCloud(None, lon, lat, alt, value, time, epoch, profile="compact", sink=MemorySink())
+    with pytest.raises(ValueError):
+        PointCloud(None, lon, lat, alt, value, time, epoch, profile="compact", sink=MemorySink(),
+                   ranges={"value": (0, 1)})
+    PointCloud(None, lon, lat, alt, value, time, epoch, profile="compact", sink=MemorySink(),
+               ranges={"value": (0, 1), "time": (0, 1)})
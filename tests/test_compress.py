@@ -0,0 +1,49 @@
+import gzip
+import pytest
+import utils.compress
+from utils.compress import encode_artifact, decompress, put_compressed, content_type
+
+tile = b"pnts" + bytes(4000)  # <--compresses well
+
+
+class Client:
+    def __init__(self):
+        self.objects = {}
+
+
+    def put_object(self, Body, Bucket, Key, **extra):
+        self.objects[Bucket, Key] = (Body, extra)
+
+
+def test_encode_artifact():
+    body, extra = encode_artifact(tile, "0_1.pnts")
+    assert extra == {"ContentType": "application/octet-stream", "ContentEncoding": "gzip"}
+    assert decompress(body, "gzip") == tile
+    assert encode_artifact(tile, "0_1.pnts") == (body, extra)  # <--same input, same bytes
+
+
+@pytest.mark.parametrize("data, filename", [(b"{}", "tileset.json"), (tile, "tile1.3tz"), (tile, "image.png")])
+def test_left_as_they_are(data, filename):
+    body, extra = encode_artifact(data, filename)
+    assert body == data and "ContentEncoding" not in extra
+
+
+def test_no_encoding():
+    assert encode_artifact(tile, "0_1.pnts", encoding=None) == (tile, {"ContentType": "application/octet-stream"})
+
+
+def test_brotli_falls_back_to_gzip(monkeypatch):
+    monkeypatch.setattr(utils.compress, "brotli", None)
+    body, extra = encode_artifact(tile, "0_1.pnts", encoding="br")
+    assert extra["ContentEncoding"] == "gzip" and gzip.decompress(body) == tile
+    with pytest.raises(ImportError):
+        decompress(body, "br")
+
+
+def test_put_compressed():
+    s3 = Client()
+    put_compressed(s3, "bucket", "prefix/tileset.json", "{}" * 1000)
+    body, extra = s3.objects["bucket", "prefix/tileset.json"]
+    assert extra == {"ContentType": "application/json", "ContentEncoding": "gzip"}
+    assert decompress(body, "gzip") == b"{}" * 1000
+    assert content_type("GLM_tiles.CZML") == "application/json"
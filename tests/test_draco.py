@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from conftest import parse_pnts
+import utils.draco
+import utils.tile_format
+from utils.tile_format import check_format, encode_tile
+from utils.tileset import PointCloud
+from utils.sink import MemorySink
+
+
+def test_draco_without_dracopy_raises(monkeypatch):
+    monkeypatch.setattr(utils.draco, "DracoPy", None)
+    monkeypatch.setattr(utils.tile_format, "DracoPy", None)
+    with pytest.raises(ImportError):
+        check_format("draco")
+    feature_table = {"POINTS_LENGTH": 1, "QUANTIZED_VOLUME_OFFSET": [0, 0, 0], "QUANTIZED_VOLUME_SCALE": [1, 1, 1]}
+    with pytest.raises(ImportError):
+        encode_tile("draco", feature_table, [("POSITION_QUANTIZED", np.zeros((1, 3), dtype=np.uint16), {})])
+    empty = np.zeros(0)
+    with pytest.raises(ImportError):
+        PointCloud("out", empty, empty, empty, empty, empty, 0, format="draco", sink=MemorySink())
+
+
+def test_unknown_format_raises():
+    with pytest.raises(ValueError):
+        check_format("las")
+
+
+@pytest.mark.skipif(utils.draco.DracoPy is None, reason="needs DracoPy")
+def test_draco_round_trip():
+    n = 500
+    rng = np.random.default_rng(12)
+    position = rng.integers(0, 65535, (n, 3)).astype(np.uint16)
+    scale = np.array([1000.0, 2000.0, 3000.0])
+    meters = position * (scale / 65535.0)
+    feature_table = {"POINTS_LENGTH": n, "BATCH_LENGTH": n, "QUANTIZED_VOLUME_OFFSET": [10.0, 20.0, 30.0],
+                     "QUANTIZED_VOLUME_SCALE": scale.tolist()}
+    feature_arrays = [("BATCH_ID", np.arange(n, dtype=np.uint32), {}), ("POSITION_QUANTIZED", position, {})]
+    batch_arrays = [("value", meters[:, 0], {"componentType": "FLOAT", "type": "SCALAR"})]  # <--pairs with x
+    ft, fbin, bt, _ = parse_pnts(encode_tile("draco", feature_table, feature_arrays, {}, batch_arrays))
+
+    extension = ft["extensions"]["3DTILES_draco_point_compression"]
+    assert ft["RTC_CENTER"] == [10.0, 20.0, 30.0]
+    assert bt["extensions"]["3DTILES_draco_point_compression"]["properties"] == {"value": 0}
+    cloud = utils.draco.DracoPy.decode(fbin[extension["byteOffset"]:extension["byteLength"]])
+    value = [attribute for attribute in cloud.attributes if (attribute["unique_id"] == 0)][0]["data"].ravel()
+    assert cloud.points.shape == (n, 3)
+    assert np.abs(cloud.points[:, 0] - value).max() <= 2 * scale.max() / 65535  # <--reordered together
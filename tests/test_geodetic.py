@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from utils.geodetic import cartographic_to_cartesian
+
+a, b = 6378137.0, 6356752.314245  # <--WGS84 semi-axes
+
+
+def ecef(lon, lat, alt):
+    lon, lat = np.radians(lon), np.radians(lat)
+    n = a ** 2 / np.sqrt(a ** 2 * np.cos(lat) ** 2 + b ** 2 * np.sin(lat) ** 2)
+    return np.column_stack([(n + alt) * np.cos(lat) * np.cos(lon), (n + alt) * np.cos(lat) * np.sin(lon),
+                            (b ** 2 / a ** 2 * n + alt) * np.sin(lat)])
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_quantized_positions(dtype):
+    rng = np.random.default_rng(5)
+    lon, lat, alt = rng.uniform(-125, -120, 1000), rng.uniform(45, 48, 1000), rng.uniform(0, 15000, 1000)
+    cartesian, offset, scale, cartographic, region = cartographic_to_cartesian(lon, lat, alt, dtype=dtype, jit=False)
+    decoded = np.asarray(offset) + cartesian / 65535.0 * np.asarray(scale)
+    tolerance = np.asarray(scale) / 65535.0 + (1.0 if (dtype == np.float32) else 1e-6)
+    assert (np.abs(decoded - ecef(lon, lat, alt)) <= tolerance).all()
+    expected = np.column_stack([lon * 32767 / 180, lat * 32767 / 180, alt / 10]).astype(np.int16)
+    assert np.abs(cartographic - expected).max() <= (0 if (dtype == np.float64) else 1)  # <--float32 may round across
+    assert region == pytest.approx([np.radians(lon.min()), np.radians(lat.min()), np.radians(lon.max()),
+                                    np.radians(lat.max()), alt.min(), alt.max()])
+
+
+def test_equator():
+    cartesian, offset, scale, _, _ = cartographic_to_cartesian(np.zeros(2), np.zeros(2), np.array([0.0, 100.0]))
+    assert offset == pytest.approx([a, 0, 0])
+    assert scale == pytest.approx([100, 0, 0])
+    assert cartesian[:, 0].tolist() == [0, 65535]
+
+
+def test_preallocated_outputs_are_filled():
+    cartesian, cartographic, work = np.empty((3, 3), np.uint16), np.empty((3, 3), np.int16), np.empty((3, 3))
+    result = cartographic_to_cartesian(np.array([1.0, 2, 3]), np.array([4.0, 5, 6]), np.array([7.0, 8, 9]),
+                                       cartesian=cartesian, cartographic=cartographic, work=work)
+    assert result[0] is cartesian and result[3] is cartographic
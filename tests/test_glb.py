@@ -0,0 +1,57 @@
+import json
+import numpy as np
+from utils.glb import encode_glb, node_matrix
+
+numpy_types = {5121: np.uint8, 5122: np.int16, 5123: np.uint16, 5126: np.float32}
+
+
+def parse_glb(glb):
+    """glTF JSON and binary chunk of a .glb"""
+    magic, version, length, text_length, kind = np.frombuffer(glb, np.uint32, 5)
+    assert magic == 0x46546C67 and version == 2 and length == len(glb) and kind == 0x4E4F534A
+    gltf = json.loads(glb[20:20 + text_length])
+    return gltf, glb[28 + text_length:]
+
+
+def attribute(gltf, body, index):
+    accessor = gltf["accessors"][index]
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    dtype = np.dtype(numpy_types[accessor["componentType"]])
+    components = {"SCALAR": 1, "VEC3": 3, "VEC4": 4}[accessor["type"]]
+    rows = np.frombuffer(body, dtype, view["byteLength"] // dtype.itemsize, view["byteOffset"])
+    return rows.reshape(accessor["count"], view["byteStride"] // dtype.itemsize)[:, :components].squeeze()
+
+
+def test_points_and_metadata():
+    n = 100
+    rng = np.random.default_rng(11)
+    position = rng.integers(0, 65535, (n, 3)).astype(np.uint16)
+    value = rng.normal(size=n).astype(np.float32)
+    location = rng.integers(-999, 999, (n, 3)).astype(np.int16)
+    feature_table = {"POINTS_LENGTH": n, "BATCH_LENGTH": n,
+                     "QUANTIZED_VOLUME_OFFSET": [1, 2, 3], "QUANTIZED_VOLUME_SCALE": [10, 20, 30]}
+    feature_arrays = [("BATCH_ID", np.arange(n, dtype=np.uint32), {}), ("POSITION_QUANTIZED", position, {})]
+    batch_arrays = [("value", value, {"componentType": "FLOAT", "type": "SCALAR"}),
+                    ("location", location, {"componentType": "SHORT", "type": "VEC3"})]
+    glb = encode_glb(feature_table, feature_arrays, {}, batch_arrays, meshopt=False)
+    gltf, body = parse_glb(glb)
+
+    primitive = gltf["meshes"][0]["primitives"][0]
+    assert primitive["mode"] == 0
+    assert np.array_equal(attribute(gltf, body, primitive["attributes"]["POSITION"]), position)
+    assert np.array_equal(attribute(gltf, body, primitive["attributes"]["_VALUE"]), value)
+    assert np.array_equal(attribute(gltf, body, primitive["attributes"]["_LOCATION"]), location)
+    assert gltf["nodes"][0]["matrix"] == node_matrix([1, 2, 3], [10, 20, 30])
+    assert "KHR_mesh_quantization" in gltf["extensionsRequired"]
+    classes = gltf["extensions"]["EXT_structural_metadata"]["schema"]["classes"]["point"]["properties"]
+    assert classes["value"] == {"type": "SCALAR", "componentType": "FLOAT32"}
+
+
+def test_node_matrix_maps_ecef_to_y_up():
+    matrix = np.array(node_matrix([100, 200, 300], [65535, 65535, 65535])).reshape(4, 4).T
+    assert np.allclose(matrix @ [1, 2, 3, 1], [101, 303, -202, 1])  # <--(x, y, z) ECEF is (x, z, -y)
+
+
+def test_empty_tile():
+    gltf, body = parse_glb(encode_glb({"POINTS_LENGTH": 0}, [], {}, [], meshopt=False))
+    assert gltf["scenes"] == [{}] and body == b""
@@ -0,0 +1,49 @@
+import pytest
+from utils.hierarchy import assemble, balance, union_region, union_availability, fanout
+from utils.spacing import region_error
+
+
+def tiles(n):
+    return [{"geometricError": 5.0, "refine": "REPLACE", "content": {"uri": "{}_32.pnts".format(i)},
+             "availability": "2017-04-18T00:{:02d}:00Z/2017-04-18T00:{:02d}:59Z".format(i % 60, i % 60),
+             "boundingVolume": {"region": [-2.0 + 0.01 * i, 0.7, -1.99 + 0.01 * i, 0.71, 0, 1000 + i]}}
+            for i in range(n)]
+
+
+def leaves(node):
+    if (not node.get("children")):
+        return [node]
+    return [leaf for child in node["children"] for leaf in leaves(child)]
+
+
+@pytest.mark.parametrize("n", [0, 1, 8, 9, 60, 600])
+def test_assemble_keeps_every_tile(n):
+    tileset = {"asset": {"version": "1.0"}, "root": {"geometricError": 1000000, "refine": "REPLACE",
+                                                     "boundingVolume": {"region": []}, "children": tiles(n)}}
+    root = assemble(tileset)["root"]
+    found = leaves(root) if (n) else []
+    assert sorted(tile["content"]["uri"] for tile in found) == sorted(tile["content"]["uri"] for tile in tiles(n))
+    assert len(root["children"]) <= fanout
+    if (n):
+        assert root["boundingVolume"]["region"] == pytest.approx([-2.0, 0.7, -1.99 + 0.01 * (n - 1), 0.71, 0,
+                                                                  999 + n])
+        assert root["geometricError"] == max(region_error(root["boundingVolume"]["region"]), 5.0)
+
+
+def test_internal_nodes_bound_their_subtree():
+    for node in balance(tiles(100), 10.0):
+        below = leaves(node)
+        region = []
+        availability = None
+        for tile in below:
+            region = union_region(region, tile["boundingVolume"]["region"])
+            availability = union_availability(availability, tile["availability"])
+        assert node["boundingVolume"]["region"] == region
+        assert node.get("availability", availability) == availability
+
+
+def test_unions():
+    assert union_region([], [1, 2, 3, 4, 5, 6]) == [1, 2, 3, 4, 5, 6]
+    assert union_region([0, 0, 1, 1, 0, 10], [0.5, -1, 2, 0.5, 5, 20]) == [0, -1, 2, 1, 0, 20]
+    assert union_availability(None, "a/b") == "a/b"
+    assert union_availability("2017-01-02Z/2017-01-03Z", "2017-01-01Z/2017-01-02Z") == "2017-01-01Z/2017-01-03Z"
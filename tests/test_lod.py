@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import glm_subcode
+from conftest import parse_pnts
+from utils.lod import level_selector, level_size
+from utils.sink import MemorySink
+
+steps = [32, 16, 8, 4, 2, 1]
+
+
+@pytest.mark.parametrize("size", [0, 1, 31, 1000, 4097])
+def test_add_levels_store_every_point_once(size):
+    picked = []
+    for i, step in enumerate(steps):
+        selector = level_selector(size, step, steps[:i], "ADD")
+        picked.append(np.arange(size)[selector])
+        assert level_size(size, selector) == picked[-1].size
+    picked = np.concatenate(picked)
+    assert np.array_equal(np.sort(picked), np.arange(size))
+
+
+def test_add_levels_of_uneven_strides():
+    size = 1000
+    picked = [np.arange(size)[level_selector(size, step, [9, 3][:i], "ADD")] for i, step in enumerate([9, 3, 1])]
+    assert np.array_equal(np.sort(np.concatenate(picked)), np.arange(size))
+
+
+def test_replace_levels_are_strides():
+    assert level_selector(100, 4, [8], "REPLACE") == slice(None, None, 4)
+    assert level_size(100, slice(None, None, 4)) == 25
+
+
+def test_lightning_add_tileset_writes_every_point_once():
+    rng = np.random.default_rng(0)
+    LTN = {}
+    for typ, size in (("flash", 50), ("group", 300), ("event", 1000)):
+        LTN[typ] = glm_subcode.lightning(typ, "GLM")
+        LTN[typ].Lon, LTN[typ].Lat = rng.uniform(-90, -80, size), rng.uniform(30, 40, size)
+        LTN[typ].Alt, LTN[typ].Rad = rng.uniform(0, 100, size), rng.uniform(0, 1, size)
+        LTN[typ].cartographic_to_cartesian()
+    usetype = {32: 'flash', 16: 'flash', 8: 'group', 4: 'group', 2: 'event', 1: 'event'}
+    useskip = {32: 1, 16: 1, 8: 1, 4: 1, 2: 1, 1: 1}
+
+    sink = MemorySink()
+    tileset = glm_subcode.Tileset([-90, 30, -80, 40, 0, 100], 1492000000, "GLM")
+    glm_subcode.MK_levels(1, [16, 4, 1], tileset, LTN, usetype, useskip, "ADD", sink=sink)
+    assert sorted(sink.contents) == ["1_1.pnts", "1_16.pnts", "1_4.pnts"]
+    positions = []
+    for tile in sink.contents.values():
+        feature_table, feature_body, _, _ = parse_pnts(tile)
+        count = feature_table["POINTS_LENGTH"]
+        offset = feature_table["POSITION_QUANTIZED"]["byteOffset"]
+        positions.append(np.frombuffer(feature_body, np.uint16, count * 3, offset).reshape(-1, 3))
+    positions = np.concatenate(positions)
+    assert len(positions) == 1000  # <--the events, none twice, no flashes or groups on top
+    assert np.array_equal(np.unique(positions, axis=0), np.unique(LTN["event"].cartesian, axis=0))
@@ -0,0 +1,67 @@
+import json
+import pytest
+from conftest import epoch
+from utils.manifest import ManifestSink, load_manifest, hashed_name, manifest_name
+from utils.point_cloud import generate_point_cloud
+from utils.partition import Partitioner
+from utils.sink import LocalSink, MemorySink
+
+
+def run(store, sink, end=epoch + 1000):
+    generate_point_cloud("ref", epoch, end, store, "out", partitioner=Partitioner(max_points=1500), sink=sink)
+    sink.close()
+
+
+def test_hashes_are_stable_and_unchanged_tiles_are_skipped(store, tmp_path):
+    folder = str(tmp_path / "out")
+    first = ManifestSink(LocalSink(folder))
+    run(store, first)
+    assert first.skipped == 0
+    previous = load_manifest(folder)
+    assert previous == json.loads((tmp_path / "out" / manifest_name).read_text())["artifacts"]
+
+    parent = MemorySink()
+    second = ManifestSink(parent, previous)
+    run(store, second)
+    assert second.artifacts == previous
+    assert second.written == 0 and second.skipped == len(previous)
+    assert list(parent.contents) == [manifest_name]
+    assert second.removed() == []
+
+
+def test_changed_window_rewrites_and_lists_removed(store, tmp_path):
+    first = ManifestSink(MemorySink())
+    run(store, first)
+    parent = MemorySink()
+    second = ManifestSink(parent, first.artifacts)
+    run(store, second, epoch + 200)  # <--fewer points: fewer tiles
+    assert second.written > 0 and "tileset.json" in parent.contents
+    assert second.removed() == sorted(set(first.artifacts) - set(second.artifacts))
+    assert second.removed()
+
+
+def test_hashed_names(store):
+    parent = MemorySink()
+    sink = ManifestSink(parent, hashed=True)
+    run(store, sink)
+    tileset = json.loads(parent.contents["tileset.json"])
+    assert "tileset.json" in sink.artifacts
+    uris = []
+    nodes = [tileset["root"]]
+    while nodes:
+        node = nodes.pop()
+        if ("content" in node):
+            uris.append(node["content"]["uri"])
+        nodes.extend(node.get("children", []))
+    assert uris and all(uri in parent.contents for uri in uris)
+    for name, artifact in sink.artifacts.items():
+        if (name.endswith(".pnts")):
+            assert artifact["key"] == hashed_name(name, artifact["sha256"])
+            assert name not in parent.contents
+    assert hashed_name("a/0_1.pnts", "0123456789abcdef0123") == "a/0_1.0123456789abcdef.pnts"
+
+
+def test_octree_cannot_be_hashed():
+    sink = ManifestSink(MemorySink(), hashed=True)
+    with pytest.raises(ValueError):
+        sink.write("tileset.json", json.dumps({"root": {"implicitTiling": {}}}))
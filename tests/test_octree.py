@@ -0,0 +1,39 @@
+import json
+import pytest
+from conftest import epoch, points
+from utils.point_cloud import generate_point_cloud
+from utils.sink import MemorySink
+from utils.spacing import extents, level_errors
+
+
+def test_octree(store):
+    sink = MemorySink()
+    generate_point_cloud("ref", epoch, epoch + 1000, store, "out", tiling="octree", sink=sink)
+    tileset = json.loads(sink.contents["tileset.json"])
+    assert tileset["root"]["implicitTiling"]["subdivisionScheme"] == "OCTREE"
+    assert "subtrees/0/0/0/0.subtree" in sink.contents
+    assert any(name.startswith("content/") for name in sink.contents)
+
+
+def test_octree_empty_window(store):
+    sink = MemorySink()
+    generate_point_cloud("ref", epoch - 1000, epoch - 1, store, "out", tiling="octree", sink=sink)
+    tileset = json.loads(sink.contents["tileset.json"])
+    assert tileset["root"]["children"] == []
+    assert list(sink.contents) == ["tileset.json"]
+
+
+@pytest.mark.parametrize("options", [{"format": "glb"}, {"profile": "compact"}, {"stream": True}])
+def test_octree_rejects_chain_options(store, options):
+    with pytest.raises(ValueError):
+        generate_point_cloud("ref", epoch, epoch + 1000, store, "out", tiling="octree", sink=MemorySink(), **options)
+
+
+def test_octree_error_from_spacing(store):
+    sink = MemorySink()
+    generate_point_cloud("ref", epoch, epoch + 1000, store, "out", tiling="octree", sink=sink)
+    tileset = json.loads(sink.contents["tileset.json"])
+    lon, lat, alt, _, _ = points(5000)
+    error = level_errors(extents(lon, lat, alt), 5000, [1])[0]  # <--all points fit the root node
+    assert tileset["root"]["geometricError"] == pytest.approx(error, rel=1e-3)
+    assert tileset["geometricError"] == pytest.approx(2 * error, rel=1e-3)
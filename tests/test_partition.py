@@ -0,0 +1,42 @@
+import numpy as np
+from utils.partition import Partitioner, chain_bytes, point_bytes
+
+
+def covers(ranges, size):
+    return ranges[0][0] == 0 and ranges[-1][1] == size and all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+
+def test_fixed_size_tiles():
+    ranges = Partitioner(max_points=1000).split(np.arange(2500))
+    assert ranges == [(0, 1000), (1000, 2000), (2000, 2500)]
+
+
+def test_byte_budget():
+    partitioner = Partitioner(max_points=None, max_bytes=10 * point_bytes, bytes_per_point=point_bytes)
+    assert partitioner.split(np.arange(25)) == [(0, 10), (10, 20), (20, 25)]
+    assert chain_bytes(refine="ADD") == point_bytes
+    assert chain_bytes((2, 1)) == 1.5 * point_bytes
+
+
+def test_time_budget_follows_bursts():
+    time = np.concatenate([np.arange(0, 10, 0.01), np.arange(10, 1000, 10.0)])  # <--a burst, then sparse points
+    ranges = Partitioner(max_points=None, max_seconds=60).split(time)
+    assert covers(ranges, time.size)
+    assert all(time[end - 1] - time[start] <= 60 for start, end in ranges)
+    assert ranges[0][1] - ranges[0][0] > 1000  # <--the whole burst in one tile
+
+
+def test_extent_budget():
+    lon = np.linspace(-124, -104, 2001)
+    ranges = Partitioner(max_points=None, max_extent=5).split(np.arange(lon.size), lon, np.zeros(lon.size))
+    assert covers(ranges, lon.size)
+    assert all(lon[end - 1] - lon[start] <= 5 for start, end in ranges)
+    assert len(ranges) == 4
+
+
+def test_cut_waits_for_more_points():
+    partitioner = Partitioner(max_points=100, max_seconds=50)
+    assert partitioner.cut(np.arange(30)) is None
+    assert partitioner.cut(np.arange(60)) == 51
+    assert partitioner.cut(np.zeros(0)) is None
+    assert partitioner.exceeded(100) and partitioner.exceeded(10, seconds=51) and not partitioner.exceeded(10, 20)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from conftest import parse_pnts
+from utils.pnts import encode_pnts, write_pnts, pad8
+
+
+def arrays(n):
+    rng = np.random.default_rng(n)
+    feature_arrays = [("BATCH_ID", np.arange(n, dtype=np.uint32), {"componentType": "UNSIGNED_INT"}),
+                      ("POSITION_QUANTIZED", rng.integers(0, 65535, (n, 3)).astype(np.uint16), {})]
+    batch_arrays = [("value", rng.normal(size=n), {"componentType": "FLOAT", "type": "SCALAR"}),
+                    ("location", rng.integers(-999, 999, (n, 3)).astype(np.int16),
+                     {"componentType": "SHORT", "type": "VEC3"})]
+    return {"POINTS_LENGTH": n, "BATCH_LENGTH": n}, feature_arrays, batch_arrays
+
+
+def test_pad8():
+    assert [pad8(n) for n in (0, 1, 7, 8, 9)] == [0, 7, 1, 0, 7]
+
+
+@pytest.mark.parametrize("n", [0, 1, 3, 1000])
+def test_round_trip(n):
+    feature_table, feature_arrays, batch_arrays = arrays(n)
+    ft, fbin, bt, bbin = parse_pnts(encode_pnts(feature_table, feature_arrays, {}, batch_arrays))
+    assert ft["POINTS_LENGTH"] == n
+    stored_in = [(entry, fbin, ft) for entry in feature_arrays] + [(entry, bbin, bt) for entry in batch_arrays]
+    for (name, array, _), body, table in stored_in:
+        dtype = np.float32 if (name == "value") else array.dtype  # <--FLOAT is cast on the way in
+        offset = table[name]["byteOffset"]
+        assert offset % np.dtype(dtype).itemsize == 0
+        stored = np.frombuffer(body, dtype=dtype, count=array.size, offset=offset).reshape(array.shape)
+        assert np.array_equal(stored, array.astype(dtype))
+
+
+def test_no_batch_table():
+    feature_table, feature_arrays, _ = arrays(5)
+    ft, _, bt, bbin = parse_pnts(encode_pnts(feature_table, feature_arrays))
+    assert bt == {} and bbin == b""
+
+
+def test_write_pnts(tmp_path):
+    feature_table, feature_arrays, batch_arrays = arrays(10)
+    buffer = write_pnts(str(tmp_path / "0_1.pnts"), feature_table, feature_arrays, {}, batch_arrays)
+    assert (tmp_path / "0_1.pnts").read_bytes() == bytes(buffer)
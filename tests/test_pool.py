@@ -0,0 +1,29 @@
+import pytest
+from conftest import epoch
+from utils.point_cloud import generate_point_cloud
+from utils.partition import Partitioner
+from utils.sink import LocalSink, MemorySink
+
+
+def tiles(folder):
+    return {path.relative_to(folder).as_posix(): path.read_bytes() for path in folder.rglob("*") if path.is_file()}
+
+
+@pytest.mark.parametrize("refine", ["REPLACE", "ADD"])
+def test_process_pool_writes_what_threads_write(store, tmp_path, refine):
+    outputs = []
+    for mode in ("thread", "process"):
+        folder = tmp_path / mode
+        generate_point_cloud("ref", epoch, epoch + 1000, store, str(folder), mode=mode, processes=2,
+                             refine=refine, partitioner=Partitioner(max_points=1200), sink=LocalSink(str(folder)))
+        outputs.append(tiles(folder))
+    assert len(outputs[0]) == 5 * 6 + 1  # <--5 LOD chains of 6 levels and tileset.json
+    assert outputs[0] == outputs[1]
+
+
+def test_process_pool_into_a_sink_workers_cannot_share(store):
+    sinks = [MemorySink(), MemorySink()]
+    for mode, sink in zip(("thread", "process"), sinks):
+        generate_point_cloud("ref", epoch, epoch + 1000, store, "out", mode=mode, processes=2,
+                             partitioner=Partitioner(max_points=1200), sink=sink)
+    assert sinks[0].contents == sinks[1].contents
@@ -0,0 +1,36 @@
+import io
+import zipfile
+from utils.sink import MemorySink, TeeSink
+from utils.archive import index_name
+
+
+def test_tee_writes_folder_and_archive():
+    parent = MemorySink()
+    with TeeSink(parent.subfolder("tile1"), parent.archive("tile1.3tz")) as sink:
+        sink.write("tileset.json", "{}")
+        sink.write("0.pnts", b"pnts")
+    assert parent.contents["tile1/tileset.json"] == b"{}"
+    assert parent.contents["tile1/0.pnts"] == b"pnts"
+    with zipfile.ZipFile(io.BytesIO(parent.contents["tile1.3tz"])) as archive:
+        assert archive.namelist() == ["tileset.json", "0.pnts", index_name]
+        assert archive.read("0.pnts") == b"pnts"
+
+
+class FlushCounter(MemorySink):
+    def __init__(self):
+        super().__init__()
+        self.flushes = 0
+
+
+    def flush(self):
+        self.flushes += 1
+
+
+def test_closing_a_tile_does_not_flush_the_shared_sink():
+    parent = FlushCounter()
+    for tile in range(3):
+        with TeeSink(parent.subfolder("tile{}".format(tile)), parent.archive("tile{}.3tz".format(tile))) as sink:
+            sink.write("tileset.json", "{}")
+    assert parent.flushes == 0  # <--uploads of a tile overlap the next one, the owner flushes on close
+    assert sorted(parent.contents) == ["tile{}{}".format(tile, name) for tile in range(3)
+                                       for name in (".3tz", "/tileset.json")]
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from utils.spacing import extents, point_spacing, level_errors, region_error, min_extent, meter_per_deg, to_rad
+
+
+def test_extents_follow_the_spread_not_the_bounding_box():
+    track = np.linspace(0, 1, 10000)
+    lon, lat = -124.0 + track, 46.0 + track  # <--a diagonal curtain
+    alt = np.tile(np.linspace(0, 10000, 100), 100)
+    edge = extents(lon, lat, alt)
+    length = np.hypot(meter_per_deg * np.cos(46.5 * to_rad), meter_per_deg)
+    assert edge[0] == pytest.approx(length, rel=0.01)
+    assert edge[1] == pytest.approx(10000, rel=0.02)
+    assert edge[2] < min_extent
+    assert np.all(extents([0.0], [0.0], [0.0]) == 0)
+
+
+def test_point_spacing():
+    assert point_spacing([1000, 1000, 0], 100) == pytest.approx(100)  # <--a flat layer: two dimensions
+    assert point_spacing([1000, 1000, 1000], 1000) == pytest.approx(100)
+    assert point_spacing([0, 0, 0], 100) == min_extent
+    assert point_spacing([1000, 0, 0], 0) == min_extent
+    assert point_spacing([10, 0, 0], 1000) == min_extent
+
+
+def test_level_errors_grow_with_the_stride():
+    errors = level_errors([1000, 1000, 0], 10000, [1, 4, 16])
+    assert errors == pytest.approx([10, 20, 40])
+
+
+def test_region_error_is_the_diagonal():
+    region = [0, 0, 0.001, 0, 0, 3000]
+    assert region_error(region) == pytest.approx(np.hypot(0.001 / to_rad * meter_per_deg, 3000))
+    assert region_error(None) == min_extent
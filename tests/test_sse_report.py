@@ -0,0 +1,43 @@
+import json
+import pytest
+from utils.sse_report import sse_factor, loaded, levels, report, TilesetSource
+from utils.archive import pack
+
+
+def tileset():
+    children = [{"geometricError": 10, "content": {"uri": "{}.pnts".format(i)}} for i in (1, 2)]
+    return {"asset": {"version": "1.0"},
+            "root": {"geometricError": 100, "refine": "REPLACE", "content": {"uri": "0.pnts"}, "children": children}}
+
+
+def test_sse_factor():
+    assert sse_factor(1000.0, 1080, 90) == pytest.approx(0.54)
+
+
+def test_loaded_refines_past_the_sse():
+    root = tileset()["root"]
+    assert loaded(root, 0.1, 16) == ["0.pnts"]  # <--10 px: not refined
+    assert loaded(root, 1.0, 16) == ["1.pnts", "2.pnts"]
+    assert loaded(dict(root, refine="ADD"), 1.0, 16) == ["0.pnts", "1.pnts", "2.pnts"]
+
+
+def test_levels():
+    assert levels(tileset()["root"]) == {0: (100, 100, 1), 1: (10, 10, 2)}
+
+
+@pytest.mark.parametrize("archived", [False, True])
+def test_report_of_folder_and_archive(tmp_path, archived):
+    folder = tmp_path / "tileset"
+    folder.mkdir()
+    (folder / "tileset.json").write_text(json.dumps(tileset()))
+    for i, size in enumerate((100, 10, 20)):
+        (folder / "{}.pnts".format(i)).write_bytes(bytes(size))
+    path = str(folder)
+    if (archived):
+        path = str(tmp_path / "tileset.3tz")
+        pack(str(folder), path)
+    source = TilesetSource(path)
+    assert source.size("3.pnts") == 0
+    far, near = sse_factor(1e6) * 100, sse_factor(1e3) * 100
+    assert far < 16 < near
+    assert report(source, [16], [1000, 1]) == [(16, 1000, 1, 100), (16, 1, 2, 30)]
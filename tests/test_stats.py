@@ -0,0 +1,55 @@
+import json
+import numpy as np
+import pytest
+from conftest import epoch
+from utils.stats import value_stats, merge_stats, overlaps, prune, node_stats
+from utils.point_cloud import generate_point_cloud
+from utils.partition import Partitioner
+from utils.sink import MemorySink
+
+
+def contents(node):
+    """no. of content nodes under node"""
+    return int("content" in node) + sum(contents(child) for child in node.get("children", []))
+
+
+def test_value_stats_ignores_nan():
+    stats = value_stats([np.nan, 1, 2, 3, 4, np.inf])
+    assert (stats["count"], stats["minimum"], stats["maximum"], stats["mean"]) == (4, 1, 4, 2.5)
+    assert sum(stats["histogram"]["counts"]) == 4 and len(stats["histogram"]["edges"]) == 11
+    assert value_stats([np.nan]) == {"count": 0}
+
+
+def test_merge_stats_is_exact_where_it_can_be():
+    rng = np.random.default_rng(0)
+    parts = [rng.normal(0, 1, 1000), rng.normal(5, 2, 3000)]
+    merged = merge_stats([value_stats(part) for part in parts] + [None, {"count": 0}])
+    whole = value_stats(np.concatenate(parts))
+    for name in ("count", "minimum", "maximum"):
+        assert merged[name] == whole[name]
+    assert merged["mean"] == pytest.approx(whole["mean"], rel=1e-4)
+    assert merged["percentiles"]["50"] == pytest.approx(whole["percentiles"]["50"], abs=0.5)
+    assert sum(merged["histogram"]["counts"]) == pytest.approx(4000, abs=5)
+    assert merge_stats([None]) == {"count": 0}
+
+
+def test_overlaps():
+    stats = {"count": 1, "minimum": 0, "maximum": 10}
+    assert overlaps(stats) and overlaps(stats, 5, None) and overlaps(stats, None, 0)
+    assert not overlaps(stats, 11, None) and not overlaps(stats, None, -1)
+    assert not overlaps({"count": 0})
+
+
+def test_prune_keeps_the_subtrees_in_range(store):
+    sink = MemorySink()
+    generate_point_cloud("ref", epoch, epoch + 1000, store, "out", partitioner=Partitioner(max_points=500),
+                         sink=sink)
+    tileset = json.loads(sink.contents["tileset.json"])
+    total = node_stats(tileset["root"]) or tileset["extras"]["statistics"]
+    assert total["count"] == 5000
+
+    assert prune(tileset) == tileset
+    empty = prune(tileset, total["maximum"] + 1)
+    assert empty["root"]["children"] == [] and "content" not in empty["root"]
+    middle = prune(tileset, total["maximum"] - 1)
+    assert 0 < contents(middle["root"]) < contents(tileset["root"])
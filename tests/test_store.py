@@ -0,0 +1,71 @@
+import json
+import numpy as np
+import pytest
+from conftest import epoch, points
+from utils.store import write_store, open_store, complete
+from utils.point_cloud import generate_point_cloud
+from utils.sink import MemorySink
+
+
+def test_store_round_trip(store):
+    assert complete(store)
+    root = open_store(store)
+    lon, lat, alt, value, time = points(5000)
+    assert root.attrs["epoch"] == epoch
+    assert np.array_equal(root["time"][:], time - epoch)
+    assert np.allclose(root["value"]["ref"][:], value.astype(np.float32))
+    assert np.allclose(root["location"][:, 2], alt.astype(np.float32))
+
+
+def test_fsspec_url_with_storage_options(tmp_path):
+    # file:// goes through FSStore like s3://, auto_mkdir is an option of its filesystem
+    location = "file://" + str(tmp_path / "store.zarr")
+    options = {"auto_mkdir": True}
+    lon, lat, alt, value, time = points(1000)
+    write_store(location, lon, lat, alt, time, {"ref": value}, {}, storage_options=options)
+    assert complete(location, options)
+    sink = MemorySink()
+    generate_point_cloud("ref", epoch, epoch + 1000, location, "out", sink=sink, storage_options=options)
+    assert len(json.loads(sink.contents["tileset.json"])["root"]["children"]) == 1
+
+
+@pytest.mark.parametrize("options", [{"codec": None, "delta": False, "consolidated": False},
+                                     {"codec": "lz4", "shuffle": "byte"}, {"codec": "zstd", "level": 1},
+                                     {"shard": 4}])
+def test_options_read_back_the_same(tmp_path, options):
+    lon, lat, alt, value, time = points(5000)
+    location = str(tmp_path / "store.zarr")
+    write_store(location, lon, lat, alt, time, {"ref": value}, {}, chunk=1000, **options)
+    root = open_store(location)
+    assert np.array_equal(root["time"][:], time - epoch)
+    assert np.array_equal(root["value"]["ref"][:], value.astype(np.float32))
+    assert (tmp_path / "store.zarr" / ".zmetadata").exists() == options.get("consolidated", True)
+
+
+def test_shard_keeps_the_chunk_index(tmp_path, store):
+    lon, lat, alt, value, time = points(5000)
+    location = str(tmp_path / "store.zarr")
+    root = write_store(location, lon, lat, alt, time, {"ref": value}, {}, chunk=1000, shard=4)
+    assert root["location"].chunks[0] == 4000
+    assert root["chunk_id"].shape == (5, 2)  # <--one block per chunk points, whatever the shard
+    sinks = [MemorySink(), MemorySink()]
+    generate_point_cloud("ref", epoch + 100, epoch + 300, location, "out", sink=sinks[0])
+    generate_point_cloud("ref", epoch + 100, epoch + 300, store, "out", sink=sinks[1])
+    assert sinks[0].contents == sinks[1].contents
+
+
+def test_delta_coded_time(tmp_path):
+    lon, lat, alt, value, time = points(5000)
+    root = write_store(str(tmp_path / "store.zarr"), lon, lat, alt, time, {"ref": value}, {})
+    assert [f.codec_id for f in root["time"].filters] == ["delta"]
+    root = write_store(str(tmp_path / "plain.zarr"), lon, lat, alt, time, {"ref": value}, {}, delta=False)
+    assert root["time"].filters is None
+
+
+def test_interrupted_store_is_not_complete(tmp_path):
+    lon, lat, alt, value, time = points(100)
+    location = str(tmp_path / "store.zarr")
+    root = write_store(location, lon, lat, alt, time, {"ref": value}, {})
+    del root.attrs["epoch"]
+    assert not complete(location)
+    assert not complete(str(tmp_path / "missing.zarr"))
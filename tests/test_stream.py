@@ -0,0 +1,33 @@
+import json
+import pytest
+from conftest import epoch
+from utils.point_cloud import generate_point_cloud
+from utils.partition import Partitioner
+from utils.sink import MemorySink
+
+
+def test_stream_into_memory_sink(store):
+    sink = MemorySink()
+    generate_point_cloud("ref", epoch, epoch + 1000, store, "out", stream=True,
+                         partitioner=Partitioner(max_points=1500), sink=sink)
+    tileset = json.loads(sink.contents["tileset.json"])
+    children = tileset["root"]["children"]
+    assert len(children) == 4  # <--5000 points, 1500 per tile
+    tiles = [name for name in sink.contents if name != "tileset.json"]
+    assert len(tiles) == len(children) * 6  # <--one content per level of each LOD chain
+
+
+def test_stream_writes_what_the_in_memory_path_writes(store):
+    sinks = [MemorySink(), MemorySink()]
+    for stream, sink in zip((False, True), sinks):
+        generate_point_cloud("ref", epoch + 20, epoch + 450, store, "out", stream=stream,
+                             partitioner=Partitioner(max_points=1500), bbox=[-124, 45, -122, 47],
+                             value_range=[0, None], sink=sink)
+    assert len(sinks[0].contents) > 6
+    assert sinks[0].contents == sinks[1].contents
+
+
+def test_stream_rejects_process_mode(store):
+    with pytest.raises(ValueError):
+        generate_point_cloud("ref", epoch, epoch + 1000, store, "out", mode="process", stream=True,
+                             sink=MemorySink())
@@ -0,0 +1,66 @@
+import json
+import pytest
+from conftest import epoch, points, parse_pnts
+from utils.tile_server import TileCache, TileServer, parse_query
+from utils.tileset import PointCloud
+from utils.point_cloud import generate_point_cloud
+from utils.partition import Partitioner
+from utils.sink import MemorySink
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TileCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"  # <--b is now the oldest
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234" and cache.get("c") == b"1234"
+    assert cache.bytes == 8 and (cache.hits, cache.misses) == (3, 1)
+
+
+def test_parse_query():
+    query = parse_query("epoch=10&end=20&bbox=-124,45,-122,47&value=0,&lod=4&format=pnts")
+    assert query == {"epoch": 10, "end": 20, "bbox": (-124.0, 45.0, -122.0, 47.0), "value": (0.0, None),
+                     "lod": 4, "format": "pnts"}
+
+
+@pytest.mark.parametrize("profile", ["full", "compact"])
+def test_window_serves_what_generate_point_cloud_writes(store, profile):
+    sink = MemorySink()
+    generate_point_cloud("ref", epoch, epoch + 1000, store, "out", partitioner=Partitioner(max_points=1500),
+                         profile=profile, sink=sink)
+    server = TileServer({"store": store}, partitioner=Partitioner(max_points=1500))
+    query = {"epoch": epoch, "end": epoch + 1000, "profile": profile}
+    tileset = json.loads(server.tileset("store", "ref", query))
+    assert tileset == json.loads(sink.contents["tileset.json"])
+
+    for name, content in sink.contents.items():
+        if (name != "tileset.json"):
+            assert server.tile("store", "ref", name, query) == content
+    parse_pnts(server.tile("store", "ref", "0_1.pnts", query))
+    assert server.cache.hits > 0
+
+
+def test_window_cache_and_missing_variable(store):
+    server = TileServer({"store": store}, max_windows=1)
+    first = server.window("store", "ref", {"epoch": epoch, "end": epoch + 100})
+    assert server.window("store", "ref", {"epoch": epoch, "end": epoch + 100}) is first
+    server.window("store", "ref", {"epoch": epoch, "end": epoch + 200})
+    assert len(server.windows) == 1
+    with pytest.raises(KeyError):
+        server.window("store", "zdr", {})
+
+
+@pytest.mark.parametrize("lod", [0, 3, 64])
+def test_lod_outside_the_strides_is_a_bad_request(store, lod):
+    server = TileServer({"store": store})
+    with pytest.raises(ValueError):
+        server.tileset("store", "ref", {"epoch": epoch, "end": epoch + 100, "lod": lod})
+
+
+def test_chain_without_steps():
+    cloud = PointCloud(None, *points(10), epoch, sink=MemorySink())
+    cloud.steps = []
+    with pytest.raises(ValueError):
+        cloud.chain(0, [0, 0, 0, 0, 0, 0], "", [])
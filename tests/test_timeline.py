@@ -0,0 +1,37 @@
+import json
+from utils.sink import MemorySink
+from utils.timeline import TimelineSink
+from utils.spacing import region_error
+
+
+def window_tileset(west, epoch, uri):
+    tile = {"geometricError": 10, "boundingVolume": {"region": [west, 0.1, west + 0.01, 0.11, 0, 1000]},
+            "content": {"uri": uri}, "refine": "REPLACE",
+            "availability": "2017-04-18T00:02:00Z/2017-04-18T00:03:00Z"}
+    root = {"geometricError": 1000, "boundingVolume": tile["boundingVolume"], "children": [tile]}
+    return {"asset": {"version": "1.0"}, "root": root,
+            "properties": {"epoch": epoch, "refined": [uri]}}
+
+
+def test_windows_are_consolidated():
+    parent = MemorySink()
+    timeline = TimelineSink(parent, "GLM Lightning")
+    interval = "2017-04-18T00:01:00Z/2017-04-18T00:02:00Z"
+    timeline.subfolder("tile1", interval).write("tileset.json", json.dumps(window_tileset(-1.5, "E1", "0_1.pnts")))
+    timeline.subfolder("tile2").write("tileset.json", json.dumps(window_tileset(-1.4, "E2", "1_1.pnts")))
+    timeline.subfolder("tile2").write("1_1.pnts", b"pnts")
+    timeline.close()
+
+    tileset = json.loads(parent.contents["tileset.json"])
+    assert parent.contents["tile2/1_1.pnts"] == b"pnts"
+    root = tileset["root"]
+    assert root["boundingVolume"]["region"] == [-1.5, 0.1, -1.39, 0.11, 0, 1000]
+    assert root["geometricError"] == max(region_error(root["boundingVolume"]["region"]), 10)
+    assert tileset["properties"]["epochs"] == {"tile1": "E1", "tile2": "E2"}
+    assert tileset["properties"]["refined"] == ["tile1/0_1.pnts", "tile2/1_1.pnts"]
+
+    first, second = root["children"]
+    assert first["availability"] == interval
+    assert first["children"][0]["availability"] == interval
+    assert first["children"][0]["content"]["uri"] == "tile1/0_1.pnts"
+    assert second["availability"] == "2017-04-18T00:02:00Z/2017-04-18T00:03:00Z"  # <--of its tiles
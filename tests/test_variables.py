@@ -0,0 +1,48 @@
+import json
+import numpy as np
+import pytest
+from conftest import epoch, points, parse_pnts
+from utils.store import write_store
+from utils.point_cloud import generate_point_cloud
+from utils.partition import Partitioner
+from utils.sink import MemorySink
+
+
+@pytest.fixture
+def pair(tmp_path):
+    """an ingest store with two variables, vel = -ref"""
+    lon, lat, alt, value, time = points(3000)
+    location = str(tmp_path / "pair.zarr")
+    write_store(location, lon, lat, alt, time, {"ref": value, "vel": -value}, {}, chunk=1000)
+    return location
+
+
+def batch(tile):
+    """name to values of the batch table of a .pnts tile"""
+    feature_table, _, batch_table, batch_body = parse_pnts(tile)
+    return {name: np.frombuffer(batch_body, np.float32, feature_table["POINTS_LENGTH"], entry["byteOffset"])
+            for name, entry in batch_table.items() if (name not in ("time", "location"))}
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_one_batch_attribute_per_variable(pair, stream):
+    sink = MemorySink()
+    generate_point_cloud(["ref", "vel"], epoch, epoch + 1000, pair, "out", stream=stream,
+                         partitioner=Partitioner(max_points=1000), value_range=[20, None], sink=sink)
+    tileset = json.loads(sink.contents["tileset.json"])
+    assert tileset["properties"]["variables"] == ["ref", "vel"]
+    tiles = [name for name in sink.contents if (name.endswith(".pnts"))]
+    assert tiles
+    for name in tiles:
+        values = batch(sink.contents[name])
+        assert sorted(values) == ["ref", "vel"]
+        assert np.all(values["ref"] >= 20)  # <--the filter applies to the first variable
+        assert np.array_equal(values["vel"], -values["ref"])
+
+
+def test_single_variable_keeps_value(pair):
+    sink = MemorySink()
+    generate_point_cloud("vel", epoch, epoch + 1000, pair, "out", sink=sink)
+    tileset = json.loads(sink.contents["tileset.json"])
+    assert "variables" not in tileset.get("properties", {})
+    assert list(batch(sink.contents["0_1.pnts"])) == ["value"]
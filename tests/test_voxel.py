@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from conftest import epoch, parse_pnts
+from utils.voxel import decimate, voxel_groups, Decimator
+from utils.point_cloud import generate_point_cloud
+from utils.sink import MemorySink
+
+
+def test_one_point_per_voxel():
+    points = np.array([[0, 0, 0], [1, 1, 1], [50, 0, 0], [2, 2, 2], [51, 1, 0]], dtype=np.float64)
+    value = np.array([1.0, 3.0, 10.0, 5.0, 20.0])
+    time = np.array([0, 1, 2, 3, 4], dtype=np.int32)
+    mean, centroid, time_ = decimate(points, 10.0, value, points, time)
+    assert mean.tolist() == [3.0, 15.0]  # <--voxels in the order of their first point
+    assert centroid.tolist() == [[1, 1, 1], [50.5, 0.5, 0]]
+    assert time_.tolist() == [1, 3]  # <--integer means are rounded
+    assert decimate(points, 10.0, value, reduce="max")[0].tolist() == [5.0, 20.0]
+
+
+def test_groups_cover_every_point():
+    points = np.random.default_rng(14).uniform(0, 1000, (2000, 3))
+    order, starts, counts = voxel_groups(points, 100.0)
+    assert np.array_equal(np.sort(order), np.arange(2000))
+    assert counts.sum() == 2000 and starts[0] == 0
+    cells = np.floor((points[order] - points.min(axis=0)) / 100.0)
+    for start, count in zip(starts, counts):
+        assert (cells[start:start + count] == cells[start]).all()
+
+
+def test_decimator():
+    assert Decimator(100.0).size(4).tolist() == 400.0
+    with pytest.raises(ValueError):
+        Decimator(reduce="median")
+
+
+def test_decimated_levels_are_smaller(store):
+    sink = MemorySink()
+    generate_point_cloud("ref", epoch, epoch + 1000, store, "out", decimator=Decimator(2000.0), sink=sink)
+    lengths = []
+    for step in (32, 16, 8, 4, 2, 1):
+        feature_table = parse_pnts(sink.contents["0_{}.pnts".format(step)])[0]
+        lengths.append(feature_table["POINTS_LENGTH"])
+    assert lengths[-1] == 5000
+    assert lengths == sorted(lengths) and lengths[0] < 5000 / 32
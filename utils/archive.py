@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import zlib
+import struct
+import hashlib
+import zipfile
+import numpy as np
+from threading import Lock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, unquote, parse_qsl
+from .compress import content_type
+from .stats import prune
+
+# ------ Tileset archives (3TZ) -----------------------------------------
+# usage: python -m utils.archive pack <tileset folder> <out.3tz>
+#        python -m utils.archive list <archive.3tz>
+#        python -m utils.archive serve <archive or folder of archives> [port]
+# - a whole tileset (tileset.json and every tile) in one zip file, one  -
+#   S3 object instead of thousands                                      -
+# - the last member, @3dtilesIndex1@, holds one 24 byte entry per       -
+#   member: md5 of its path (16 bytes) and the offset of its local      -
+#   header (uint64), sorted by the md5 as two little-endian uint64      -
+# - a reader finds a tile with one lookup in the index and one ranged   -
+#   read, no central directory scan (cesium-native reads .3tz directly) -
+# - serve: GET /<archive>.3tz/<path> answers the member, GET of the     -
+#   archive itself honours Range headers                                -
+# - GET .../tileset.json?value=low,high leaves out the subtrees whose  -
+#   value statistics lie outside [low, high] (see stats)                -
+# ---------------------------------------------------------------------
+
+index_name = "@3dtilesIndex1@"
+index_dtype = np.dtype([("low", "<u8"), ("high", "<u8"), ("offset", "<u8")])
+local_header = struct.Struct("<4sHHHHHIIIHH")  # <--zip local file header, 30 bytes
+
+
+def path_hash(name):
+    """(low, high) uint64 halves of the md5 of a member path"""
+    return struct.unpack("<QQ", hashlib.md5(name.encode()).digest())
+
+
+def zip64_size(extra):
+    """stored size of a zip64 member, from the extra field of its local header"""
+    position = 0
+    while position + 4 <= len(extra):
+        kind, length = struct.unpack_from("<HH", extra, position)
+        if (kind == 0x0001):
+            return struct.unpack_from("<QQ", extra, position + 4)[1]
+        position += 4 + length
+    raise ValueError("zip64 member without its extra field")
+
+
+def build_index(offsets):
+    """@3dtilesIndex1@ bytes of a {member path: local header offset} dict"""
+    index = np.empty(len(offsets), dtype=index_dtype)
+    for i, (name, offset) in enumerate(offsets.items()):
+        index[i] = path_hash(name) + (offset,)
+    return np.sort(index, order=("low", "high")).tobytes()
+
+
+def write_index(archive):
+    """append the index of every member written so far to an open ZipFile, as its last member"""
+    offsets = {info.filename: info.header_offset for info in archive.infolist()}  # <--a rewritten name: last one
+    archive.writestr(zipfile.ZipInfo(index_name), build_index(offsets), compress_type=zipfile.ZIP_STORED)
+
+
+def pack(folder, filename, compression=zipfile.ZIP_STORED):
+    """pack a tileset folder (tileset.json and tiles) into a .3tz archive, returns the member count"""
+    with zipfile.ZipFile(filename, mode='w', compression=compression) as archive:
+        for dirpath, _, filenames in sorted(os.walk(folder)):
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                archive.write(path, os.path.relpath(path, folder).replace(os.sep, "/"))
+        count = len(archive.infolist())
+        write_index(archive)
+    return count
+
+
+class TilesetArchive:
+    def __init__(self, source):
+        """
+        Reader of a .3tz archive.
+         source: a file name or a seekable binary file object (e.g. an S3 file from s3fs)
+        """
+        self.file = open(source, mode='rb') if isinstance(source, str) else source
+        self.lock = Lock()  # <--one file position shared by the server threads
+        with zipfile.ZipFile(self.file) as archive:
+            info = archive.infolist()[-1]
+            if (info.filename != index_name):
+                raise ValueError("no {} as the last member, not a 3tz archive".format(index_name))
+            index = np.frombuffer(archive.read(info), dtype=index_dtype)
+        self.index = index
+        self.size = self.file.seek(0, os.SEEK_END)
+
+
+    def read_range(self, start, end):
+        """bytes start <= offset < end of the archive file"""
+        with self.lock:
+            self.file.seek(start)
+            return self.file.read(end - start)
+
+
+    def locate(self, name):
+        """(data offset, stored size, compression method) of a member, KeyError if absent"""
+        low, high = path_hash(name)
+        first = np.searchsorted(self.index["low"], low)
+        for entry in self.index[first:]:
+            if (entry["low"] != low):
+                break
+            if (entry["high"] == high):
+                header = local_header.unpack(self.read_range(int(entry["offset"]),
+                                                             int(entry["offset"]) + local_header.size))
+                signature, _, flags, method, _, _, _, size, _, name_length, extra_length = header
+                if (signature != b"PK\x03\x04" or flags & 0x08):
+                    raise ValueError("broken index entry or streamed member {}".format(name))
+                start = int(entry["offset"]) + local_header.size + name_length + extra_length
+                if (size == 0xFFFFFFFF):
+                    size = zip64_size(self.read_range(start - extra_length, start))
+                return start, size, method
+        raise KeyError(name)
+
+
+    def read(self, name):
+        """a member's bytes"""
+        start, size, method = self.locate(name)
+        data = self.read_range(start, start + size)
+        if (method == zipfile.ZIP_DEFLATED):
+            return zlib.decompress(data, -15)
+        return data
+
+
+    def names(self):
+        """member paths, from the central directory"""
+        with self.lock, zipfile.ZipFile(self.file) as archive:
+            return [name for name in archive.namelist() if (name != index_name)]
+
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) of a single "bytes=a-b" Range header, None for the whole file"""
+    if (not header or not header.startswith("bytes=") or "," in header):
+        return None
+    first, _, last = header[6:].partition("-")
+    if (first):
+        start, end = int(first), min(int(last) + 1 if last else size, size)
+    else:
+        start, end = max(size - int(last), 0), size  # <--suffix range: the last bytes
+    if (start >= end):
+        raise ValueError("unsatisfiable range {}".format(header))
+    return start, end
+
+
+def value_filter(body, text):
+    """tileset.json bytes without the subtrees holding no value in "low,high" (either may be empty)"""
+    low, high = (float(v) if v else None for v in text.split(","))
+    return json.dumps(prune(json.loads(body), low, high)).encode()
+
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = unquote(url.path).strip("/")
+        name, _, member = path.partition(".3tz")
+        archive = self.server.archives.get(name + ".3tz")
+        if (archive is None):
+            return self.send_error(404)
+        try:
+            if (member.strip("/")):
+                body = archive.read(member.strip("/"))
+                value = dict(parse_qsl(url.query)).get("value")
+                if (value and member.endswith(".json")):
+                    body = value_filter(body, value)
+                self.reply(200, body, content_type(member))
+            else:
+                span = parse_range(self.headers.get("Range"), archive.size)
+                if (span is None):
+                    self.reply(200, archive.read_range(0, archive.size), "application/octet-stream")
+                else:
+                    self.reply(206, archive.read_range(*span), "application/octet-stream",
+                               {"Content-Range": "bytes {}-{}/{}".format(span[0], span[1] - 1, archive.size)})
+        except KeyError:
+            self.send_error(404)
+        except ValueError as error:
+            self.send_error(416, str(error))
+
+
+    def reply(self, status, body, kind, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Access-Control-Allow-Origin", "*")  # <--Cesium is served from another origin
+        for key, value in dict(headers).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def find_archives(path):
+    """name to path of an archive, or of every .3tz in a folder"""
+    if (os.path.isfile(path)):
+        return {os.path.basename(path): path}
+    return {name: os.path.join(path, name) for name in sorted(os.listdir(path)) if (name.endswith(".3tz"))}
+
+
+def serve(archives, port=8000, host="127.0.0.1"):
+    """serve the members of archives (name to path) until interrupted"""
+    httpd = ThreadingHTTPServer((host, port), ArchiveHandler)
+    httpd.archives = {name: TilesetArchive(path) for name, path in archives.items()}
+    print("serving {} on http://{}:{}/".format(sorted(archives), host, port))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    httpd.server_close()
+
+
+if __name__ == '__main__':
+    command = sys.argv[1]
+    if (command == "pack"):
+        print("{} members packed".format(pack(sys.argv[2], sys.argv[3])))
+    elif (command == "list"):
+        archive = TilesetArchive(sys.argv[2])
+        for name in archive.names():
+            print(name, archive.locate(name)[1])
+    elif (command == "serve"):
+        serve(find_archives(sys.argv[2]), *[int(arg) for arg in sys.argv[3:4]])
@@ -0,0 +1,170 @@
+import numpy as np
+
+# ------ Per-chunk statistics (zone map) of an ingest zarr store --------
+# group "chunk_index", one row per zarr chunk of location/time/value:
+#   start  (n,)     first point of the chunk
+#   time   (n, 2)   min/max time, seconds since 1970 (the points are time sorted)
+#   bbox   (n, 6)   west, south, east, north, bottom, top in degrees/meters
+#   value/<var> (n, 2)  min/max of each variable, NaN-aware
+# a time window is found with a binary search on time, then bbox/value
+# tests drop whole chunks without decompressing them; the value/time
+# spans also give the compact profile one grid per tileset (grid_ranges)
+# ---------------------------------------------------------------------
+
+
+def write_chunk_index(root, chunk, lon, lat, alt, time, values):
+    """
+    Write the chunk index of a store next to chunk_id. lon/lat/alt/time/values are the
+    arrays just appended to the store (time in seconds since 1970, before the epoch
+    is subtracted); values maps variable name to array.
+    """
+    start = np.arange(0, np.size(time), chunk)
+    group = root.require_group("chunk_index")
+
+    def reduce(array):
+        array = np.asarray(array, dtype=np.float32)  # <--as stored
+        if (start.size == 0):
+            return np.zeros(shape=(0, 2), dtype=np.float32)
+        return np.stack([np.fmin.reduceat(array, start), np.fmax.reduceat(array, start)], axis=-1)
+
+    time = np.asarray(time, dtype=np.int64)
+    group.array("start", start.astype(np.int64), overwrite=True)
+    group.array("time", np.stack([time[start], time[np.append(start[1:], time.size) - 1]], axis=-1)
+                if (start.size > 0) else np.zeros(shape=(0, 2), dtype=np.int64), overwrite=True)
+    lon, lat, alt = reduce(lon), reduce(lat), reduce(alt)
+    group.array("bbox", np.stack([lon[:, 0], lat[:, 0], lon[:, 1], lat[:, 1], alt[:, 0], alt[:, 1]], axis=-1),
+                overwrite=True)
+    value = group.require_group("value")
+    for name, array in values.items():
+        value.array(name, reduce(array), overwrite=True)
+    group.attrs["size"] = int(np.size(time))
+
+
+class ChunkIndex:
+    def __init__(self, start, time, bbox, value, size):
+        self.start = start
+        self.end = np.append(start[1:], size)
+        self.time = time
+        self.bbox = bbox
+        self.value = value
+        self.size = size
+
+
+    @classmethod
+    def load(cls, root):
+        """read the index of a store, None for stores written before it existed"""
+        if ("chunk_index" not in root):
+            return None
+        group = root["chunk_index"]
+        value = {name: array[:] for name, array in group["value"].arrays()}
+        return cls(group["start"][:], group["time"][:], group["bbox"][:], value, group.attrs["size"])
+
+
+    def select(self, epoch=None, end=None, bbox=None, variable=None, value_range=None):
+        """
+        Chunks that may hold points with epoch <= time <= end (seconds since 1970),
+        inside bbox [west, south, east, north(, bottom, top)] and with value_range
+        [vmin, vmax] of variable (None for an open side). Returns chunk numbers.
+        """
+        first = 0 if epoch is None else np.searchsorted(self.time[:, 1], epoch, side='left')
+        last = self.start.size if end is None else np.searchsorted(self.time[:, 0], end, side='right')
+        chunks = np.arange(first, max(first, last))
+
+        if (bbox is not None):
+            box = self.bbox[chunks]
+            keep = (box[:, 2] >= bbox[0]) & (box[:, 0] <= bbox[2]) & (box[:, 3] >= bbox[1]) & (box[:, 1] <= bbox[3])
+            if (len(bbox) > 4):
+                keep &= (box[:, 5] >= bbox[4]) & (box[:, 4] <= bbox[5])
+            chunks = chunks[keep]
+
+        if (value_range is not None):
+            low, high = value_range
+            stats = self.value[variable if isinstance(variable, str) else variable[0]][chunks]  # <--first of a list
+            keep = np.ones(chunks.size, dtype=bool)
+            if (low is not None): keep &= stats[:, 1] >= low
+            if (high is not None): keep &= stats[:, 0] <= high
+            chunks = chunks[keep]
+
+        return chunks
+
+
+    def ranges(self, chunks):
+        """merge chunk numbers into contiguous (start, end) point ranges"""
+        ranges = []
+        for c in chunks:
+            if (ranges and ranges[-1][1] == self.start[c]):
+                ranges[-1] = (ranges[-1][0], int(self.end[c]))
+            else:
+                ranges.append((int(self.start[c]), int(self.end[c])))
+        return ranges
+
+
+def select_ranges(root, epoch, end, bbox=None, variable=None, value_range=None):
+    """
+    (start, end) point ranges of a store that may hold epoch <= time <= end (seconds since 1970),
+    from the chunk index, or from chunk_id (time only) in stores written before it existed
+    """
+    index = ChunkIndex.load(root)
+    if (index is not None):
+        # binary search on the per-chunk stats, chunks outside bbox/value_range are never read
+        return index.ranges(index.select(epoch, end, bbox, variable, value_range))
+
+    chunk_id = root["chunk_id"][:]
+    num_chunks = chunk_id.shape[0]
+    id = np.argmax(chunk_id[:, 1] > epoch) - 1
+    start_id = chunk_id[0 if id < 0 else id, 0]
+    id = num_chunks - np.argmax(chunk_id[::-1, 1] < end)
+    end_id = chunk_id[id, 0] if id < num_chunks else root["time"].size - 1
+    return [(start_id, end_id)]
+
+
+def read_ranges(array, ranges):
+    """read point ranges of a zarr array into one numpy array"""
+    if (len(ranges) == 1):
+        return array[ranges[0][0]:ranges[0][1]]
+    if (len(ranges) == 0):
+        return array[0:0]
+    return np.concatenate([array[start:end] for start, end in ranges])
+
+
+def read_values(root, variable, ranges):
+    """values of a variable over point ranges, (n, k) columns for a list of k variables"""
+    if (isinstance(variable, str)):
+        return read_ranges(root["value"][variable], ranges)
+    return np.column_stack([read_ranges(root["value"][name], ranges) for name in variable])
+
+
+def grid_ranges(root, variable, epoch, end):
+    """
+    (low, high) of the value and time batch arrays of a window over the whole store, from the chunk
+    index: one quantization grid for every tile of a compact profile tileset (see compact).
+    None for stores without a chunk index.
+    """
+    index = ChunkIndex.load(root)
+    if (index is None or index.start.size == 0):
+        return None
+    names = [variable] if isinstance(variable, str) else list(variable)
+    ranges = {}
+    for name in names:
+        stats = index.value[name]
+        ranges["value" if isinstance(variable, str) else name] = (float(np.nanmin(stats[:, 0])),
+                                                                  float(np.nanmax(stats[:, 1])))
+    root_epoch = root.attrs["epoch"]
+    ranges["time"] = (float(max(epoch, index.time[0, 0]) - root_epoch), float(min(end, index.time[-1, 1]) - root_epoch))
+    return ranges
+
+
+def point_mask(lon, lat, alt, value, bbox=None, value_range=None):
+    """the per-point version of ChunkIndex.select's bbox/value tests"""
+    mask = np.ones(len(value), dtype=bool)
+    if (np.ndim(value) > 1):
+        value = value[:, 0]  # <--multi-variable values are filtered on the first
+    if (bbox is not None):
+        mask &= (lon >= bbox[0]) & (lon <= bbox[2]) & (lat >= bbox[1]) & (lat <= bbox[3])
+        if (len(bbox) > 4):
+            mask &= (alt >= bbox[4]) & (alt <= bbox[5])
+    if (value_range is not None):
+        low, high = value_range
+        if (low is not None): mask &= value >= low
+        if (high is not None): mask &= value <= high
+    return mask
@@ -0,0 +1,120 @@
+import numpy as np
+
+# ------ Compact point tile profile -------------------------------------
+# - "full": what the writers always wrote, 24 bytes/point in .pnts:     -
+#   BATCH_ID uint32, POSITION_QUANTIZED, value/time float32, location   -
+#   int16 VEC3 (plus RGBA uint8 for IMPACTS)                            -
+# - "compact": float batch arrays become uint16 with a per-tile         -
+#   "offset" and "scale" in their batch table entry                     -
+#   (value = offset + q * scale), RGB/RGBA become a uint8 "class" index -
+#   into a palette kept in the tileset metadata, BATCH_ID and the       -
+#   location duplicate of the position are dropped: 10 bytes/point     -
+# - "compact-pick": compact but keeps BATCH_ID and location for viewers -
+#   that pick single points                                             -
+# - offset/scale in a .pnts batch table entry are this repo's          -
+#   convention, 3D Tiles and Cesium do not read them: a style compares  -
+#   the stored uint16 (glb turns them into normalized EXT_structural_   -
+#   metadata properties, which Cesium does scale)                      -
+# - so every tile of a tileset is quantized on one grid: ranges gives   -
+#   each float batch array its (low, high); PointCloud requires them    -
+#   for value and time (chunk_index.grid_ranges takes the store's       -
+#   spans) and lists them in tileset.json properties.grids, a style    -
+#   threshold is written in quantized units (see grid_value)            -
+# ---------------------------------------------------------------------
+
+profiles = ("full", "compact", "compact-pick")
+
+
+def grid(low, high, nbits=16):
+    """(offset, scale) of 2**nbits steps from low to high"""
+    return float(low), (float(high) - float(low)) / (2 ** nbits - 1) if (high > low) else 1.0
+
+
+def grid_value(value, low, high, nbits=16):
+    """value in the quantized units of the (low, high) grid, for style conditions"""
+    offset, scale = grid(low, high, nbits)
+    return (value - offset) / scale
+
+
+def quantize(array, nbits=16, low=None, high=None):
+    """
+    array on a uniform grid of 2**nbits steps, return (q, offset, scale).
+    The grid spans the array, or low to high (values outside are clipped).
+    """
+    dtype = np.uint16 if (nbits <= 16) else np.uint32
+    if (low is None and np.size(array) == 0):
+        return np.asarray(array, dtype=dtype), 0.0, 1.0
+    if (low is None):
+        low, high = np.min(array), np.max(array)
+    offset, scale = grid(low, high, nbits)
+    q = np.rint(np.clip((array - offset) / scale, 0, 2 ** nbits - 1)).astype(dtype)
+    return q, offset, scale
+
+
+class Palette:
+    def __init__(self, colors=()):
+        """RGBA colors indexed by a uint8 class, new colors are appended so indices stay stable"""
+        self.colors = [tuple(int(c) for c in color) for color in colors]
+        self.lookup = {color: i for i, color in enumerate(self.colors)}
+
+
+    def index(self, rgba):
+        """uint8 class of every RGB/RGBA row"""
+        rgba = np.asarray(rgba, dtype=np.uint8)
+        if (rgba.shape[1] == 3):
+            rgba = np.concatenate([rgba, np.full((rgba.shape[0], 1), 255, dtype=np.uint8)], axis=1)
+        unique, inverse = np.unique(rgba, axis=0, return_inverse=True)
+        classes = np.empty(len(unique), dtype=np.uint8)
+        for i, color in enumerate(map(tuple, unique.tolist())):
+            if (color not in self.lookup):
+                if (len(self.colors) == 256):
+                    raise ValueError("more than 256 colors, use the full profile")
+                self.lookup[color] = len(self.colors)
+                self.colors.append(color)
+            classes[i] = self.lookup[color]
+        return classes[inverse.ravel()]
+
+
+    def style(self, name="class"):
+        """Cesium 3D Tiles style drawing each class in its palette color"""
+        conditions = [["${{{}}} === {}".format(name, i), "rgba({}, {}, {}, {})".format(r, g, b, a / 255.0)]
+                      for i, (r, g, b, a) in enumerate(self.colors)]
+        return {"color": {"conditions": conditions + [["true", "color('white')"]]}}
+
+
+def compact(feature_table, feature_arrays, batch_arrays, profile="compact", palette=None, ranges=None):
+    """
+    Arguments of write_tile for a full-profile tile, converted to profile.
+    A tile with RGB/RGBA colors needs the tileset's palette.
+    ranges: batch array name to the (low, high) of a grid shared by the tileset, others span the tile.
+    """
+    if (profile == "full"):
+        return feature_table, feature_arrays, batch_arrays
+    if (profile not in profiles):
+        raise ValueError("unknown tile profile {}, one of {}".format(profile, profiles))
+    pick = profile == "compact-pick"
+
+    feature_table = dict(feature_table)
+    if (not pick):
+        feature_table.pop("BATCH_LENGTH", None)
+
+    features = []
+    batch = []
+    for name, array, properties in feature_arrays:
+        if (name == "BATCH_ID" and not pick):
+            continue
+        if (name in ("RGB", "RGBA")):
+            if (palette is None):
+                raise ValueError("{} needs a palette in the {} profile".format(name, profile))
+            batch.append(("class", palette.index(array), {"componentType": "UNSIGNED_BYTE", "type": "SCALAR"}))
+            continue
+        features.append((name, array, properties))
+
+    for name, array, properties in batch_arrays:
+        if (name == "location" and not pick):
+            continue
+        if (properties.get("componentType") in ("FLOAT", "DOUBLE") and properties.get("type", "SCALAR") == "SCALAR"):
+            array, offset, scale = quantize(array, 16, *(ranges or {}).get(name, (None, None)))
+            properties = dict(properties, componentType="UNSIGNED_SHORT", offset=offset, scale=scale)
+        batch.append((name, array, properties))
+    return feature_table, features, batch
@@ -0,0 +1,109 @@
+import os
+import gzip
+import boto3
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ------ Pre-compressed S3 artifacts -------------------------------------
+# - .pnts/.json/.czml are uploaded compressed with Content-Encoding set,  -
+#   browsers (Cesium) decompress them transparently                       -
+# - files below `threshold` bytes, already-compressed formats and files   -
+#   that do not shrink are uploaded as they are                           -
+# - "br" needs the brotli package, otherwise gzip is used                 -
+# -----------------------------------------------------------------------
+
+threshold = 1024
+
+content_types = {
+    ".json": "application/json",
+    ".czml": "application/json",
+    ".pnts": "application/octet-stream",
+    ".b3dm": "application/octet-stream",
+    ".subtree": "application/octet-stream",
+    ".glb": "model/gltf-binary",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".tif": "image/tiff",
+    ".gz": "application/gzip",
+    ".zip": "application/zip"
+}
+precompressed = {".png", ".jpg", ".tif", ".gz", ".zip", ".3tz"}
+
+
+def content_type(filename):
+    return content_types.get(os.path.splitext(filename)[1].lower(), "binary/octet-stream")
+
+
+def compress(data, encoding="gzip"):
+    """compress bytes, return (body, Content-Encoding actually used)"""
+    if (encoding == "br" and brotli is not None):
+        return brotli.compress(data, quality=9), "br"
+    return gzip.compress(data, compresslevel=6, mtime=0), "gzip"  # <--mtime=0: same input, same bytes
+
+
+def decompress(body, encoding=None):
+    """bytes of a body stored with Content-Encoding encoding (None: as it is)"""
+    if (encoding == "br"):
+        if (brotli is None):
+            raise ImportError("brotli is needed to read a br encoded object")
+        return brotli.decompress(body)
+    if (encoding == "gzip"):
+        return gzip.decompress(body)
+    return body
+
+
+def encode_artifact(data, filename, encoding="gzip", threshold=threshold):
+    """
+    Body and put_object metadata (ContentType, ContentEncoding) for an artifact.
+    encoding None leaves the body as it is.
+    """
+    if (isinstance(data, str)):
+        data = data.encode()
+    extra = {"ContentType": content_type(filename)}
+    if (encoding is None or len(data) < threshold or
+            os.path.splitext(filename)[1].lower() in precompressed):
+        return data, extra
+
+    body, used = compress(data, encoding)
+    if (len(body) >= len(data)):
+        return data, extra
+    extra["ContentEncoding"] = used
+    return body, extra
+
+
+def put_compressed(s3, bucket, key, data, encoding="gzip", threshold=threshold):
+    """put_object of bytes/str with compression and matching metadata"""
+    body, extra = encode_artifact(data, key, encoding, threshold)
+    s3.put_object(Body=body, Bucket=bucket, Key=key, **extra)
+
+
+def upload_compressed(s3, file_name, bucket, key, encoding="gzip", threshold=threshold):
+    """upload a local file compressed (see encode_artifact)"""
+    with open(file_name, mode='rb') as infile:
+        data = infile.read()
+    put_compressed(s3, bucket, key, data, encoding, threshold)
+
+
+def sync_to_s3(folder, s3path, encoding="gzip", threshold=threshold, workers=16):
+    """
+    Upload every file under folder to s3://bucket/prefix keeping the relative paths,
+    compressed, on `workers` threads. Replaces `aws s3 sync folder s3path`.
+    """
+    bucket, _, prefix = s3path.replace("s3://", "", 1).partition("/")
+    prefix = prefix.rstrip("/")
+    s3 = boto3.client('s3')  # <--clients are thread safe, resources are not
+
+    files = []
+    for dirpath, _, filenames in os.walk(folder):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            key = os.path.relpath(path, folder).replace(os.sep, "/")
+            files.append((path, "{}/{}".format(prefix, key) if prefix else key))
+
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(lambda item: upload_compressed(s3, item[0], bucket, item[1], encoding, threshold), files))
+    return len(files)
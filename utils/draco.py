@@ -0,0 +1,103 @@
+import numpy as np
+from .pnts import encode_pnts, component_types
+from .compact import quantize
+
+try:
+    import DracoPy
+except ImportError:
+    DracoPy = None
+
+# ------ Draco compressed .pnts (3DTILES_draco_point_compression) -------
+# - takes write_pnts' arguments: POSITION_QUANTIZED is turned back into  -
+#   meters around RTC_CENTER and Draco quantizes it again, RGB/RGBA and -
+#   float batch arrays (value, time) go into the Draco stream           -
+# - Draco reorders the points, so every batch array goes into the     -
+#   stream too; signed ones (location) are shifted to unsigned with an -
+#   "offset" in their batch table entry                                 -
+# - bits: quantization bits per attribute, None keeps it lossless;      -
+#   a quantized batch array is stored as uint16/uint32 with "offset"    -
+#   and "scale" in its batch table entry (value = offset + q * scale)   -
+# - needs the DracoPy package, without it format "draco" raises        -
+# ---------------------------------------------------------------------
+
+bits = {"POSITION": 16}
+component_names = {np.dtype(np.uint8): "UNSIGNED_BYTE", np.dtype(np.uint16): "UNSIGNED_SHORT",
+                   np.dtype(np.uint32): "UNSIGNED_INT"}
+level = 7  # <--Draco compression level 0-10, speed vs size
+
+
+def encode_draco_pnts(feature_table, feature_arrays, batch_table=None, batch_arrays=(), bits=bits, level=level):
+    """
+    Encode a .pnts tile with its positions, colors and batch arrays Draco compressed.
+    Same arguments as pnts.encode_pnts plus bits (attribute name to quantization bits)
+    and the Draco compression level.
+    """
+    if (DracoPy is None):
+        raise ImportError("DracoPy is needed for Draco compressed tiles, or use format pnts or glb")
+    length = int(feature_table["POINTS_LENGTH"])
+    if (length == 0):
+        return encode_pnts(feature_table, feature_arrays, batch_table, batch_arrays)
+
+    offset = feature_table["QUANTIZED_VOLUME_OFFSET"]
+    scale = np.asarray(feature_table["QUANTIZED_VOLUME_SCALE"], dtype=np.float64)
+    feature_table = {key: value for key, value in feature_table.items()
+                     if (key not in ("BATCH_LENGTH", "QUANTIZED_VOLUME_OFFSET", "QUANTIZED_VOLUME_SCALE"))}
+    batch_table = dict(batch_table or {})
+    points = None
+    colors = None
+    color = None
+    for name, array, properties in feature_arrays:
+        if (name == "POSITION_QUANTIZED"):
+            points = (array * (scale / 65535.0)).astype(np.float32)  # <--meters from RTC_CENTER
+        elif (name in ("RGB", "RGBA")):
+            colors, color = array, name
+        elif (name != "BATCH_ID"):  # <--batch arrays are per point, BATCH_ID is not needed
+            raise ValueError("no Draco attribute for feature array {}".format(name))
+
+    generic = {}
+    compressed = {}
+    for name, array, properties in batch_arrays:
+        entry = dict({"type": "SCALAR", "componentType": "FLOAT"}, **properties, byteOffset=0)
+        array = np.asarray(array, dtype=component_types.get(entry["componentType"]))
+        nbits = bits.get(name)
+        if (nbits):
+            array, low, step = quantize(array, nbits)
+            entry.update(offset=low, scale=step)
+        elif (array.dtype.kind == "i"):
+            low = int(np.min(array))  # <--Draco has no signed attributes, shift to unsigned
+            array = (array.astype(np.int64) - low).astype(array.dtype.str.replace("i", "u"))
+            entry.update(offset=low, scale=1)
+        elif (array.dtype.kind == "f"):
+            array = array.astype(np.float32, copy=False)  # <--no doubles in Draco
+            entry["componentType"] = "FLOAT"
+        if (array.dtype.kind == "u"):
+            entry["componentType"] = component_names[array.dtype]
+        generic[len(generic)] = array.reshape(length, -1)
+        compressed[name] = len(generic) - 1
+        batch_table[name] = entry
+
+    # DracoPy numbers the generic attributes by their keys, then POSITION and the colors
+    draco = DracoPy.encode(points, quantization_bits=bits.get("POSITION", 16), compression_level=level,
+                           colors=colors, generic_attributes=generic or None)
+    ids = {"POSITION": len(generic)}
+    if (colors is not None):
+        ids[color] = len(generic) + 1
+        feature_table[color] = {"byteOffset": 0}
+
+    feature_table["RTC_CENTER"] = list(offset)
+    feature_table["extensions"] = {"3DTILES_draco_point_compression": {
+        "properties": ids, "byteOffset": 0, "byteLength": len(draco)}}
+    if (compressed):
+        batch_table["extensions"] = {"3DTILES_draco_point_compression": {"properties": compressed}}
+
+    # the Draco stream is the whole feature table body, POSITION's byteOffset is ignored
+    return encode_pnts(feature_table, [("POSITION", np.frombuffer(draco, dtype=np.uint8), {})], batch_table)
+
+
+def write_draco_pnts(filename, feature_table, feature_arrays, batch_table=None, batch_arrays=(),
+                     bits=bits, level=level):
+    """encode a Draco compressed .pnts tile and write it out with a single write"""
+    buffer = encode_draco_pnts(feature_table, feature_arrays, batch_table, batch_arrays, bits, level)
+    with open(filename, mode='wb') as outfile:
+        outfile.write(buffer)
+    return buffer
@@ -0,0 +1,152 @@
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# ------ Geodetic (lon, lat, alt) to quantized ECEF ---------------------
+# - WGS84, closed form with the prime vertical radius                   -
+#     N = a^2 / sqrt(a^2 cos^2(lat) + b^2 sin^2(lat))                    -
+#     x = (N + alt) cos(lat) cos(lon)                                   -
+#     y = (N + alt) cos(lat) sin(lon)                                   -
+#     z = (b^2/a^2 N + alt) sin(lat)                                    -
+# - the old code normalised the (already unit) surface normal and kept  -
+#   ~20 float64 temporaries per call; here the work is done in a (3, n) -
+#   buffer plus a few reused temporaries, or in one compiled loop when  -
+#   numba is installed                                                  -
+# ---------------------------------------------------------------------
+
+to_rad = np.pi / 180.0
+a2 = 40680631590769.0  # <--WGS84 radii squared
+b2 = 40408299984661.445
+
+
+def cartographic_to_cartesian(lon, lat, alt, dtype=np.float64, jit=True,
+                              cartesian=None, cartographic=None, work=None):
+    """
+    Geodetic degrees/meters to what a .pnts tile needs, in one call.
+     dtype: float type of the ECEF math; np.float32 halves the memory traffic
+            (~0.5 m rounding at earth radius, below the uint16 step of most tiles)
+     jit: use the numba kernel when numba is installed
+     cartesian, cartographic, work: optional preallocated outputs, (n, 3) uint16,
+            (n, 3) int16 and (3, n) dtype, reused across calls to avoid allocation
+    Returns cartesian (POSITION_QUANTIZED), offset, scale, cartographic (int16
+    lon/lat/alt batch attribute) and region (radians, meters).
+    """
+    lon = np.asarray(lon)
+    lat = np.asarray(lat)
+    alt = np.asarray(alt)
+    size = lon.size
+
+    if (cartesian is None):
+        cartesian = np.empty(shape=(size, 3), dtype=np.uint16)
+    if (cartographic is None):
+        cartographic = np.empty(shape=(size, 3), dtype=np.int16)
+    if (work is None):
+        work = np.empty(shape=(3, size), dtype=dtype)
+
+    if (jit and numba is not None):
+        offset, scale = _kernel(lon, lat, alt, cartesian, cartographic, work)
+        offset, scale = [float(v) for v in offset], [float(v) for v in scale]
+    else:
+        offset, scale = _numpy(lon, lat, alt, cartesian, cartographic, work)
+
+    return cartesian, offset, scale, cartographic, region(lon, lat, alt)
+
+
+def region(lon, lat, alt):
+    """3D Tiles region [west, south, east, north, bottom, top] (radians, meters) of points"""
+    return [
+        float(np.min(lon) * to_rad),
+        float(np.min(lat) * to_rad),
+        float(np.max(lon) * to_rad),
+        float(np.max(lat) * to_rad),
+        float(np.min(alt)),
+        float(np.max(alt))
+    ]
+
+
+def _numpy(lon, lat, alt, cartesian, cartographic, work):
+    x, y, z = work
+    dtype = work.dtype
+
+    # int16 cartographic, same rounding as before (lon * 32767 / 180, truncated)
+    np.multiply(lon, 32767, out=x, casting='unsafe')
+    x /= 180
+    cartographic[:, 0] = x
+    np.multiply(lat, 32767, out=x, casting='unsafe')
+    x /= 180
+    cartographic[:, 1] = x
+    np.divide(alt, 10, out=x, casting='unsafe')
+    cartographic[:, 2] = x
+
+    lam = np.multiply(lon, to_rad, dtype=dtype)
+    phi = np.multiply(lat, to_rad, dtype=dtype)
+    cos_phi = np.cos(phi)
+    sin_phi = np.sin(phi, out=phi)
+
+    # x holds N, y holds (N + alt) cos(lat)
+    np.multiply(cos_phi, cos_phi, out=x)
+    x *= a2
+    np.multiply(sin_phi, sin_phi, out=y)
+    y *= b2
+    x += y
+    np.sqrt(x, out=x)
+    np.divide(a2, x, out=x)
+    np.add(x, alt, out=y, casting='unsafe')
+    y *= cos_phi
+
+    x *= b2 / a2
+    x += alt
+    np.multiply(x, sin_phi, out=z)
+    np.cos(lam, out=cos_phi)
+    np.multiply(y, cos_phi, out=x)
+    np.sin(lam, out=lam)
+    y *= lam
+
+    offset = []
+    scale = []
+    for i, row in enumerate(work):
+        low = row.min()
+        row -= low
+        high = abs(row.max())
+        offset.append(float(low))
+        scale.append(float(high))
+        if (high > 0):
+            row /= high
+            row *= 65535.0
+        cartesian[:, i] = row
+    return offset, scale
+
+
+if (numba is not None):
+    @numba.njit(cache=True)
+    def _kernel(lon, lat, alt, cartesian, cartographic, work):
+        size = lon.size
+        low = np.full(3, np.inf)
+        high = np.full(3, -np.inf)
+        for i in range(size):
+            cartographic[i, 0] = np.int16(lon[i] * 32767 / 180)
+            cartographic[i, 1] = np.int16(lat[i] * 32767 / 180)
+            cartographic[i, 2] = np.int16(alt[i] / 10)
+
+            lam = lon[i] * to_rad
+            phi = lat[i] * to_rad
+            cos_phi = np.cos(phi)
+            sin_phi = np.sin(phi)
+            n = a2 / np.sqrt(a2 * cos_phi * cos_phi + b2 * sin_phi * sin_phi)
+            r = (n + alt[i]) * cos_phi
+            work[0, i] = r * np.cos(lam)
+            work[1, i] = r * np.sin(lam)
+            work[2, i] = (b2 / a2 * n + alt[i]) * sin_phi
+            for k in range(3):
+                low[k] = min(low[k], work[k, i])
+                high[k] = max(high[k], work[k, i])
+
+        scale = high - low
+        for k in range(3):
+            factor = 65535.0 / scale[k] if scale[k] > 0 else 0.0
+            for i in range(size):
+                cartesian[i, k] = np.uint16((work[k, i] - low[k]) * factor)
+        return low, scale
@@ -0,0 +1,217 @@
+import json
+import numpy as np
+from .pnts import component_types
+
+try:
+    import meshoptimizer
+except ImportError:
+    meshoptimizer = None
+
+if (meshoptimizer is not None and hasattr(meshoptimizer, "encode_vertex_version")):
+    meshoptimizer.encode_vertex_version(0)  # <--EXT_meshopt_compression decoders only read v0
+
+# ------ glTF 2.0 (.glb) point tiles for 3D Tiles 1.1 -------------------
+# - takes the same feature/batch arrays as write_pnts, so a writer can    -
+#   switch backends without changing how it builds a tile               -
+# - POSITION_QUANTIZED stays uint16 (KHR_mesh_quantization); offset,      -
+#   scale and the glTF y-up to ECEF z-up rotation go in the node matrix -
+# - batch arrays (value, time, location) become EXT_structural_metadata  -
+#   property attributes _VALUE, _TIME, ...; BATCH_ID is not needed      -
+#   (an "offset"/"scale" of a uint array, see compact, becomes a        -
+#   normalized property with the same meaning)                          -
+# - vertex streams are EXT_meshopt_compression encoded when the          -
+#   meshoptimizer package is installed                                  -
+# ---------------------------------------------------------------------
+
+chunk_json = 0x4E4F534A
+chunk_bin = 0x004E4942
+
+required = ("KHR_mesh_quantization", "EXT_meshopt_compression")  # <--the rest can be ignored by a viewer
+
+accessor_types = {1: "SCALAR", 2: "VEC2", 3: "VEC3", 4: "VEC4"}
+gltf_components = {
+    np.dtype(np.int8): 5120,
+    np.dtype(np.uint8): 5121,
+    np.dtype(np.int16): 5122,
+    np.dtype(np.uint16): 5123,
+    np.dtype(np.float32): 5126
+}
+metadata_components = {
+    np.dtype(np.int8): "INT8",
+    np.dtype(np.uint8): "UINT8",
+    np.dtype(np.int16): "INT16",
+    np.dtype(np.uint16): "UINT16",
+    np.dtype(np.float32): "FLOAT32"
+}
+
+
+def vertex_stream(array, dtype):
+    """array as (n, k) dtype, padded so that each vertex is a multiple of 4 bytes"""
+    array = np.asarray(array)
+    count = array.shape[0]
+    components = 1 if (array.ndim == 1) else array.shape[1]
+    width = -(-components * dtype.itemsize // 4) * 4 // dtype.itemsize
+    stream = np.zeros(shape=(count, width), dtype=dtype)
+    stream[:, :components] = array.reshape(count, components)
+    return stream, components
+
+
+class GlbBuilder:
+    def __init__(self, count, meshopt=True):
+        self.count = count
+        self.meshopt = meshopt and meshoptimizer is not None
+        self.views = []
+        self.accessors = []
+        self.data = []  # <--uncompressed vertex streams
+        self.packed = []  # <--meshopt encoded streams
+
+
+    def add(self, array, dtype, normalized=False, bounds=False):
+        """add a vertex attribute, return its accessor index"""
+        stream, components = vertex_stream(array, dtype)
+        view = {
+            "buffer": 0,
+            "byteOffset": sum(len(d) for d in self.data),
+            "byteLength": stream.nbytes,
+            "byteStride": stream.strides[0],
+            "target": 34962
+        }
+        if (self.meshopt):
+            packed = bytes(meshoptimizer.encode_vertex_buffer(stream))
+            view["buffer"] = 1  # <--the fallback buffer, it has no data of its own
+            view["extensions"] = {"EXT_meshopt_compression": {
+                "buffer": 0,
+                "byteOffset": sum(len(p) for p in self.packed),
+                "byteLength": len(packed),
+                "byteStride": stream.strides[0],
+                "count": self.count,
+                "mode": "ATTRIBUTES"
+            }}
+            self.packed.append(packed + b"\0" * (-len(packed) % 4))
+        self.data.append(stream.tobytes())
+        self.views.append(view)
+
+        accessor = {
+            "bufferView": len(self.views) - 1,
+            "componentType": gltf_components[dtype],
+            "count": self.count,
+            "type": accessor_types[components]
+        }
+        if (normalized):
+            accessor["normalized"] = True
+        if (bounds):
+            values = stream[:, :components]
+            accessor["min"] = values.min(axis=0).tolist()
+            accessor["max"] = values.max(axis=0).tolist()
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+
+    def buffers(self):
+        """the GLB binary chunk and the buffers list"""
+        if (self.meshopt):
+            body = b"".join(self.packed)
+            return body, [{"byteLength": len(body)},
+                          {"byteLength": sum(len(d) for d in self.data),
+                           "extensions": {"EXT_meshopt_compression": {"fallback": True}}}]
+        body = b"".join(self.data)
+        return body, [{"byteLength": len(body)}]
+
+
+def node_matrix(offset, scale):
+    """column major matrix from uint16 quantized positions to glTF (y-up) coordinates"""
+    sx, sy, sz = [s / 65535.0 for s in scale]
+    ox, oy, oz = offset
+    return [sx, 0, 0, 0,
+            0, 0, -sy, 0,
+            0, sz, 0, 0,
+            ox, oz, -oy, 1]  # <--(x, y, z) ECEF is (x, z, -y) in glTF
+
+
+def encode_glb(feature_table, feature_arrays, batch_table=None, batch_arrays=(), meshopt=True):
+    """
+    Encode a point tile as binary glTF, from the same arguments as pnts.encode_pnts.
+    Supports POSITION_QUANTIZED (with QUANTIZED_VOLUME_OFFSET/SCALE), RGB/RGBA and
+    BATCH_ID (dropped) feature arrays and CONSTANT_RGBA (an unlit material); every
+    batch array becomes a metadata attribute.
+    """
+    count = int(feature_table["POINTS_LENGTH"])
+    gltf = {
+        "asset": {"version": "2.0"},
+        "scene": 0,
+        "scenes": [{}]
+    }
+    builder = GlbBuilder(count, meshopt)
+    used = ["KHR_mesh_quantization"]
+
+    if (count > 0):  # <--an empty level is a glTF with an empty scene
+        attributes = {}
+        for name, array, properties in feature_arrays:
+            if (name == "POSITION_QUANTIZED"):
+                attributes["POSITION"] = builder.add(array, np.dtype(np.uint16), bounds=True)
+            elif (name in ("RGB", "RGBA")):
+                attributes["COLOR_0"] = builder.add(array, np.dtype(np.uint8), normalized=True)
+            elif (name != "BATCH_ID"):
+                raise ValueError("no glTF attribute for feature array {}".format(name))
+
+        classes = {}
+        properties = {}
+        for name, array, options in batch_arrays:
+            dtype = np.dtype(component_types.get(options.get("componentType"), np.asarray(array).dtype))
+            attribute = "_" + name.upper()
+            attributes[attribute] = builder.add(array, dtype)
+            accessor = builder.accessors[attributes[attribute]]
+            classes[name] = {"type": accessor["type"], "componentType": metadata_components[dtype]}
+            if ("offset" in options and dtype.kind == "u"):  # <--compact profile: normalized uint
+                classes[name].update(normalized=True, offset=options["offset"],
+                                     scale=options["scale"] * np.iinfo(dtype).max)
+            properties[name] = {"attribute": attribute}
+
+        primitive = {"attributes": attributes, "mode": 0}
+        if ("CONSTANT_RGBA" in feature_table):
+            gltf["materials"] = [{
+                "pbrMetallicRoughness": {"baseColorFactor": [c / 255.0 for c in feature_table["CONSTANT_RGBA"]]},
+                "extensions": {"KHR_materials_unlit": {}}
+            }]
+            primitive["material"] = 0
+            used.append("KHR_materials_unlit")
+        if (classes):
+            primitive["extensions"] = {"EXT_structural_metadata": {"propertyAttributes": [0]}}
+            gltf["extensions"] = {"EXT_structural_metadata": {
+                "schema": {"id": "point_cloud", "classes": {"point": {"properties": classes}}},
+                "propertyAttributes": [{"class": "point", "properties": properties}]
+            }}
+            used.append("EXT_structural_metadata")
+
+        gltf["meshes"] = [{"primitives": [primitive]}]
+        gltf["nodes"] = [{"mesh": 0, "matrix": node_matrix(feature_table["QUANTIZED_VOLUME_OFFSET"],
+                                                           feature_table["QUANTIZED_VOLUME_SCALE"])}]
+        gltf["scenes"] = [{"nodes": [0]}]
+        gltf["accessors"] = builder.accessors
+        gltf["bufferViews"] = builder.views
+
+    body, buffers = builder.buffers()
+    if (count > 0):
+        if (builder.meshopt):
+            used.append("EXT_meshopt_compression")
+        gltf["buffers"] = buffers
+        gltf["extensionsUsed"] = used
+        gltf["extensionsRequired"] = [name for name in used if (name in required)]
+
+    text = json.dumps(gltf, separators=(",", ":")).encode()
+    text += b" " * (-len(text) % 4)
+    body += b"\0" * (-len(body) % 4)
+    length = 12 + 8 + len(text) + (8 + len(body) if body else 0)
+
+    header = np.array([0x46546C67, 2, length, len(text), chunk_json], dtype=np.uint32).tobytes()
+    if (body):
+        return header + text + np.array([len(body), chunk_bin], dtype=np.uint32).tobytes() + body
+    return header + text
+
+
+def write_glb(filename, feature_table, feature_arrays, batch_table=None, batch_arrays=(), meshopt=True):
+    """encode a .glb point tile and write it out with a single write"""
+    buffer = encode_glb(feature_table, feature_arrays, batch_table, batch_arrays, meshopt)
+    with open(filename, mode='wb') as outfile:
+        outfile.write(buffer)
+    return buffer
@@ -0,0 +1,92 @@
+from .spacing import region_error
+from .stats import merge_stats, node_stats
+
+# ------ Balanced tileset.json hierarchy --------------------------------
+# - tiles are appended flat under root while they are encoded; at write -
+#   time they are sorted by availability (time order, so along the      -
+#   flight track) and grouped `fanout` per node, level by level         -
+# - every internal node carries the union region and availability of   -
+#   its subtree, so Cesium culls whole time/space subtrees instead of   -
+#   testing every tile: traversal cost is logarithmic in the tiles      -
+# - internal nodes have no content and the root's geometricError, they  -
+#   always refine: what is drawn is unchanged, only the traversal       -
+# - the root's geometricError is the diagonal of the root region (see   -
+#   spacing), at least the error of any tile under it                   -
+# - tiles with value statistics (see stats): internal nodes and the     -
+#   tileset get the merge of the statistics under them                  -
+# ---------------------------------------------------------------------
+
+fanout = 8
+
+
+def union_region(region, other):
+    """smallest region [west, south, east, north, bottom, top] holding both (either may be empty)"""
+    if (not region): return list(other)
+    if (not other): return list(region)
+    return [min(region[0], other[0]), min(region[1], other[1]), max(region[2], other[2]),
+            max(region[3], other[3]), min(region[4], other[4]), max(region[5], other[5])]
+
+
+def union_availability(availability, other):
+    """"start/end" interval covering both (ISO 8601 strings sort in time order)"""
+    if (not availability): return other
+    if (not other): return availability
+    start, end = availability.split("/")
+    other_start, other_end = other.split("/")
+    return "{}/{}".format(min(start, other_start), max(end, other_end))
+
+
+def group(children, geometric_error):
+    """internal node over children with their union region and availability"""
+    region = []
+    availability = None
+    for child in children:
+        region = union_region(region, child["boundingVolume"]["region"])
+        availability = union_availability(availability, child.get("availability"))
+    node = {
+        "geometricError": geometric_error,
+        "boundingVolume": {
+            "region": region
+        },
+        "children": list(children)
+    }
+    if (availability):
+        node["availability"] = availability
+    stats = [node_stats(child) for child in children]
+    if (any(stats)):
+        node["extras"] = {"statistics": merge_stats(stats)}
+    return node
+
+
+def balance(tiles, geometric_error, fanout=fanout):
+    """
+    Arrange tiles (tileset.json nodes) into a balanced tree of internal nodes,
+    return the at most `fanout` nodes that go under root.
+    """
+    level = sorted(tiles, key=lambda tile: tile.get("availability", ""))
+    while len(level) > fanout:
+        count = -(-len(level) // fanout)  # <--no. of nodes on the next level up
+        bounds = [len(level) * i // count for i in range(count + 1)]
+        level = [group(level[start:end], geometric_error) for start, end in zip(bounds[:-1], bounds[1:])]
+    return level
+
+
+def assemble(tileset_json, fanout=fanout):
+    """
+    Copy of a tileset.json whose tiles sit flat under root, with the tiles in a
+    balanced tree and the root region and geometricError recomputed from the tiles.
+    """
+    root = dict(tileset_json["root"])
+    tiles = root.get("children", [])
+    if (tiles):
+        region = []
+        for tile in tiles:
+            region = union_region(region, tile["boundingVolume"]["region"])
+        root["boundingVolume"] = {"region": region}
+        root["geometricError"] = max([region_error(region)] + [tile["geometricError"] for tile in tiles])
+        root["children"] = balance(tiles, root["geometricError"], fanout)
+        stats = [node_stats(tile) for tile in tiles]
+        if (any(stats)):
+            extras = dict(tileset_json.get("extras", {}), statistics=merge_stats(stats))
+            return dict(tileset_json, root=root, extras=extras)
+    return dict(tileset_json, root=root)
@@ -0,0 +1,46 @@
+import numpy as np
+
+# ------ LOD level selection ------------------------------------------
+# - REPLACE: a level with stride `step` holds every step-th point, so   -
+#   the coarse levels are stored again inside every finer level        -
+# - ADD: a level only holds the [::step] points its ancestors (coarser -
+#   strides over the same arrays) do not have; the viewer draws a      -
+#   level on top of its ancestors, so each point is stored once        -
+# - ADD levels only nest when they stride one data set: lightning       -
+#   writers pick flash/group/event per level under REPLACE, under ADD   -
+#   every level strides the finest one (nested_levels)                 -
+# ---------------------------------------------------------------------
+
+
+def level_selector(size, step, ancestors=(), refine="REPLACE"):
+    """
+    Selector of the points of one LOD level out of the full-resolution arrays.
+     size: no. of points in the arrays
+     step: stride of the level
+     ancestors: strides of the coarser levels already written from the same arrays
+    Returns a slice when the level is a plain stride (a view, no copy), else an index array.
+    """
+    if (refine != "ADD" or len(ancestors) == 0):
+        return slice(None, None, step)
+
+    finest = min(ancestors)
+    if (finest == 2 * step and all(a % finest == 0 for a in ancestors)):
+        return slice(step, None, finest)  # <--halving chain, e.g. 32,16,...,1
+
+    index = np.arange(0, size, step)
+    keep = np.ones(index.size, dtype=bool)
+    for a in ancestors:
+        keep &= index % a != 0
+    return index[keep]
+
+
+def level_size(size, selector):
+    """no. of points a selector picks out of arrays of length size"""
+    if (isinstance(selector, slice)):
+        return len(range(*selector.indices(size)))
+    return selector.size
+
+
+def nested_levels(usetype, data):
+    """(usetype, useskip) of levels that nest under ADD: every step a stride `step` of the one data set"""
+    return {step: data for step in usetype}, {step: step for step in usetype}
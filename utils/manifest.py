@@ -0,0 +1,126 @@
+import os
+import json
+import hashlib
+import posixpath
+from threading import Lock
+import boto3
+from .sink import Sink
+from .compress import decompress
+
+# ------ Content-hashed outputs and incremental re-upload ---------------
+# - ManifestSink sits in front of the output sink and records the       -
+#   sha256 and size of every artifact in manifest.json, written on      -
+#   close()                                                             -
+# - given the manifest of the previous run (load_manifest), artifacts   -
+#   whose bytes did not change are not written again: a re-run uploads -
+#   only the tiles that changed (writers produce the same bytes for the -
+#   same input, see PointCloud.write_tileset)                           -
+# - hashed=True names tiles <name>.<hash>.<ext> and rewrites the uris   -
+#   of the tileset.json written after them, for immutable CDN/browser   -
+#   caching; tileset.json, czml and logs keep their names               -
+# - artifacts of the previous run that were not written again are only  -
+#   listed (removed()), nothing is deleted                              -
+# ---------------------------------------------------------------------
+
+manifest_name = "manifest.json"
+hashed_extensions = (".pnts", ".glb", ".b3dm")  # <--.3tz archives are named by the czml
+hash_length = 16  # <--hex digits of the sha256 in hashed names
+
+
+def load_manifest(target, name=manifest_name):
+    """artifacts (name to sha256, size and key) of the manifest under a folder or s3://bucket/prefix, {} if none"""
+    if (target.startswith("s3://")):
+        bucket, _, prefix = target.replace("s3://", "", 1).partition("/")
+        key = "{}/{}".format(prefix.rstrip("/"), name) if prefix.strip("/") else name
+        s3 = boto3.client('s3')
+        try:
+            response = s3.get_object(Bucket=bucket, Key=key)
+        except s3.exceptions.NoSuchKey:
+            return {}
+        data = decompress(response["Body"].read(), response.get("ContentEncoding"))
+    else:
+        path = os.path.join(target, name)
+        if (not os.path.exists(path)):
+            return {}
+        with open(path, mode='rb') as infile:
+            data = infile.read()
+    return json.loads(data)["artifacts"]
+
+
+def hashed_name(name, digest):
+    root, extension = posixpath.splitext(name)
+    return "{}.{}{}".format(root, digest[:hash_length], extension)
+
+
+class ManifestSink(Sink):
+    def __init__(self, parent, previous=None, hashed=False, name=manifest_name):
+        """
+        parent: sink the changed artifacts are written to, closed by its owner
+        previous: artifacts of the previous run (see load_manifest), None writes everything
+        hashed: content-hashed tile names
+        """
+        self.parent = parent
+        self.process_safe = False  # <--every artifact must be hashed here
+        self.previous = previous or {}
+        self.hashed = hashed
+        self.name = name
+        self.artifacts = {}
+        self.written = 0
+        self.skipped = 0
+        self.lock = Lock()
+
+
+    def write(self, name, data):
+        data = data.encode() if isinstance(data, str) else data
+        if (posixpath.basename(name) == "tileset.json" and self.hashed):
+            data = self.rename_uris(name, data)
+        digest = hashlib.sha256(data).hexdigest()
+        key = name
+        if (self.hashed and posixpath.splitext(name)[1].lower() in hashed_extensions):
+            key = hashed_name(name, digest)
+        with self.lock:
+            self.artifacts[name] = {"sha256": digest, "size": len(data), "key": key}
+            unchanged = self.previous.get(name, {}).get("sha256") == digest
+            if (unchanged):
+                self.skipped += 1
+            else:
+                self.written += 1
+        if (not unchanged):
+            self.parent.write(key, data)
+
+
+    def rename_uris(self, name, data):
+        """tileset.json bytes with the content uris of tiles written so far replaced by their hashed names"""
+        prefix = posixpath.dirname(name)
+        tileset_json = json.loads(data)
+        if ("implicitTiling" in tileset_json["root"]):
+            raise ValueError("implicit (octree) tilesets address tiles by template, they cannot be hashed")
+        nodes = [tileset_json["root"]]
+        while nodes:
+            node = nodes.pop()
+            if ("content" in node):
+                artifact = self.artifacts.get(posixpath.join(prefix, node["content"]["uri"]))
+                if (artifact is not None):
+                    node["content"] = dict(node["content"], uri=posixpath.relpath(artifact["key"], prefix or "."))
+            nodes.extend(node.get("children", []))
+        return json.dumps(tileset_json).encode()
+
+
+    def removed(self):
+        """artifacts of the previous run this run did not write"""
+        return sorted(set(self.previous) - set(self.artifacts))
+
+
+    def manifest(self):
+        return {"artifacts": dict(sorted(self.artifacts.items())), "hashed": self.hashed}
+
+
+    def flush(self):
+        self.parent.flush()
+
+
+    def close(self):
+        """write manifest.json, the parent is closed by its owner"""
+        self.parent.write(self.name, json.dumps(self.manifest(), indent=1))
+        self.parent.flush()
+        print("{} artifacts written, {} unchanged".format(self.written, self.skipped))
@@ -0,0 +1,262 @@
+import json
+import numpy as np
+from datetime import datetime
+from .tileset import PointCloud, to_rad
+from .sink import MemorySink
+from .pnts import encode_pnts, pad8
+from .spacing import extents, level_errors
+
+# ------ Octree point cloud with 3D Tiles 1.1 implicit tiling ---------
+# - root region is split in half in lon, lat and height per level      -
+# - every node keeps at most `capacity` points, spread evenly over     -
+#   the node; the rest are pushed down to its children (refine ADD),   -
+#   so each point is written exactly once                              -
+# - availability of the nodes is written as subtree files, the viewer  -
+#   only requests nodes inside the view                                -
+# - geometricError: the root's is the spacing of its points (see        -
+#   spacing.level_errors), implicit tiling halves it per level, as the  -
+#   spacing of a node's `capacity` points halves with the node size     -
+# ---------------------------------------------------------------------
+
+content_uri = "content/{level}/{x}/{y}/{z}.pnts"
+subtree_uri = "subtrees/{level}/{x}/{y}/{z}.subtree"
+
+
+def morton3(x, y, z, bits):
+    """interleave x, y, z bits (x lowest) into a Morton index"""
+    index = np.zeros_like(x, dtype=np.int64)
+    for bit in range(bits):
+        index |= ((x >> bit) & 1) << (3 * bit)
+        index |= ((y >> bit) & 1) << (3 * bit + 1)
+        index |= ((z >> bit) & 1) << (3 * bit + 2)
+    return index
+
+
+def bitstream(indices, count):
+    """availability bitstream with bits set at indices (LSB first within each byte)"""
+    bits = np.zeros(count, dtype=np.uint8)
+    bits[indices] = 1
+    return np.packbits(bits, bitorder='little').tobytes()
+
+
+def encode_subtree(tile_bits, tile_count, child_bits, child_count):
+    """
+    Binary .subtree file. Tile and content availability are the same here
+    (every available node has content), so they share one bitstream.
+    """
+    buffer = b""
+    views = []
+    availability = {}
+    for name, indices, count in (("tile", tile_bits, tile_count), ("child", child_bits, child_count)):
+        if (len(indices) == 0 or len(indices) == count):
+            availability[name] = {"constant": int(len(indices) == count)}
+            continue
+        data = bitstream(indices, count)
+        views.append({"buffer": 0, "byteOffset": len(buffer), "byteLength": len(data)})
+        availability[name] = {"bitstream": len(views) - 1, "availableCount": int(len(indices))}
+        buffer += data + b"\0" * pad8(len(data))
+
+    subtree = {
+        "tileAvailability": availability["tile"],
+        "contentAvailability": [availability["tile"]],
+        "childSubtreeAvailability": availability["child"]
+    }
+    if (views):
+        subtree["buffers"] = [{"byteLength": len(buffer)}]
+        subtree["bufferViews"] = views
+
+    text = json.dumps(subtree, separators=(",", ":")).encode()
+    text += b" " * pad8(24 + len(text))
+    header = b"subt" + np.array([1], dtype=np.uint32).tobytes() + \
+             np.array([len(text), len(buffer)], dtype=np.uint64).tobytes()
+    return header + text + buffer
+
+
+class OctreePointCloud(PointCloud):
+    def __init__(self, key, lon, lat, alt, value, time, epoch,
+                 region=None, capacity=65536, subtree_levels=4, max_level=16, sink=None, names=None):
+        super().__init__(key, lon, lat, alt, value, time, epoch, sink=sink, names=names)
+        if (region is None and lon.size > 0):  # <--an empty window has no region and no nodes
+            region = [float(np.min(lon)), float(np.min(lat)), float(np.max(lon)),
+                      float(np.max(lat)), float(np.min(alt)), float(np.max(alt))]
+        self.region = region  # <--in degrees and meters
+        self.capacity = capacity
+        self.subtree_levels = subtree_levels
+        self.max_level = max_level
+        self.available = set()
+
+
+    def options(self):
+        return {"region": self.region, "capacity": self.capacity,
+                "subtree_levels": self.subtree_levels, "max_level": self.max_level,
+                "sink": self.sink if (self.sink.process_safe) else MemorySink(), "names": self.names}
+
+
+    def cells(self, index, level):
+        """node coordinates of points (by index) at a level"""
+        n = 1 << level
+        west, south, east, north, bottom, top = self.region
+        cells = []
+        for coord, low, high in ((self.lon, west, east), (self.lat, south, north), (self.alt, bottom, top)):
+            span = high - low
+            u = (coord[index] - low) / span if span > 0 else np.zeros(index.size)
+            cells.append(np.clip((u * n).astype(np.int64), 0, n - 1))
+        return cells
+
+
+    def build(self):
+        """
+        Assign every point to an octree node, reorder the point arrays so each
+        node's points are contiguous, and schedule one task per node.
+        """
+        active = np.arange(self.lon.size)
+        order = []
+        nodes = []
+        placed_count = 0
+        level = 0
+        while active.size > 0:
+            x, y, z = self.cells(active, level)
+            key = (x << (2 * level)) | (y << level) | z
+            sort = np.argsort(key, kind='stable')  # <--keeps time order within a node
+            active, key, x, y, z = active[sort], key[sort], x[sort], y[sort], z[sort]
+            _, starts, counts = np.unique(key, return_index=True, return_counts=True)
+
+            if (level == self.max_level):
+                keep = np.ones(active.size, dtype=bool)
+            else:
+                count = np.repeat(counts, counts)
+                rank = np.arange(active.size) - np.repeat(starts, counts)
+                # evenly spaced sample of `capacity` points out of each crowded node
+                keep = (count <= self.capacity) | \
+                       ((rank + 1) * self.capacity // count > rank * self.capacity // count)
+
+            placed = active[keep]
+            xk, yk, zk = x[keep], y[keep], z[keep]
+            _, firsts, sizes = np.unique(key[keep], return_index=True, return_counts=True)
+            for first, size in zip(firsts, sizes):
+                node = (level, int(xk[first]), int(yk[first]), int(zk[first]))
+                nodes.append((node, placed_count + first, placed_count + first + size))
+            order.append(placed)
+            placed_count += placed.size
+
+            active = active[~keep]
+            level += 1
+
+        order = np.concatenate(order) if order else np.arange(0)
+        self.lon = self.lon[order]
+        self.lat = self.lat[order]
+        self.alt = self.alt[order]
+        self.value = self.value[order]
+        self.time = self.time[order]
+
+        for node, start, end in nodes:
+            self.schedule_task(node, int(start), int(end))
+
+
+    def encode(self, node, start, end):
+        level, x, y, z = node
+        cartesian, offset, scale, cartographic, region = self.cartographic_to_cartesian(start, end)
+        value = self.value[start:end]
+        time = self.time[start:end]
+        length = len(value)
+
+        feature_table = {
+            "POINTS_LENGTH": length,
+            "BATCH_LENGTH": length,
+            "QUANTIZED_VOLUME_OFFSET": offset,
+            "QUANTIZED_VOLUME_SCALE": scale
+        }
+        feature_arrays = [
+            ("BATCH_ID", np.arange(length, dtype=np.uint32), {"componentType": "UNSIGNED_INT"}),
+            ("POSITION_QUANTIZED", cartesian, {})
+        ]
+        batch_arrays = self.value_arrays(value) + [
+            ("time", time, {"componentType": "FLOAT", "type": "SCALAR"}),
+            ("location", cartographic, {"componentType": "SHORT", "type": "VEC3"})
+        ]
+
+        self.sink.write(content_uri.format(level=level, x=x, y=y, z=z),
+                        encode_pnts(feature_table, feature_arrays, {}, batch_arrays))
+        return node, None
+
+
+    def attach(self, node, refined):
+        self.available.add(node)
+
+
+    def geometric_error(self):
+        """root geometricError: expected spacing of the root node's points, spread as all the points are"""
+        return level_errors(extents(self.lon, self.lat, self.alt), min(self.lon.size, self.capacity), [1])[0]
+
+
+    def write_tileset(self):
+        if (not self.available):
+            return super().write_tileset()  # <--empty window: an explicit tileset without tiles, as the chain tiling
+        levels = 1 + max([node[0] for node in self.available], default=0)
+        by_level = {}
+        for level, x, y, z in self.available:
+            by_level.setdefault(level, []).append((x, y, z))
+        by_level = {level: np.array(coords, dtype=np.int64) for level, coords in by_level.items()}
+
+        # one subtree file for every available node on a subtree boundary
+        for root_level in range(0, levels, self.subtree_levels):
+            for rx, ry, rz in by_level.get(root_level, []):
+                tile_bits, tile_count = [], 0
+                for local in range(self.subtree_levels):
+                    coords = by_level.get(root_level + local)
+                    if (coords is not None):
+                        inside = (coords[:, 0] >> local == rx) & (coords[:, 1] >> local == ry) & \
+                                 (coords[:, 2] >> local == rz)
+                        mask = (1 << local) - 1
+                        c = coords[inside]
+                        morton = morton3(c[:, 0] & mask, c[:, 1] & mask, c[:, 2] & mask, local)
+                        tile_bits.append(tile_count + morton)
+                    tile_count += 8 ** local
+
+                child_level = root_level + self.subtree_levels
+                child_bits = np.arange(0)
+                coords = by_level.get(child_level)
+                if (coords is not None):
+                    s = self.subtree_levels
+                    inside = (coords[:, 0] >> s == rx) & (coords[:, 1] >> s == ry) & (coords[:, 2] >> s == rz)
+                    mask = (1 << s) - 1
+                    c = coords[inside]
+                    child_bits = morton3(c[:, 0] & mask, c[:, 1] & mask, c[:, 2] & mask, s)
+
+                tile_bits = np.concatenate(tile_bits) if tile_bits else np.arange(0)
+                self.sink.write(subtree_uri.format(level=root_level, x=rx, y=ry, z=rz),
+                                encode_subtree(tile_bits, tile_count, child_bits, 8 ** self.subtree_levels))
+
+        west, south, east, north, bottom, top = self.region
+        geometric_error = self.geometric_error()
+        epoch = int(np.min(self.time) + self.epoch - 300) if self.time.size else self.epoch
+        end = int(np.max(self.time) + self.epoch + 300) if self.time.size else self.epoch
+        tileset_json = {
+            "asset": {
+                "version": "1.1",
+                "type": self.tileset_json["asset"]["type"]
+            },
+            "geometricError": geometric_error * 2,
+            "root": {
+                "availability": "{}Z/{}Z".format(datetime.utcfromtimestamp(epoch).isoformat(),
+                                                 datetime.utcfromtimestamp(end).isoformat()),
+                "geometricError": geometric_error,
+                "refine": "ADD",
+                "boundingVolume": {
+                    "region": [west * to_rad, south * to_rad, east * to_rad, north * to_rad, bottom, top]
+                },
+                "content": {
+                    "uri": content_uri
+                },
+                "implicitTiling": {
+                    "subdivisionScheme": "OCTREE",
+                    "subtreeLevels": self.subtree_levels,
+                    "availableLevels": levels,
+                    "subtrees": {
+                        "uri": subtree_uri
+                    }
+                }
+            },
+            "properties": self.tileset_json["properties"]
+        }
+        self.sink.write("tileset.json", json.dumps(tileset_json))
@@ -0,0 +1,84 @@
+import numpy as np
+
+# ------ Tile partitioning of a time-sorted point stream ----------------
+# - a tile is closed as soon as the next point would break one of the   -
+#   budgets: max points, max encoded bytes, max time span (seconds) or  -
+#   max lon/lat extent (degrees)                                        -
+# - bursty data gets short tiles and sparse data long ones, instead of  -
+#   a fixed no. of points or a fixed time window                        -
+# - Partitioner(max_points=530000) gives the old fixed-size tiles       -
+# ---------------------------------------------------------------------
+
+point_bytes = 24  # <--.pnts bytes per point: BATCH_ID 4, POSITION_QUANTIZED 6, value 4, time 4, location 6
+
+
+def chain_bytes(steps=(32, 16, 8, 4, 2, 1), refine="REPLACE"):
+    """encoded bytes per point of a tile's LOD chain (REPLACE stores the coarse levels again)"""
+    if (refine == "ADD"):
+        return point_bytes
+    return point_bytes * sum(1.0 / step for step in steps)
+
+
+class Partitioner:
+    def __init__(self, max_points=530000, max_bytes=None, max_seconds=None, max_extent=None,
+                 bytes_per_point=chain_bytes()):
+        """
+        Budgets of one tile, None for no limit.
+         max_points: no. of points
+         max_bytes: encoded size, as max_bytes / bytes_per_point points
+         max_seconds: time between the first and the last point
+         max_extent: lon or lat span in degrees
+        """
+        self.max_seconds = max_seconds
+        self.max_extent = max_extent
+        self.limit = np.inf if max_points is None else int(max_points)
+        if (max_bytes is not None):
+            self.limit = min(self.limit, max(int(max_bytes // bytes_per_point), 1))
+
+
+    def cut(self, time, lon=None, lat=None):
+        """
+        Length of the first tile of time-sorted arrays, or None when the arrays end before
+        a budget is used up (points still to come may belong to the same tile).
+        """
+        size = np.size(time)
+        if (size == 0):
+            return None
+        length = min(self.limit, size)
+        if (self.max_seconds is not None):
+            length = min(length, int(np.searchsorted(time[:length], time[0] + self.max_seconds, side='right')))
+        if (self.max_extent is not None and lon is not None):
+            length = min(length, self.extent(lon[:length], lat[:length]))
+
+        if (length < size or length == self.limit):
+            return max(length, 1)
+        return None
+
+
+    def extent(self, lon, lat):
+        """no. of leading points whose lon/lat span stays within max_extent"""
+        span = np.maximum(np.maximum.accumulate(lon) - np.minimum.accumulate(lon),
+                          np.maximum.accumulate(lat) - np.minimum.accumulate(lat))
+        over = int(np.argmax(span > self.max_extent))
+        return over if (span[over] > self.max_extent) else span.size
+
+
+    def exceeded(self, count, seconds=0, extent=0):
+        """cheap test whether a buffer of count points spanning seconds/extent holds a full tile"""
+        return (count >= self.limit or
+                (self.max_seconds is not None and seconds > self.max_seconds) or
+                (self.max_extent is not None and extent > self.max_extent))
+
+
+    def split(self, time, lon=None, lat=None):
+        """(start, end) point ranges of the tiles of whole time-sorted arrays"""
+        ranges = []
+        start = 0
+        size = np.size(time)
+        while start < size:
+            length = self.cut(time[start:], None if lon is None else lon[start:],
+                              None if lat is None else lat[start:])
+            end = size if length is None else start + length
+            ranges.append((start, end))
+            start = end
+        return ranges
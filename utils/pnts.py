@@ -0,0 +1,107 @@
+import json
+import numpy as np
+
+header_length = 28
+magic = b"pnts"
+version = 1
+
+component_types = {
+    "BYTE": np.int8,
+    "UNSIGNED_BYTE": np.uint8,
+    "SHORT": np.int16,
+    "UNSIGNED_SHORT": np.uint16,
+    "INT": np.int32,
+    "UNSIGNED_INT": np.uint32,
+    "FLOAT": np.float32,
+    "DOUBLE": np.float64
+}
+
+
+def pad8(n):
+    """no. of bytes needed to bring n up to a multiple of 8"""
+    return -n % 8
+
+
+def padded_json(table, offset):
+    """
+    Minified JSON of a feature/batch table, space padded so that the binary
+    body following it starts on an 8-byte boundary (offset is where the JSON starts)
+    """
+    text = json.dumps(table, separators=(",", ":")).encode()
+    return text + b" " * pad8(offset + len(text))
+
+
+def layout(table, arrays):
+    """
+    Fill in byteOffset of every binary property of a table.
+    arrays: ordered list of (name, array, properties). The stored dtype comes from
+            properties["componentType"] if given, else from the array itself.
+    Return the table and a list of (byteOffset, dtype, array) for the binary body,
+    plus the unpadded binary body length.
+    """
+    table = dict(table)
+    body = []
+    offset = 0
+    for name, array, properties in arrays:
+        dtype = np.dtype(component_types.get(properties.get("componentType"), array.dtype))
+        offset += -offset % dtype.itemsize  # <--keep each property aligned to its component size
+        table[name] = dict(properties, byteOffset=offset)
+        body.append((offset, dtype, array))
+        offset += array.size * dtype.itemsize
+    return table, body, offset
+
+
+def fill(buffer, start, body):
+    """copy each array straight into its slot of the tile buffer (cast on the fly)"""
+    for offset, dtype, array in body:
+        if (array.size == 0): continue
+        view = np.frombuffer(buffer, dtype=dtype, count=array.size, offset=start + offset)
+        np.copyto(view.reshape(array.shape), array, casting='unsafe')
+
+
+def encode_pnts(feature_table, feature_arrays, batch_table=None, batch_arrays=()):
+    """
+    Encode a .pnts tile into one preallocated buffer.
+     feature_table: JSON-only feature table entries, e.g. POINTS_LENGTH, QUANTIZED_VOLUME_OFFSET
+     feature_arrays: ordered (name, array, properties) for the feature table binary, e.g.
+                     ("POSITION_QUANTIZED", cartesian, {})
+     batch_table, batch_arrays: same for the batch table
+    The layout (offsets, JSON padding, tile length) is computed once up front.
+    """
+    feature_table, feature_body, feature_used = layout(feature_table, feature_arrays)
+    batch_table, batch_body, batch_used = layout(batch_table or {}, batch_arrays)
+
+    feature_json = padded_json(feature_table, header_length)
+    feature_start = header_length + len(feature_json)
+    feature_length = feature_used + pad8(feature_start + feature_used)
+
+    if (batch_table):
+        batch_json = padded_json(batch_table, feature_start + feature_length)
+    else:
+        batch_json = b""
+    batch_start = feature_start + feature_length + len(batch_json)
+    batch_length = batch_used + pad8(batch_start + batch_used)
+
+    tile_length = batch_start + batch_length
+
+    buffer = bytearray(tile_length)
+    view = memoryview(buffer)
+    view[0:4] = magic
+    np.frombuffer(buffer, dtype=np.uint32, count=6, offset=4)[:] = [
+        version, tile_length, len(feature_json), feature_length, len(batch_json), batch_length]
+    view[header_length:feature_start] = feature_json
+    fill(buffer, feature_start, feature_body)
+    view[feature_start + feature_used:batch_start - len(batch_json)] = b" " * (feature_length - feature_used)
+    view[batch_start - len(batch_json):batch_start] = batch_json
+    fill(buffer, batch_start, batch_body)
+    view[batch_start + batch_used:tile_length] = b" " * (batch_length - batch_used)
+
+    return buffer
+
+
+def write_pnts(filename, feature_table, feature_arrays, batch_table=None, batch_arrays=()):
+    """encode a .pnts tile and write it out with a single write"""
+    buffer = encode_pnts(feature_table, feature_arrays, batch_table, batch_arrays)
+    with open(filename, mode='wb') as outfile:
+        outfile.write(buffer)
+    return buffer
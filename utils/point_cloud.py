@@ -1,17 +1,61 @@
 import sys
 import os
-import zarr
 import numpy as np
 import json
 import datetime as dt
 from .tileset import PointCloud
+from .stream import read_blocks, stream_tiles
+from .partition import Partitioner
+from .chunk_index import select_ranges, read_ranges, read_values, point_mask, grid_ranges
+from .octree import OctreePointCloud
+from .store import open_store
 
 
 
 to_rad = np.pi / 180.0
 to_deg = 180.0 / np.pi
 
-def generate_point_cloud(variable, epoch, end, zarr_location, point_cloud_folder):
+def generate_point_cloud(variable, epoch, end, zarr_location, point_cloud_folder, mode="thread", processes=None,
+                         tiling="chain", refine="REPLACE", stream=False, bbox=None, value_range=None,
+                         partitioner=None, format="pnts", profile="full", decimator=None,
+                         sink=None, storage_options=None, grids=None):
+    """Generates json pointcloud from a given zarr file input
+
+    Args:
+        variable (string or list): store variable, or a list of them written as one batch attribute
+            each over the same positions (value_range and statistics use the first).
+        epoch (_type_): _description_
+        end (_type_): _description_
+        zarr_location (string): source zarr file.
+        point_cloud_folder (string): destination folder for 3d tile json file.
+        mode (string): "thread" or "process". "process" encodes tiles on a process pool
+            with the point arrays in shared memory.
+        processes (int): no. of worker processes for "process" mode, defaults to all cores.
+        tiling (string): "chain" for the per-tile LOD chains, "octree" for a 3D Tiles 1.1
+            implicit octree (ADD refinement, every point stored once, full profile .pnts, not streamed).
+        refine (string): LOD refinement of the "chain" tiling. "REPLACE" stores the coarse
+            levels again in every finer level, "ADD" stores each point in one level only.
+        stream (bool): read the store one chunk at a time and write tiles as they fill up,
+            so memory stays bounded by a few chunks ("chain" tiling, "thread" mode only).
+        bbox (list): keep points inside [west, south, east, north(, bottom, top)], degrees/meters.
+        value_range (list): keep points with vmin <= value <= vmax (None for an open side).
+            With a chunk index in the store, chunks failing the time/bbox/value tests are skipped.
+        partitioner (Partitioner): tile budgets (points, bytes, seconds, extent) of the "chain"
+            tiling, defaults to 530000 points per tile.
+        format (string): tile content of the "chain" tiling, "pnts", "glb" (glTF points,
+             3D Tiles 1.1) or "draco" (Draco compressed .pnts, needs DracoPy), see tile_format.
+        profile (string): "full" or "compact" (uint16 value/time, no BATCH_ID/location) tile
+            attributes of the "chain" tiling, see compact. value and time are quantized on one grid
+            for the whole tileset (tileset.json properties.grids), see grids.
+        decimator (Decimator): voxel averaged coarse LOD levels of the "chain" tiling instead of
+            strides, see voxel; needs refine "REPLACE".
+        sink (Sink): where tiles and tileset.json go instead of point_cloud_folder, e.g.
+            S3Sink("s3://bucket/prefix") uploads them as they are encoded, see sink.
+        storage_options (dict): fsspec options of an s3:// zarr_location (key, secret,
+            client_kwargs, ...), see store.
+        grids (dict): batch array name ("value" or each variable, "time" in seconds since the
+            store epoch) to the (low, high) of its compact grid, defaults to the chunk index spans.
+    """
 
     #out_key = f"{os.getenv('CRS_OUTPUT_FLIGHT_PATH')}/{shortname}"
     #pc_out_key = f"{output_path}/point_cloud"
@@ -23,49 +67,78 @@ def generate_point_cloud(variable, epoch, end, zarr_location, point_cloud_folder
         pass
     '''
 
-    try:
-        os.mkdir(point_cloud_folder)
-    except:
-        pass
+    if (tiling == "octree" and (stream or format != "pnts" or profile != "full" or decimator is not None)):
+        raise ValueError("the octree tiling writes full profile .pnts from memory, "
+                         "stream/format/profile/decimator are options of the chain tiling")
+    if (stream and mode == "process"):
+        raise ValueError("stream writes tiles as the chunks are read, on threads; "
+                         "mode=\"process\" encodes from the arrays in shared memory")
 
+    if (sink is None):
+        try:
+            os.mkdir(point_cloud_folder)
+        except:
+            pass
 
-    store = zarr.DirectoryStore(zarr_location)
 
-    root = zarr.group(store=store)
+    root = open_store(zarr_location, storage_options)
 
-    chunk_id = root["chunk_id"][:]
-    num_chunks = chunk_id.shape[0]
-    id = np.argmax(chunk_id[:, 1] > epoch) - 1
-    start_id = chunk_id[0 if id < 0 else id, 0]
-    id = num_chunks - np.argmax(chunk_id[::-1, 1] < end)
-    end_id = chunk_id[id, 0] if id < num_chunks else root["time"].size - 1
+    ranges = select_ranges(root, epoch, end, bbox, variable, value_range)
 
     root_epoch = root.attrs["epoch"]
-    location = root["location"][start_id:end_id]
+    names = None if isinstance(variable, str) else list(variable)  # <--(n, k) values, see PointCloud.value_arrays
+    if (profile != "full"):
+        grids = dict(grid_ranges(root, variable, epoch, end) or {}, **(grids or {}))
+
+    if (stream):
+        # walk the store chunk by chunk, tiles are written as they fill up
+        empty = np.zeros(0)
+        point_cloud = PointCloud(point_cloud_folder, empty, empty, empty,
+                                 empty if names is None else np.zeros((0, len(names))), empty, root_epoch,
+                                 refine, format, profile, decimator, sink, names, grids)
+        stream_tiles(point_cloud, read_blocks(root, variable, ranges),
+                     epoch - root_epoch, end - root_epoch, partitioner, bbox=bbox, value_range=value_range)
+        point_cloud.write_tileset()
+        point_cloud.sink.flush()
+        return
+
+    location = read_ranges(root["location"], ranges)
     lon = location[:, 0]
     lat = location[:, 1]
     alt = location[:, 2]
-    value = root["value"][variable][start_id:end_id]
-    time = root["time"][start_id:end_id]
+    value = read_values(root, variable, ranges)
+    time = read_ranges(root["time"], ranges)
 
     epoch = epoch - root_epoch
     end = end - root_epoch
     mask = np.logical_and(time >= epoch, time <= end)
+    if (bbox is not None or value_range is not None):
+        mask &= point_mask(lon, lat, alt, value, bbox, value_range)
     lon = lon[mask]
     lat = lat[mask]
     alt = alt[mask]
     value = value[mask]
     time = time[mask]
 
-    point_cloud = PointCloud(point_cloud_folder, lon, lat, alt, value, time, root_epoch)
-
-    for tile in range(int(np.ceil(time.size / 530000))):
-        start_id = tile * 530000
-        end_id = np.min([start_id + 530000, time.size])
-        point_cloud.schedule_task(tile, start_id, end_id)
-
-    point_cloud.start()
-    point_cloud.join()
+    if (tiling == "octree"):
+        point_cloud = OctreePointCloud(point_cloud_folder, lon, lat, alt, value, time, root_epoch,
+                                       sink=sink, names=names)
+        point_cloud.build()
+    else:
+        point_cloud = PointCloud(point_cloud_folder, lon, lat, alt, value, time, root_epoch,
+                                 refine, format, profile, decimator, sink, names, grids)
+
+        if (partitioner is None):
+            partitioner = Partitioner()
+        for tile, (start_id, end_id) in enumerate(partitioner.split(time, lon, lat)):
+            point_cloud.schedule_task(tile, start_id, end_id)
+
+    if (mode == "process"):
+        point_cloud.run_pool(processes)
+    else:
+        point_cloud.start()
+        point_cloud.join()
+    point_cloud.sink.flush()  # <--uploads still in flight
 
 tileset_json = {
 	"asset": {
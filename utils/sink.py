@@ -0,0 +1,225 @@
+import io
+import os
+import zipfile
+import tempfile
+import boto3
+from collections import deque
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from .compress import put_compressed, threshold
+from .archive import write_index
+
+# ------ Tile sinks ------------------------------------------------------
+# - writers hand every artifact (tiles, tileset.json, czml) to a sink as  -
+#   bytes under a relative name, instead of writing files and uploading -
+#   the folder afterwards                                               -
+# - LocalSink: files under a folder (what the writers always did)       -
+# - S3Sink: put_object straight from memory on a thread pool, so the    -
+#   uploads overlap the encoding; flush() waits for them                -
+# - ArchiveSink: one indexed .3tz archive (see archive), local or       -
+#   uploaded to S3 as a single object on close                          -
+# - MemorySink: a dict, for pool workers and the tile server            -
+# - sink.subfolder(name) writes under name/ of its parent,              -
+#   sink.archive(name) packs into one name.3tz of its parent            -
+# - TeeSink: every artifact to several sinks, e.g. a tileset folder and -
+#   its .3tz copy (CesiumJS loads the folder's tileset.json, a .3tz    -
+#   needs a tile server in front of it, see utils.archive serve)        -
+# -----------------------------------------------------------------------
+
+
+class Sink:
+    process_safe = False  # <--True: pool workers may write to a copy of it themselves
+
+    def write(self, name, data):
+        raise NotImplementedError
+
+
+    def subfolder(self, name):
+        return SubSink(self, name)
+
+
+    def archive(self, name):
+        """sink packing a tileset into the .3tz member name of this sink, written on its close()"""
+        return ArchiveSink(name, parent=self)
+
+
+    def drain(self):
+        """artifacts held in memory since the last drain (MemorySink), name to bytes"""
+        return {}
+
+
+    def flush(self):
+        """wait until everything written so far is stored"""
+
+
+    def close(self):
+        self.flush()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LocalSink(Sink):
+    process_safe = True
+
+    def __init__(self, folder):
+        self.folder = folder
+
+
+    def write(self, name, data):
+        path = os.path.join(self.folder, name)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, mode='wb') as outfile:
+            outfile.write(data.encode() if isinstance(data, str) else data)
+
+
+class MemorySink(Sink):
+    def __init__(self):
+        self.contents = {}
+
+
+    def write(self, name, data):
+        self.contents[name] = data.encode() if isinstance(data, str) else data
+
+
+    def drain(self):
+        contents, self.contents = self.contents, {}
+        return contents
+
+
+class S3Sink(Sink):
+    def __init__(self, s3path, encoding="gzip", threshold=threshold, workers=16):
+        """
+        s3path: s3://bucket/prefix the names are written under
+        encoding: Content-Encoding of the uploads (see compress), None for none
+        """
+        self.bucket, _, prefix = s3path.replace("s3://", "", 1).partition("/")
+        self.prefix = prefix.rstrip("/")
+        self.encoding = encoding
+        self.threshold = threshold
+        self.workers = workers
+        self.s3 = boto3.client('s3')  # <--clients are thread safe, resources are not
+        self.pool = ThreadPoolExecutor(workers)
+        self.pending = deque()
+        self.lock = Lock()
+
+
+    def key(self, name):
+        return "{}/{}".format(self.prefix, name) if self.prefix else name
+
+
+    def write(self, name, data):
+        future = self.pool.submit(put_compressed, self.s3, self.bucket, self.key(name), data, self.encoding,
+                                  self.threshold)
+        with self.lock:
+            self.pending.append(future)
+            oldest = self.pending.popleft() if (len(self.pending) > 4 * self.workers) else None
+        if (oldest is not None):
+            oldest.result()  # <--bounds the tiles held in memory, raises a failed upload
+
+
+    def flush(self):
+        while True:
+            with self.lock:
+                if (not self.pending):
+                    return
+                future = self.pending.popleft()
+            future.result()
+
+
+    def close(self):
+        self.flush()
+        self.pool.shutdown()
+
+
+class ArchiveSink(Sink):
+    def __init__(self, filename, compression=zipfile.ZIP_STORED, parent=None):
+        """
+        names become members of a .3tz archive, its index is written on close
+        filename: a local file or s3://bucket/key, built in a temporary file and uploaded on close,
+                  or the name the archive is written under in the parent sink (built in memory)
+        """
+        self.filename = filename
+        self.parent = parent
+        self.local = filename
+        if (parent is not None):
+            self.local = io.BytesIO()
+        elif (filename.startswith("s3://")):
+            handle, self.local = tempfile.mkstemp(suffix=".3tz")
+            os.close(handle)
+        self.archive = zipfile.ZipFile(self.local, mode='w', compression=compression)
+        self.lock = Lock()
+
+
+    def write(self, name, data):
+        with self.lock:
+            self.archive.writestr(name, data)
+
+
+    def close(self):
+        with self.lock:
+            if (self.archive.fp is None):
+                return
+            write_index(self.archive)
+            self.archive.close()
+        if (self.parent is not None):
+            self.parent.write(self.filename, self.local.getvalue())
+        elif (self.local != self.filename):
+            bucket, _, key = self.filename.replace("s3://", "", 1).partition("/")
+            boto3.client('s3').upload_file(self.local, bucket, key,  # <--multipart for large archives
+                                           ExtraArgs={"ContentType": "application/octet-stream"})
+            os.remove(self.local)
+
+
+class SubSink(Sink):
+    def __init__(self, parent, name):
+        self.parent = parent
+        self.name = name.strip("/")
+        self.process_safe = parent.process_safe
+
+
+    def write(self, name, data):
+        self.parent.write("{}/{}".format(self.name, name), data)
+
+
+    def flush(self):
+        self.parent.flush()
+
+
+    def close(self):
+        """nothing to wait for: the parent is flushed and closed by its owner, so uploads overlap the next tile"""
+
+
+class TeeSink(Sink):
+    def __init__(self, *sinks):
+        self.sinks = sinks
+        self.process_safe = all(sink.process_safe for sink in sinks)
+
+
+    def write(self, name, data):
+        for sink in self.sinks:
+            sink.write(name, data)
+
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def open_sink(target, **kwargs):
+    """sink of a target: an archive (.3tz, local or s3://), s3://bucket/prefix or a folder"""
+    if (target.endswith(".3tz")):
+        return ArchiveSink(target, **kwargs)
+    if (target.startswith("s3://")):
+        return S3Sink(target, **kwargs)
+    return LocalSink(target)
@@ -0,0 +1,61 @@
+import numpy as np
+
+# ------ Data-driven geometricError --------------------------------------
+# - a level's geometricError is the expected spacing (meters) of its     -
+#   points: the viewer refines it once that spacing covers more than the -
+#   maximum screen-space error in pixels                                 -
+# - the spacing comes from the points themselves: their extents along    -
+#   the principal axes of their spread, so a CRS curtain diagonal to the -
+#   meridians spans its track and height (not its bounding box), a GLM   -
+#   layer is flat and LMA sources fill a volume; axes thinner than       -
+#   min_extent do not count                                              -
+# - an LOD level of stride step holds size / step points over the same   -
+#   extents, its spacing grows as step ** (1 / dimensions)              -
+# - nodes without content get the diagonal of their region, so they     -
+#   refine as long as the region is more than a few pixels wide         -
+# ------------------------------------------------------------------------
+
+meter_per_deg = 111000
+to_rad = np.pi / 180.0
+min_extent = 1.0  # <--meters
+max_sample = 100000  # <--points the covariance is computed from
+
+
+def extents(lon, lat, alt):
+    """extents (meters, largest first) of points along the principal axes of their spread"""
+    lon, lat, alt = (np.asarray(array, dtype=np.float64) for array in (lon, lat, alt))
+    if (lon.size < 2):
+        return np.zeros(3)
+    stride = -(-lon.size // max_sample)
+    lon, lat, alt = lon[::stride], lat[::stride], alt[::stride]
+    xyz = np.column_stack([lon * meter_per_deg * np.cos(np.mean(lat) * to_rad), lat * meter_per_deg, alt])
+    variance = np.linalg.eigvalsh(np.cov(xyz, rowvar=False))[::-1]
+    return np.sqrt(12 * np.clip(variance, 0, None))  # <--edge of a uniform spread with that variance
+
+
+def region_extents(region):
+    """(east-west, south-north, bottom-top) size in meters of a region in radians"""
+    if (not region):
+        return np.zeros(3)
+    west, south, east, north, bottom, top = region
+    lat = (south + north) / 2
+    return np.array([(east - west) / to_rad * meter_per_deg * np.cos(lat), (north - south) / to_rad * meter_per_deg,
+                     top - bottom])
+
+
+def point_spacing(extents, count):
+    """expected spacing (meters) of count points spread evenly over extents"""
+    spread = [float(extent) for extent in extents if (extent > min_extent)]
+    if (count <= 0 or not spread):
+        return min_extent
+    return max((np.prod(spread) / count) ** (1.0 / len(spread)), min_extent)
+
+
+def level_errors(extents, size, steps):
+    """geometricError of the LOD levels (strides steps) of size points spread over extents"""
+    return [point_spacing(extents, -(-size // step)) for step in steps]
+
+
+def region_error(region):
+    """geometricError of a node without content: the diagonal (meters) of its region"""
+    return max(float(np.linalg.norm(region_extents(region))), min_extent)
@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import numpy as np
+from .archive import TilesetArchive
+
+# ------ Expected tiles loaded per screen-space error ------------------
+# usage: python -m utils.sse_report <tileset.json, its folder or .3tz> [sse,...] [distance km,...]
+# - offline estimate of the streaming cost of a tileset: the viewer     -
+#   refines a tile while geometricError * height / (2 d tan(fov / 2))   -
+#   exceeds the maximum screen-space error (Cesium's default is 16 px)  -
+# - every tile is taken at camera distance d (no frustum culling, so a  -
+#   view of the whole product); REPLACE loads the refined frontier, ADD -
+#   every tile on the way down                                          -
+# - reports the geometricError per tree depth, then the no. of tiles    -
+#   and bytes of the content loaded for each sse and distance           -
+# ---------------------------------------------------------------------
+
+screen_height = 1080  # <--pixels
+fov = 60.0  # <--vertical field of view, degrees
+sse_list = (16, 8, 4, 2)
+distance_list = (1000, 300, 100, 30, 10)  # <--km
+
+
+def sse_factor(distance, height=screen_height, fov=fov):
+    """pixels per meter of geometricError at distance (meters)"""
+    return height / (2 * distance * np.tan(np.radians(fov) / 2))
+
+
+def loaded(node, factor, sse, refine="REPLACE"):
+    """content uris the viewer ends up loading under node"""
+    refine = node.get("refine", refine)
+    children = node.get("children", [])
+    refines = len(children) > 0 and node["geometricError"] * factor > sse
+    uris = []
+    if ("content" in node and (not refines or refine == "ADD")):
+        uris.append(node["content"]["uri"])
+    if (refines):
+        for child in children:
+            uris.extend(loaded(child, factor, sse, refine))
+    return uris
+
+
+class TilesetSource:
+    def __init__(self, path):
+        """tileset.json and tile sizes of a tileset folder, its tileset.json or a .3tz archive"""
+        self.archive = None
+        if (path.endswith(".3tz")):
+            self.archive = TilesetArchive(path)
+            self.tileset_json = json.loads(self.archive.read("tileset.json"))
+            self.folder = None
+        else:
+            if (os.path.isdir(path)):
+                path = os.path.join(path, "tileset.json")
+            with open(path) as infile:
+                self.tileset_json = json.load(infile)
+            self.folder = os.path.dirname(path)
+
+
+    def size(self, uri):
+        """bytes of a tile, 0 if it is missing"""
+        try:
+            if (self.archive is not None):
+                return self.archive.locate(uri)[1]
+            return os.path.getsize(os.path.join(self.folder, uri))
+        except (KeyError, OSError):
+            return 0
+
+
+def report(source, sse_list=sse_list, distance_list=distance_list, height=screen_height, fov=fov):
+    """rows (sse, distance km, tiles, bytes) of the content loaded"""
+    root = source.tileset_json["root"]
+    sizes = {}
+    rows = []
+    for sse in sse_list:
+        for distance in distance_list:
+            uris = loaded(root, sse_factor(distance * 1000.0, height, fov), sse)
+            for uri in uris:
+                if (uri not in sizes):
+                    sizes[uri] = source.size(uri)
+            rows.append((sse, distance, len(uris), sum(sizes[uri] for uri in uris)))
+    return rows
+
+
+def levels(node, depth=0, found=None):
+    """geometricError range and no. of content tiles per tree depth"""
+    found = {} if (found is None) else found
+    if ("content" in node):
+        low, high, count = found.get(depth, (np.inf, 0.0, 0))
+        found[depth] = (min(low, node["geometricError"]), max(high, node["geometricError"]), count + 1)
+    for child in node.get("children", []):
+        levels(child, depth + 1, found)
+    return found
+
+
+if __name__ == '__main__':
+    source = TilesetSource(sys.argv[1])
+    sse_arg = [float(s) for s in sys.argv[2].split(",")] if (len(sys.argv) > 2) else sse_list
+    distance_arg = [float(d) for d in sys.argv[3].split(",")] if (len(sys.argv) > 3) else distance_list
+    print("root geometricError {:.0f} m".format(source.tileset_json["root"]["geometricError"]))
+    for depth, (low, high, count) in sorted(levels(source.tileset_json["root"]).items()):
+        print("depth {:2d}: {:6d} tiles, geometricError {:.1f} - {:.1f} m".format(depth, count, low, high))
+    print("{:>6} {:>10} {:>8} {:>12}".format("sse", "distance", "tiles", "MB"))
+    for sse, distance, count, size in report(source, sse_arg, distance_arg):
+        print("{:6g} {:8g}km {:8d} {:12.2f}".format(sse, distance, count, size / 2 ** 20))
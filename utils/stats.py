@@ -0,0 +1,106 @@
+import numpy as np
+
+# ------ Per-tile value statistics --------------------------------------
+# - writers put the statistics of a tile's values in the "extras" of     -
+#   its tileset.json node: count, minimum, maximum, mean, percentiles    -
+#   and a coarse histogram (NaN ignored), so a viewer can scale a color  -
+#   ramp or apply a threshold filter without loading the tiles           -
+# - internal nodes (see hierarchy) and the tileset ("extras" next to     -
+#   "asset") carry the merge of the statistics under them: count,        -
+#   minimum, maximum and mean exact, histogram rebinned onto the merged  -
+#   range, percentiles read off that histogram                          -
+# - prune(tileset_json, low, high) drops the subtrees with no value in   -
+#   [low, high] (the archive server applies it to ?value=low,high)       -
+# ------------------------------------------------------------------------
+
+bins = 10
+percentiles = (5, 25, 50, 75, 95)
+
+
+def short(x):
+    """float with 6 significant digits, keeps tileset.json small"""
+    return float("{:.6g}".format(x))
+
+
+def value_stats(value, bins=bins):
+    """statistics of an array of values, {"count": 0} if none is finite"""
+    value = np.asarray(value, dtype=np.float64)
+    value = value[np.isfinite(value)]
+    if (value.size == 0):
+        return {"count": 0}
+    counts, edges = np.histogram(value, bins)
+    return {
+        "count": int(value.size),
+        "minimum": short(value.min()),
+        "maximum": short(value.max()),
+        "mean": short(value.mean()),
+        "percentiles": {str(q): short(p) for q, p in zip(percentiles, np.percentile(value, percentiles))},
+        "histogram": {"edges": [short(edge) for edge in edges], "counts": counts.tolist()}
+    }
+
+
+def merge_stats(stats, bins=bins):
+    """statistics of the union of the values of several statistics (None entries are skipped)"""
+    stats = [s for s in stats if (s and s["count"] > 0)]
+    if (not stats):
+        return {"count": 0}
+    count = sum(s["count"] for s in stats)
+    edges = np.linspace(min(s["histogram"]["edges"][0] for s in stats),
+                        max(s["histogram"]["edges"][-1] for s in stats), bins + 1)
+    counts = np.zeros(bins)
+    for s in stats:
+        cumulative = np.r_[0, np.cumsum(s["histogram"]["counts"])]
+        counts += np.diff(np.interp(edges, s["histogram"]["edges"], cumulative))  # <--spread evenly in a bin
+    cumulative = np.r_[0, np.cumsum(counts)]
+    minimum = min(s["minimum"] for s in stats)
+    maximum = max(s["maximum"] for s in stats)
+    return {
+        "count": count,
+        "minimum": minimum,
+        "maximum": maximum,
+        "mean": short(sum(s["mean"] * s["count"] for s in stats) / count),
+        "percentiles": {str(q): short(np.clip(np.interp(q / 100.0 * cumulative[-1], cumulative, edges),
+                                              minimum, maximum)) for q in percentiles},
+        "histogram": {"edges": [short(edge) for edge in edges], "counts": np.rint(counts).astype(int).tolist()}
+    }
+
+
+def node_stats(node):
+    """statistics in the extras of a tileset.json node, None if it has none"""
+    return node.get("extras", {}).get("statistics")
+
+
+def with_stats(node, stats):
+    """node with stats added to its extras"""
+    return dict(node, extras=dict(node.get("extras", {}), statistics=stats))
+
+
+def overlaps(stats, low=None, high=None):
+    """whether any value of stats may lie in [low, high] (None: unbounded)"""
+    if (stats["count"] == 0):
+        return False
+    return (low is None or stats["maximum"] >= low) and (high is None or stats["minimum"] <= high)
+
+
+def prune_node(node, low, high, inherited=None):
+    """node without the subtrees holding no value in [low, high], None if nothing is left"""
+    stats = node_stats(node) or inherited  # <--levels of a chain share the statistics of its head
+    children = [child for child in (prune_node(child, low, high, stats) for child in node.get("children", []))
+                if (child is not None)]
+    if (not children and node.get("children")):
+        if ("content" not in node or (stats is not None and not overlaps(stats, low, high))):
+            return None
+    elif (not children and stats is not None and not overlaps(stats, low, high)):
+        return None
+    if ("children" in node):
+        node = dict(node, children=children)
+    return node
+
+
+def prune(tileset_json, low=None, high=None):
+    """copy of a tileset.json without the subtrees whose statistics lie outside [low, high]"""
+    root = prune_node(tileset_json["root"], low, high)
+    if (root is None):
+        root = dict(tileset_json["root"], children=[])
+        root.pop("content", None)
+    return dict(tileset_json, root=root)
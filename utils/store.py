@@ -0,0 +1,87 @@
+import zarr
+import numpy as np
+from numcodecs import Blosc, Delta
+from .chunk_index import write_chunk_index
+
+# ------ Ingest zarr stores ----------------------------------------------
+# - every ingest() writes the same layout: location (n, 3), time (int32  -
+#   seconds since the "epoch" attribute), value/<var>, chunk_id and the  -
+#   chunk index; write_store writes it with the options below           -
+# - codec: Blosc zstd or lz4 with byte or bit shuffle (None: zarr's      -
+#   default, lz4 with byte shuffle); time is sorted, delta coding it    -
+#   first leaves runs of small steps that compress to almost nothing    -
+# - chunk: points per block of the chunk index, chunk_id and streaming  -
+# - shard: blocks per zarr chunk, so a store has shard times fewer      -
+#   objects to list and fetch while the chunk index still selects per   -
+#   block (zarr 2 has no sharding codec, a shard is one larger chunk)   -
+# - consolidated: the metadata of every array in one .zmetadata, read   -
+#   once by open_store instead of one request per array                -
+# - a location is a folder or an fsspec URL (s3://bucket/prefix, with  -
+#   s3fs; AWS_ENDPOINT_URL points it at MinIO or moto), so the ingest  -
+#   can write the store where the tiling of another machine reads it,  -
+#   and a re-run of the tiling does not need the raw files again       -
+# ------------------------------------------------------------------------
+
+chunk = 262144  # <--points
+codec = "zstd"
+level = 5
+shuffle = "bit"
+shuffles = {None: Blosc.NOSHUFFLE, "byte": Blosc.SHUFFLE, "bit": Blosc.BITSHUFFLE}
+
+
+def compressor(codec=codec, level=level, shuffle=shuffle):
+    """Blosc compressor of the arrays, None for zarr's default"""
+    if (codec is None):
+        return None
+    return Blosc(cname=codec, clevel=level, shuffle=shuffles[shuffle])
+
+
+def zarr_store(location, storage_options=None):
+    """zarr store of a folder, or of an fsspec URL (storage_options go to its filesystem, e.g. s3fs key/secret)"""
+    if ("://" in location):
+        return zarr.storage.FSStore(location, **(storage_options or {}))
+    return zarr.DirectoryStore(location)
+
+
+def write_store(location, lon, lat, alt, time, values, attrs, chunk=chunk, codec=codec, level=level,
+                shuffle=shuffle, delta=True, shard=1, consolidated=True, storage_options=None):
+    """
+    Write the points of an ingest (time sorted, time in seconds since 1970) as a zarr store at location,
+    replacing what is there. values maps variable name to array, attrs are the store attributes ("epoch"
+    is added last, see complete). Returns the root group.
+    """
+    root = zarr.group(store=zarr_store(location, storage_options), overwrite=True)
+    time = np.asarray(time, dtype=np.int64)
+    size = chunk * shard
+    arrays = {"compressor": compressor(codec, level, shuffle)} if (codec is not None) else {}
+
+    idx = np.arange(0, time.size, chunk)
+    root.array('chunk_id', np.stack([idx, time[idx]], axis=-1).astype(np.int64), chunks=None)
+    root.array('location', np.stack([lon, lat, alt], axis=-1).astype(np.float32), chunks=(size, None), **arrays)
+    z_vars = root.create_group('value')
+    for name, value in values.items():
+        z_vars.array(name, np.asarray(value, dtype=np.float32), chunks=(size), **arrays)
+    write_chunk_index(root, chunk, lon, lat, alt, time, values)
+
+    epoch = int(np.min(time)) if (time.size > 0) else 0
+    filters = [Delta(dtype=np.int32)] if (delta) else None
+    root.array('time', (time - epoch).astype(np.int32), chunks=(size), filters=filters, **arrays)
+
+    root.attrs.put(dict(attrs, epoch=epoch))
+    if (consolidated):
+        zarr.consolidate_metadata(root.store)
+    return root
+
+
+def open_store(location, storage_options=None):
+    """root group of an ingest store, through its consolidated metadata when it has one"""
+    store = zarr_store(location, storage_options)
+    if (".zmetadata" in store):
+        return zarr.open_consolidated(store, mode="r")
+    return zarr.group(store=store)
+
+
+def complete(location, storage_options=None):
+    """whether location holds a finished ingest store (an interrupted write_store has no epoch yet)"""
+    store = zarr_store(location, storage_options)
+    return ".zgroup" in store and "epoch" in zarr.open_group(store, mode="r").attrs
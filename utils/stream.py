@@ -0,0 +1,97 @@
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .chunk_index import point_mask, read_values
+from .partition import Partitioner
+
+# ------ Chunk streaming from an ingest zarr store ----------------------
+# - the store is read one zarr chunk at a time, `workers` chunks ahead  -
+#   (decompression releases the GIL, so the reads overlap)              -
+# - points are cut into tiles as they arrive and a tile is encoded as   -
+#   soon as it is full, so memory is bounded by a few chunks and tiles  -
+#   instead of the whole time window                                    -
+# ---------------------------------------------------------------------
+
+
+def read_blocks(root, variable, ranges, workers=4):
+    """yield (location, value, time) for every zarr chunk of the (start, end) point ranges, in order"""
+    step = root["time"].chunks[0]
+    blocks = []
+    for start_id, end_id in ranges:
+        edges = [start_id] + list(range((start_id // step + 1) * step, end_id, step)) + [end_id]
+        blocks.extend(zip(edges[:-1], edges[1:]))
+
+    def read(start, end):
+        return root["location"][start:end], read_values(root, variable, [(start, end)]), root["time"][start:end]
+
+    with ThreadPoolExecutor(workers) as pool:
+        pending = deque()
+        for start, end in blocks:
+            if (end <= start): continue
+            pending.append(pool.submit(read, start, end))
+            if (len(pending) > workers):
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def stream_tiles(point_cloud, blocks, epoch, end, partitioner=None, workers=4, bbox=None, value_range=None):
+    """
+    Keep the points of each block with epoch <= time <= end (relative to the store epoch),
+    inside bbox and value_range (see chunk_index.point_mask), and hand every tile closed by
+    partitioner (default: 530000 points) to point_cloud.add_tile, `workers` tiles at a time.
+    Tiles are numbered in time order, as in the in-memory path.
+    """
+    if (partitioner is None):
+        partitioner = Partitioner()
+    buffers = []
+    count = 0
+    box = None  # <--lon/lat min/max of the buffered points
+    tile = 0
+    pending = deque()
+    with ThreadPoolExecutor(workers) as pool:
+        for location, value, time in blocks:
+            mask = np.logical_and(time >= epoch, time <= end)
+            if (bbox is not None or value_range is not None):
+                mask &= point_mask(location[:, 0], location[:, 1], location[:, 2], value, bbox, value_range)
+            if (not mask.any()): continue
+            buffers.append((location[mask], value[mask], time[mask]))
+            count += buffers[-1][2].size
+            box = union_box(box, buffers[-1][0])
+
+            while count > 0 and partitioner.exceeded(count, buffers[-1][2][-1] - buffers[0][2][0],
+                                                     max(box[1] - box[0], box[3] - box[2])):
+                location_t, value_t, time_t = [np.concatenate(arrays) for arrays in zip(*buffers)]
+                length = partitioner.cut(time_t, location_t[:, 0], location_t[:, 1])
+                if (length is None):
+                    buffers = [(location_t, value_t, time_t)]
+                    break
+                rest = (location_t[length:], value_t[length:], time_t[length:])
+                buffers = [rest] if rest[2].size else []
+                count = rest[2].size
+                box = union_box(None, rest[0])
+
+                location_t, value_t, time_t = location_t[:length], value_t[:length], time_t[:length]
+                pending.append(pool.submit(point_cloud.add_tile, tile, location_t[:, 0], location_t[:, 1],
+                                           location_t[:, 2], value_t, time_t))
+                tile += 1
+                while len(pending) > workers:
+                    pending.popleft().result()
+
+        if (count > 0):
+            location_t, value_t, time_t = [np.concatenate(arrays) for arrays in zip(*buffers)]
+            pending.append(pool.submit(point_cloud.add_tile, tile, location_t[:, 0], location_t[:, 1],
+                                       location_t[:, 2], value_t, time_t))
+        while pending:
+            pending.popleft().result()
+
+
+def union_box(box, location):
+    """[lon min, lon max, lat min, lat max] of box and the points of location"""
+    if (location.shape[0] == 0):
+        return box
+    lon, lat = location[:, 0], location[:, 1]
+    other = [lon.min(), lon.max(), lat.min(), lat.max()]
+    if (box is None):
+        return other
+    return [min(box[0], other[0]), max(box[1], other[1]), min(box[2], other[2]), max(box[3], other[3])]
@@ -0,0 +1,82 @@
+from .pnts import write_pnts, encode_pnts
+from .glb import write_glb, encode_glb
+from .draco import write_draco_pnts, encode_draco_pnts, DracoPy
+
+# ------ Tile content backends ------------------------------------------
+# - "pnts": 3D Tiles 1.0 point cloud                                    -
+# - "glb":  glTF 2.0 points (KHR_mesh_quantization, meshopt,            -
+#           EXT_structural_metadata), needs a 3D Tiles 1.1 tileset      -
+# - "draco": .pnts with 3DTILES_draco_point_compression (DracoPy)       -
+# - every backend takes write_pnts' arguments, so a writer only picks   -
+#   the file extension and the function; encode_tile returns the bytes  -
+#   instead of writing a file (sinks, tile_server)                      -
+# - register_format adds a backend, e.g. Draco with other bits:         -
+#   bits = {"POSITION": 12, "value": 12}                                -
+#   register_format("draco12", partial(write_draco_pnts, bits=bits),    -
+#                   encoder=partial(encode_draco_pnts, bits=bits))      -
+# - PointCloud writes through a sink, so its formats need the encoder   -
+# ---------------------------------------------------------------------
+
+writers = {
+    "pnts": write_pnts,
+    "glb": write_glb,
+    "draco": write_draco_pnts
+}
+encoders = {
+    "pnts": encode_pnts,
+    "glb": encode_glb,
+    "draco": encode_draco_pnts
+}
+extensions = {
+    "pnts": "pnts",
+    "glb": "glb",
+    "draco": "pnts"
+}
+versions = {
+    "pnts": "1.0",
+    "glb": "1.1",
+    "draco": "1.0"
+}
+
+
+def register_format(name, writer, extension="pnts", version="1.0", encoder=None):
+    """
+    add a tile backend: writer(filename, feature_table, feature_arrays, batch_table, batch_arrays)
+    and optionally its encoder(feature_table, feature_arrays, batch_table, batch_arrays)
+    """
+    writers[name] = writer
+    if (encoder is not None):
+        encoders[name] = encoder
+    extensions[name] = extension
+    versions[name] = version
+
+
+def check_format(format):
+    """raise before any tile is encoded when format is unknown or its package is missing"""
+    if (format not in encoders):
+        raise ValueError("no encoder for tile format {}, one of {}".format(format, sorted(encoders)))
+    if (format == "draco" and DracoPy is None):
+        raise ImportError("DracoPy is needed for Draco compressed tiles, or use format pnts or glb")
+
+
+def tile_filename(tile, step, format="pnts"):
+    return "{}_{}.{}".format(tile, step, extensions[format])
+
+
+def tile_number(filename):
+    """tile of a tile_filename"""
+    return int(filename.split("_")[0])
+
+
+def write_tile(format, filename, feature_table, feature_arrays, batch_table=None, batch_arrays=()):
+    """write one tile's content with the backend of format"""
+    if (format not in writers):
+        raise ValueError("unknown tile format {}, one of {}".format(format, sorted(writers)))
+    return writers[format](filename, feature_table, feature_arrays, batch_table, batch_arrays)
+
+
+def encode_tile(format, feature_table, feature_arrays, batch_table=None, batch_arrays=()):
+    """one tile's content as bytes, with the backend of format"""
+    if (format not in encoders):
+        raise ValueError("no encoder for tile format {}, one of {}".format(format, sorted(encoders)))
+    return encoders[format](feature_table, feature_arrays, batch_table, batch_arrays)
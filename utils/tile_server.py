@@ -0,0 +1,270 @@
+import os
+import sys
+import json
+import numpy as np
+from collections import OrderedDict
+from threading import Lock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from .tileset import PointCloud, primary
+from .sink import MemorySink
+from .chunk_index import select_ranges, read_ranges, read_values, point_mask, grid_ranges
+from .partition import Partitioner
+from .geodetic import region
+from .hierarchy import assemble
+from .stats import value_stats
+from .store import open_store
+
+# ------ On-demand tiles from ingest zarr stores ------------------------
+# usage: python -m utils.tile_server <store.zarr or folder of stores> [port]
+#   GET /<store>/<variable>/tileset.json?epoch=&end=&bbox=&value=&lod=
+#   GET /<store>/<variable>/<tile>_<step>.pnts?<same query>
+# - variable may be a comma separated list: one batch attribute each    -
+#   over the same positions, value filters the first                    -
+# - epoch/end: seconds since 1970, bbox: west,south,east,north(,bottom, -
+#   top), value: min,max (either may be empty), lod: finest stride      -
+#   served, one of PointCloud.steps (1 = full resolution, else 400),    -
+#   format/profile: see tile_format and compact                         -
+# - tileset.json reads the window's points through the chunk index and  -
+#   partitions them, a tile's LOD chain is encoded (PointCloud.encode)  -
+#   the first time one of its levels is requested                       -
+# - encoded tiles are kept in an LRU cache bounded by bytes, windows in  -
+#   an LRU bounded by count                                             -
+# ---------------------------------------------------------------------
+
+cache_bytes = 256 * 2 ** 20
+max_windows = 8
+
+content_types = {
+    "json": "application/json",
+    "pnts": "application/octet-stream",
+    "glb": "model/gltf-binary"
+}
+
+
+class TileCache:
+    def __init__(self, max_bytes=cache_bytes):
+        """least recently used bytes values, evicted once their total size passes max_bytes"""
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if (data is None):
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+
+    def put(self, key, data):
+        with self.lock:
+            if (key in self.entries):
+                self.bytes -= len(self.entries.pop(key))
+            self.entries[key] = data
+            self.bytes += len(data)
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                _, old = self.entries.popitem(last=False)
+                self.bytes -= len(old)
+
+
+class Window:
+    def __init__(self, root, variable, epoch, end, bbox=None, value_range=None, lod=1, partitioner=None,
+                 options=None):
+        """the points of a store with epoch <= time <= end (seconds since 1970), cut into tiles"""
+        if (lod not in PointCloud.steps):
+            raise ValueError("lod {} is not one of the LOD strides {}".format(lod, PointCloud.steps))
+        ranges = select_ranges(root, epoch, end, bbox, variable, value_range)
+        location = read_ranges(root["location"], ranges)
+        value = read_values(root, variable, ranges)
+        time = read_ranges(root["time"], ranges)
+
+        self.epoch = root.attrs["epoch"]
+        mask = np.logical_and(time >= epoch - self.epoch, time <= end - self.epoch)
+        if (bbox is not None or value_range is not None):
+            mask &= point_mask(location[:, 0], location[:, 1], location[:, 2], value, bbox, value_range)
+        self.lon = location[mask, 0]
+        self.lat = location[mask, 1]
+        self.alt = location[mask, 2]
+        self.value = value[mask]
+        self.time = time[mask]
+
+        self.options = dict(options or {}, names=None if isinstance(variable, str) else list(variable))
+        if (self.options.get("profile", "full") != "full"):
+            self.options["ranges"] = grid_ranges(root, variable, epoch, end)  # <--one grid for every tile, see compact
+        self.steps = [step for step in PointCloud.steps if (step >= lod)]
+        self.tiles = (partitioner or Partitioner()).split(self.time, self.lon, self.lat)
+
+
+    def cloud(self, start=0, end=None):
+        cloud = PointCloud(None, self.lon[start:end], self.lat[start:end], self.alt[start:end],
+                           self.value[start:end], self.time[start:end], self.epoch, sink=MemorySink(),
+                           **self.options)
+        cloud.steps = self.steps
+        return cloud
+
+
+    def tileset(self):
+        """tileset.json of the window, no tile is encoded"""
+        cloud = self.cloud()
+        for tile, (start, end) in enumerate(self.tiles):
+            chain, refined = cloud.chain(tile, region(self.lon[start:end], self.lat[start:end], self.alt[start:end]),
+                                         cloud.availability(self.time[start:end]), cloud.geometric_errors(start, end),
+                                         value_stats(primary(self.value[start:end])))
+            cloud.attach(chain, refined)
+        return assemble(cloud.tileset_json)
+
+
+    def render(self, tile):
+        """encoded levels of one tile's LOD chain, filename to bytes"""
+        start, end = self.tiles[tile]
+        cloud = self.cloud(start, end)
+        cloud.encode(tile, 0, end - start)
+        return cloud.sink.contents
+
+
+class TileServer:
+    def __init__(self, stores, cache_bytes=cache_bytes, max_windows=max_windows, partitioner=None,
+                 storage_options=None):
+        """stores: name to store location, storage_options: fsspec options of s3:// ones, see store.open_store"""
+        self.stores = dict(stores)
+        self.storage_options = storage_options
+        self.roots = {}
+        self.cache = TileCache(cache_bytes)
+        self.windows = OrderedDict()
+        self.max_windows = max_windows
+        self.partitioner = partitioner
+        self.lock = Lock()
+
+
+    def root(self, store):
+        if (store not in self.roots):
+            self.roots[store] = open_store(self.stores[store], self.storage_options)
+        return self.roots[store]
+
+
+    def window(self, store, variable, query):
+        """the (cached) Window of a parsed query"""
+        key = (store, variable, tuple(sorted(query.items())))
+        with self.lock:
+            if (key in self.windows):
+                self.windows.move_to_end(key)
+                return self.windows[key]
+
+        root = self.root(store)
+        if (any(name not in root["value"] for name in variable.split(","))):
+            raise KeyError(variable)
+        if ("," in variable):
+            variable = variable.split(",")
+        options = {name: query[name] for name in ("format", "profile") if (name in query)}
+        window = Window(root, variable, query.get("epoch", 0), query.get("end", 2 ** 62), query.get("bbox"),
+                        query.get("value"), query.get("lod", 1), self.partitioner, options)
+        with self.lock:
+            self.windows[key] = window
+            while len(self.windows) > self.max_windows:
+                self.windows.popitem(last=False)
+        return window
+
+
+    def tileset(self, store, variable, query, text=""):
+        """tileset.json bytes, the content uris carry the query text so tiles come from the same window"""
+        tileset_json = self.window(store, variable, query).tileset()
+        if (text):
+            nodes = [tileset_json["root"]]
+            while nodes:
+                node = nodes.pop()
+                if ("content" in node):
+                    node["content"] = {"uri": "{}?{}".format(node["content"]["uri"], text)}
+                nodes.extend(node.get("children", []))
+        return json.dumps(tileset_json).encode()
+
+
+    def tile(self, store, variable, filename, query):
+        """encoded tile bytes, from the cache or by encoding its LOD chain"""
+        key = (store, variable, tuple(sorted(query.items())))
+        data = self.cache.get(key + (filename,))
+        if (data is not None):
+            return data
+
+        window = self.window(store, variable, query)
+        tile = int(filename.split("_")[0])
+        if (not 0 <= tile < len(window.tiles)):
+            raise KeyError(filename)
+        contents = window.render(tile)
+        for name, content in contents.items():
+            self.cache.put(key + (name,), content)
+        return contents[filename]
+
+
+def parse_query(text):
+    """typed query of a tile request, see the usage above"""
+    query = {}
+    for name, value in parse_qsl(text):
+        if (name in ("epoch", "end", "lod")):
+            query[name] = int(value)
+        elif (name == "bbox"):
+            query[name] = tuple(float(v) for v in value.split(","))
+        elif (name == "value"):
+            query[name] = tuple(float(v) if v else None for v in value.split(","))
+        elif (name in ("format", "profile")):
+            query[name] = value
+    return query
+
+
+class TileHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path.strip("/").split("/")
+        if (len(path) != 3):
+            return self.send_error(404)
+        store, variable, filename = path
+        tiles = self.server.tiles
+        try:
+            query = parse_query(url.query)
+            text = urlencode(sorted(parse_qsl(url.query)))
+            if (filename == "tileset.json"):
+                body = tiles.tileset(store, variable, query, text)
+            else:
+                body = tiles.tile(store, variable, filename, query)
+        except (KeyError, IndexError):
+            return self.send_error(404)
+        except ValueError as error:
+            return self.send_error(400, str(error))
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_types.get(filename.rsplit(".", 1)[-1], "application/octet-stream"))
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")  # <--Cesium is served from another origin
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def find_stores(path):
+    """name to location of a store (a folder or an s3:// URL, see store), or of every store in a folder"""
+    if ("://" in path or os.path.exists(os.path.join(path, ".zgroup"))):
+        return {os.path.basename(os.path.normpath(path)).replace(".zarr", ""): path}
+    return {name.replace(".zarr", ""): os.path.join(path, name) for name in sorted(os.listdir(path))
+            if (os.path.exists(os.path.join(path, name, ".zgroup")))}
+
+
+def serve(stores, port=8000, host="127.0.0.1", **kwargs):
+    """serve tiles of stores (name to path) until interrupted"""
+    httpd = ThreadingHTTPServer((host, port), TileHandler)
+    httpd.tiles = TileServer(stores, **kwargs)
+    print("serving {} on http://{}:{}/".format(sorted(stores), host, port))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    httpd.server_close()
+
+
+if __name__ == '__main__':
+    serve(find_stores(sys.argv[1]), *[int(arg) for arg in sys.argv[2:3]])
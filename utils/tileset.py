@@ -3,43 +3,80 @@ import json
 import numpy as np
 from datetime import datetime
 from threading import Thread, Lock
+from queue import Queue, Empty
+from multiprocessing import Pool, shared_memory
+from .tile_format import check_format, encode_tile, tile_filename, tile_number, versions
+from .lod import level_selector
+from .geodetic import cartographic_to_cartesian
+from .hierarchy import assemble, union_region
+from .spacing import extents, level_errors, region_error
+from .stats import value_stats
+from .compact import compact, grid
+from .sink import LocalSink, MemorySink
 
 to_rad = np.pi / 180.0
 to_deg = 180.0 / np.pi
 
 steps = [32, 16, 8, 4, 2, 1]
 
+
+def primary(value):
+    """the first column of multi-variable (n, k) values: the one statistics and value filters use"""
+    return value if (np.ndim(value) == 1) else value[:, 0]
+
+
 class PointCloud:
-    def __init__(self, key, lon, lat, alt, value, time, epoch):
+    steps = steps  # <--LOD strides, coarse to fine
+
+    def __init__(self, key, lon, lat, alt, value, time, epoch, refine="REPLACE", format="pnts", profile="full",
+                 decimator=None, sink=None, names=None, ranges=None):
         self.key = key
         self.lon = lon
         self.lat = lat
         self.alt = alt
         self.time = time
-        self.value = value
+        self.value = value  # <--(n,) or (n, k) columns named by names, see value_arrays
         self.epoch = epoch
-        self.tasks = []
+        self.refine = refine  # <--"REPLACE" or "ADD" (each point stored in one level only)
+        self.format = format  # <--tile content backend, see tile_format
+        check_format(format)  # <--not in a worker thread, where the error would only be printed
+        self.profile = profile  # <--"full" or "compact" attributes, see compact
+        self.ranges = ranges  # <--batch array name to the (low, high) of its compact grid, see compact
+        if (profile != "full" and any(name not in (ranges or {}) for name in (names or ["value"]) + ["time"])):
+            raise ValueError("the {} profile needs the (low, high) grid of value and time, one for every tile "
+                             "(see chunk_index.grid_ranges)".format(profile))
+        self.decimator = decimator  # <--voxel averaged coarse levels instead of strides, see voxel
+        if (decimator is not None and refine == "ADD"):
+            raise ValueError("voxel decimated levels replace their points, they need refine REPLACE")
+        self.sink = sink if (sink is not None) else LocalSink(key)  # <--tiles and tileset.json, see sink
+        self.names = names
+        if (names is not None and (np.ndim(value) != 2 or np.shape(value)[1] != len(names))):
+            raise ValueError("{} value names for values of shape {}".format(len(names), np.shape(value)))
+        self.tasks = Queue()
         self.threads = []
         for i in range(10):
             self.threads.append(Thread(target=self.worker_function))
         self.tileset_lock = Lock()
+        region = []  # <--streamed clouds start empty and grow with add_tile
+        if (lon.size > 0):
+            region = [
+                float(np.min(lon)) * to_rad,
+                float(np.min(lat)) * to_rad,
+                float(np.max(lon)) * to_rad,
+                float(np.max(lat)) * to_rad,
+                float(np.min(alt)),
+                float(np.max(alt))
+            ]
         self.tileset_json = {
         	"asset": {
-        		"version": "1.0",
+        		"version": versions[format],
         		"type": "Airborne Radar"
         	},
         	"root": {
-        		"geometricError": 1000000,
-        		"refine" : "REPLACE",
+        		"geometricError": region_error(region),  # <--see spacing, recomputed by assemble
+        		"refine" : refine,
         		"boundingVolume": {
-                    "region": [
-                        float(np.min(lon)) * to_rad,
-                        float(np.min(lat)) * to_rad,
-                        float(np.max(lon)) * to_rad,
-                        float(np.max(lat)) * to_rad,
-                        float(np.min(alt)) * to_rad,
-                        float(np.max(alt)) * to_rad
-                    ]
+                    "region": region
                 },
                 "children": []
         	},
@@ -48,13 +85,21 @@ class PointCloud:
                 "refined": []
             }
         }
+        if (names is not None):
+            self.tileset_json["properties"]["variables"] = list(names)  # <--batch attributes, first one filtered
+        if (profile != "full"):
+            self.tileset_json["properties"]["grids"] = {name: dict(zip(("offset", "scale"), grid(*span)))
+                                                        for name, span in ranges.items()}
 
 
     def worker_function(self):
-        while len(self.tasks) > 0:
-                tile, start, end = self.tasks.pop()
-                print(tile, start, end)
-                self.generate(tile, start, end)
+        while True:
+            try:
+                tile, start, end = self.tasks.get_nowait()
+            except Empty:
+                return
+            print(tile, start, end)
+            self.generate(tile, start, end)
 
 
     def start(self):
@@ -65,212 +110,218 @@ class PointCloud:
     def join(self):
         for t in self.threads:
             t.join()
-        with open('{}/tileset.json'.format(self.key), mode='w+') as outfile:
-            json.dump(self.tileset_json, outfile)
+        self.write_tileset()
+
+
+    def write_tileset(self):
+        with self.tileset_lock:  # <--tiles finish in any order, the tileset.json of a run must not depend on it
+            self.tileset_json["root"]["children"].sort(key=lambda tile: tile_number(tile["content"]["uri"]))
+            self.tileset_json["properties"]["refined"].sort(key=tile_number)
+        tileset_json = assemble(self.tileset_json)  # <--chains grouped into a balanced tree
+        self.sink.write("tileset.json", json.dumps(tileset_json))
 
 
     def schedule_task(self, tile, start, end):
-        self.tasks.append((tile, start, end))
+        self.tasks.put((tile, start, end))
+
+
+    def run_pool(self, processes=None):
+        """
+        Encode every scheduled tile on a process pool (processes=None uses all cores).
+        lon/lat/alt/value/time are placed in shared memory once; workers only send
+        back the tileset fragment of each tile, merged here in tile order.
+        A sink the workers cannot share (S3, archive) receives the tiles from here.
+        """
+        tasks = []
+        while not self.tasks.empty():
+            tasks.append(self.tasks.get_nowait())
+        tasks.sort()
+
+        blocks = []
+        try:
+            specs = []
+            for array in (self.lon, self.lat, self.alt, self.value, self.time):
+                array = np.ascontiguousarray(array)
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                blocks.append(block)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+                specs.append((block.name, array.shape, array.dtype.str))
+
+            initargs = (type(self), self.key, self.epoch, specs, self.options())
+            with Pool(processes, initializer=attach_shared, initargs=initargs) as pool:
+                for child_tile, refined, contents in pool.imap(encode_shared, tasks):
+                    for name, content in contents.items():
+                        self.sink.write(name, content)
+                    self.attach(child_tile, refined)
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+        self.write_tileset()
+
+
+    def options(self):
+        """extra constructor arguments a pool worker needs to rebuild this writer (a sink it cannot share is a MemorySink)"""
+        return {"refine": self.refine, "format": self.format, "profile": self.profile,
+                "decimator": self.decimator, "sink": self.sink if (self.sink.process_safe) else MemorySink(),
+                "names": self.names, "ranges": self.ranges}
 
 
     def generate(self, tile, start, end):
+        child_tile, refined = self.encode(tile, start, end)
+        with self.tileset_lock:
+            self.attach(child_tile, refined)
+
+
+    def add_tile(self, tile, lon, lat, alt, value, time):
+        """
+        Encode one tile from its own arrays (streaming, the cloud holds no points),
+        and grow the root region to cover it. Safe to call from several threads.
+        """
+        options = dict(self.options(), sink=self.sink)  # <--in this process: the MemorySink swap is for run_pool only
+        piece = type(self)(self.key, lon, lat, alt, value, time, self.epoch, **options)
+        child_tile, refined = piece.encode(tile, 0, len(value))
+        with self.tileset_lock:
+            self.attach(child_tile, refined)
+            root = self.tileset_json["root"]["boundingVolume"]
+            root["region"] = union_region(root["region"], child_tile["boundingVolume"]["region"])
+
+
+    def attach(self, child_tile, refined):
+        self.tileset_json["root"]["children"].append(child_tile)
+        self.tileset_json["properties"]["refined"].append(refined)
+
+
+    def availability(self, time):
+        """"start/end" of a tile's times (relative to the cloud's epoch), 5 minutes either side"""
+        epoch = datetime.utcfromtimestamp(int(np.min(time) + self.epoch - 300))
+        end = datetime.utcfromtimestamp(int(np.max(time) + self.epoch + 300))
+        return "{}Z/{}Z".format(epoch.isoformat(), end.isoformat())
+
+
+    def geometric_errors(self, start, end):
+        """geometricError of each LOD level of a tile: the spacing of its points (see spacing)"""
+        errors = level_errors(extents(self.lon[start:end], self.lat[start:end], self.alt[start:end]), end - start,
+                              self.steps)
+        if (self.decimator is not None):  # <--a voxel averaged level is no finer than its voxels
+            errors = [max(error, float(np.max(self.decimator.size(step)))) if (step > 1) else error
+                      for error, step in zip(errors, self.steps)]
+        return errors
+
+
+    def chain(self, tile, region, availability, errors, statistics=None):
+        """
+        tileset fragment of the LOD chain of one tile, and the uri of its finest level
+         errors: geometricError of each level, statistics: of the tile's values, kept by the chain's first node
+        """
+        if (not self.steps):
+            raise ValueError("no LOD steps, a chain needs at least its finest level")
+        chain = None
+        parent_tile = None
+        for step, error in zip(self.steps, errors):
+            filename = tile_filename(tile, step, self.format)
+            child_tile = {
+                "availability": availability,
+                "geometricError": error,
+                "boundingVolume": {
+                    "region": region
+                },
+                "content": {
+                    "uri": filename
+                },
+                "refine": self.refine
+            }
+            if step == self.steps[-1]:
+                refined = filename
+            else:
+                child_tile["children"] = []
+            if parent_tile is None:
+                chain = child_tile
+                if (statistics is not None):
+                    chain["extras"] = {"statistics": statistics}  # <--see stats
+            else:
+                parent_tile["children"].append(child_tile)
+            parent_tile = child_tile
+        return chain, refined
+
+
+    def encode(self, tile, start, end):
+        """write the LOD chain of one tile, return the chain's tileset fragment and its finest tile"""
         print(tile, start, end)
-        parent_tile = self.tileset_json["root"]
         cartesian, offset, scale, cartographic, region = self.cartographic_to_cartesian(start, end)
 
         value = self.value[start:end]
         time = self.time[start:end]
-
-        epoch = int(np.min(time) + self.epoch - 300)
-        epoch = "{}Z".format(datetime.utcfromtimestamp(epoch).isoformat())
-        end = int(np.max(time) + self.epoch + 300)
-        end = "{}Z".format(datetime.utcfromtimestamp(end).isoformat())
-
-        header_length = 28
-        magic = np.string_("pnts")
-        version = 1
-
-        for step in steps:
-            self.tileset_lock.acquire()
-            try:
-                filename = "{}_{}.pnts".format(tile, step)
-                child_tile = {
-                    "availability": "{}/{}".format(epoch, end),
-                    "geometricError": step * 500,
-                    "boundingVolume": {
-                        "region": region
-                    },
-                    "content": {
-                        "uri": filename
-                    },
-                    "refine": "REPLACE"
-                }
-                if step == 1:
-                    self.tileset_json["properties"]["refined"].append(filename)
-                else:
-                    child_tile["children"] = []
-                parent_tile["children"].append(child_tile)
-                parent_tile = child_tile
-            finally:
-                self.tileset_lock.release()
-
-            tile_length = 0
-            feature_table_binary_byte_length = 0
-            batch_table_binary_byte_length = 0
-            length = value[::step].size
-
-            feature_table_json = {
+        chain, refined = self.chain(tile, region, self.availability(time), self.geometric_errors(start, end),
+                                    value_stats(primary(value)))
+
+        if (self.decimator is not None):
+            meters = cartesian * (np.asarray(scale) / 65535.0)  # <--voxel grid in ECEF meters
+
+        for i, step in enumerate(self.steps):
+            select = level_selector(len(value), step, self.steps[:i], self.refine)
+            if (self.decimator is not None and step > 1):
+                level = self.decimator.level(step, meters, value, time, cartesian, cartographic)
+            else:
+                level = (value[select], time[select], cartesian[select, :], cartographic[select, :])
+            level_value, level_time, level_cartesian, level_cartographic = level
+            length = len(level_value)
+
+            feature_table = {
                 "POINTS_LENGTH": length,
                 "BATCH_LENGTH": length,
-                "BATCH_ID": {
-                    "byteOffset": 0,
-                    "componentType": "UNSIGNED_INT"
-                },
-                "POSITION_QUANTIZED": {
-                    "byteOffset": length * 4
-                },
                 "QUANTIZED_VOLUME_OFFSET": offset,
                 "QUANTIZED_VOLUME_SCALE": scale
             }
+            feature_arrays = [
+                ("BATCH_ID", np.arange(length, dtype=np.uint32), {"componentType": "UNSIGNED_INT"}),
+                ("POSITION_QUANTIZED", level_cartesian, {})
+            ]
+            batch_arrays = self.value_arrays(level_value) + [
+                ("time", level_time, {"componentType": "FLOAT", "type": "SCALAR"}),
+                ("location", level_cartographic, {"componentType": "SHORT", "type": "VEC3"})
+            ]
 
-            batch_table_json = {
-                "value": {
-                    "byteOffset": 0,
-                    "componentType": "FLOAT",
-                    "type": "SCALAR"
-                },
-                "time": {
-                    "byteOffset": length * 4,
-                    "componentType": "FLOAT",
-                    "type": "SCALAR"
-                },
-                "location": {
-                    "byteOffset": length * 8,
-                    "componentType": "SHORT",
-                    "type": "VEC3"
-                }
-            }
+            feature_table, feature_arrays, batch_arrays = compact(feature_table, feature_arrays, batch_arrays,
+                                                                  self.profile, ranges=self.ranges)
+            self.write_content(tile_filename(tile, step, self.format), feature_table, feature_arrays, batch_arrays)
 
-            tile_length += header_length
-
-            feature_table_json_min = json.dumps(feature_table_json, separators=(",", ":")) + "       "
-            feature_table_trim = (tile_length + len(feature_table_json_min)) % 8
-            if feature_table_trim != 0:
-                feature_table_json_min = feature_table_json_min[:-feature_table_trim]
-
-            tile_length += len(feature_table_json_min)
-
-            feature_table_binary_byte_length = length * 4 + length * 3 * 2
-            tile_length += feature_table_binary_byte_length
-            feature_table_padding = tile_length % 8
-            if feature_table_padding != 0:
-                feature_table_padding = 8 - feature_table_padding
-            tile_length += feature_table_padding
-
-            batch_table_json_min = json.dumps(batch_table_json, separators=(",", ":")) + "       "
-            batch_table_trim = (tile_length + len(batch_table_json_min)) % 8
-            if batch_table_trim != 0:
-                batch_table_json_min = batch_table_json_min[:-batch_table_trim]
-
-            tile_length += len(batch_table_json_min)
-
-            batch_table_binary_byte_length = length * 4 * 2 + length * 2 * 3
-            tile_length += batch_table_binary_byte_length
-            batch_table_padding = tile_length % 8
-            if batch_table_padding != 0:
-                batch_table_padding = 8 - batch_table_padding
-            tile_length += batch_table_padding
-
-            with open('{}/{}'.format(self.key, filename), mode='wb+') as outfile:
-                outfile.write(np.string_(magic).tobytes())
-                outfile.write(np.uint32(version).tobytes())
-                outfile.write(np.uint32(tile_length).tobytes())
-                outfile.write(np.uint32(len(feature_table_json_min)).tobytes())
-                outfile.write(np.uint32(feature_table_binary_byte_length + feature_table_padding).tobytes())
-                outfile.write(np.uint32(len(batch_table_json_min)).tobytes())
-                outfile.write(np.uint32(batch_table_binary_byte_length + batch_table_padding).tobytes())
-                outfile.write(np.string_(feature_table_json_min).tobytes())
-                outfile.write(np.arange(length, dtype=np.uint32).tobytes())
-                outfile.write(cartesian[::step, :].tobytes())
-                for _ in range(feature_table_padding):
-                    outfile.write(np.string_(" ").tobytes())
-                outfile.write(np.string_(batch_table_json_min).tobytes())
-                outfile.write(value[::step].astype(np.float32).tobytes())
-                outfile.write(time[::step].astype(np.float32).tobytes())
-                outfile.write(cartographic[::step, :].tobytes())
-                for _ in range(batch_table_padding):
-                    outfile.write(np.string_(" ").tobytes())
-                outfile.seek(0)
+        return chain, refined
 
 
-    def cartographic_to_cartesian(self, start, end):
-        lon = self.lon[start:end]
-        lat = self.lat[start:end]
-        alt = self.alt[start:end]
-        size = lon.size
-
-        cartographic = np.zeros(shape=(size, 3), dtype=np.int16)
-        cartographic[:, 0] = (lon * 32767 / 180).astype(np.int16)
-        cartographic[:, 1] = (lat * 32767 / 180).astype(np.int16)
-        cartographic[:, 2] = (alt / 10).astype(np.int16)
+    def value_arrays(self, value):
+        """
+        batch table entries of the values: "value", or one per column of (n, k) values named by names,
+        all over the same positions, so switching variables in the viewer is a style change
+        """
+        if (self.names is None):
+            return [("value", value, {"componentType": "FLOAT", "type": "SCALAR"})]
+        return [(name, value[:, k], {"componentType": "FLOAT", "type": "SCALAR"}) for k, name in enumerate(self.names)]
 
-        lon = lon * to_rad
-        lat = lat * to_rad
 
-        radiiSquared = np.array([40680631590769, 40680631590769, 40408299984661.445], dtype=np.float64)
+    def write_content(self, filename, feature_table, feature_arrays, batch_arrays):
+        """hand one level's tile to the sink"""
+        self.sink.write(filename, encode_tile(self.format, feature_table, feature_arrays, {}, batch_arrays))
 
-        N1 = np.multiply(np.cos(lat), np.cos(lon))
-        N2 = np.multiply(np.cos(lat), np.sin(lon))
-        N3 = np.sin(lat)
 
-        magnitude = np.sqrt(np.square(N1) + np.square(N2) + np.square(N3))
-
-        N1 = N1 / magnitude
-        N2 = N2 / magnitude
-        N3 = N3 / magnitude
-
-        K1 = radiiSquared[0] * N1
-        K2 = radiiSquared[1] * N2
-        K3 = radiiSquared[2] * N3
-
-        gamma = np.sqrt(np.multiply(N1, K1) + np.multiply(N2, K2) + np.multiply(N3, K3))
-
-        K1 = K1 / gamma
-        K2 = K2 / gamma
-        K3 = K3 / gamma
-
-        N1 = np.multiply(N1, alt)
-        N2 = np.multiply(N2, alt)
-        N3 = np.multiply(N3, alt)
-
-        # x = np.multiply((N1 + K1), np.random.normal(1, .00005, N1.size))
-        # y = np.multiply((N2 + K2), np.random.normal(1, .00005, N1.size))
-        # z = np.multiply((N3 + K3), np.random.normal(1, .00005, N1.size))
-
-        x = N1 + K1
-        y = N2 + K2
-        z = N3 + K3
+    def cartographic_to_cartesian(self, start, end):
+        return cartographic_to_cartesian(self.lon[start:end], self.lat[start:end], self.alt[start:end])
 
-        offset = [float(np.min(x)), float(np.min(y)), float(np.min(z))]
 
-        x = x - offset[0]
-        y = y - offset[1]
-        z = z - offset[2]
+shared_cloud = None
 
-        scale = [float(abs(np.max(x))), float(abs(np.max(y))), float(abs(np.max(z)))]
 
-        cartesian = np.zeros(shape=(size, 3), dtype=np.uint16)
-        cartesian[:, 0] = (x / scale[0] * 65535.0).astype(np.uint16)
-        cartesian[:, 1] = (y / scale[1] * 65535.0).astype(np.uint16)
-        cartesian[:, 2] = (z / scale[2] * 65535.0).astype(np.uint16)
+def attach_shared(cls, key, epoch, specs, options):
+    """pool initializer: map the shared point arrays into a worker-local PointCloud (or subclass)"""
+    global shared_cloud
+    blocks = [shared_memory.SharedMemory(name=name) for name, _, _ in specs]
+    arrays = [np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+              for block, (_, shape, dtype) in zip(blocks, specs)]
+    shared_cloud = cls(key, *arrays, epoch, **options)
+    shared_cloud.blocks = blocks  # <--keep the mappings alive as long as the worker
 
-        region = [
-            float(np.min(lon)),
-            float(np.min(lat)),
-            float(np.max(lon)),
-            float(np.max(lat)),
-            float(np.min(alt)),
-            float(np.max(alt))
-        ]
 
-        return cartesian, offset, scale, cartographic, region
+def encode_shared(task):
+    chain, refined = shared_cloud.encode(*task)
+    return chain, refined, shared_cloud.sink.drain()  # <--tiles a MemorySink held for the parent
@@ -0,0 +1,133 @@
+import json
+from .sink import Sink
+from .hierarchy import assemble, union_availability, union_region
+from .spacing import region_error
+
+# ------ Consolidated time-sliced tilesets ------------------------------
+# - products cut into time windows (60 s lightning tiles, 20 min NPOL    -
+#   volumes) wrote one tileN/tileset.json per window and a CZML packet  -
+#   per tileset, so playback fetched and parsed a tileset per slice     -
+# - TimelineSink sits in front of the output sink: a window's tiles go  -
+#   through to <prefix>/, its tileset.json is kept instead and becomes  -
+#   one child (with the window's availability) of a single tileset.json -
+#   written on close(), windows balanced in time (see hierarchy)        -
+# - the epoch each window's "time" values count from is kept in         -
+#   properties.epochs by prefix, next to properties.refined             -
+# - czml() gives the one-packet CZML referencing it                     -
+# ---------------------------------------------------------------------
+
+
+class TimelineSink(Sink):
+    def __init__(self, parent, instr="Time series", filename="tileset.json"):
+        self.parent = parent
+        self.process_safe = False  # <--tilesets must come back to this process
+        self.instr = instr
+        self.filename = filename
+        self.windows = []
+        self.intervals = {}
+        self.refined = []
+        self.epochs = {}
+        self.properties = None
+        self.version = "1.0"
+
+
+    def subfolder(self, name, availability=None):
+        """sink of one window, availability ("start/end") replaces the one of its tiles"""
+        if (availability):
+            self.intervals[name.strip("/")] = availability
+        return super().subfolder(name)
+
+
+    def write(self, name, data):
+        prefix, _, filename = name.rpartition("/")
+        if (filename == "tileset.json" and prefix):
+            self.add(prefix, json.loads(data))
+        else:
+            self.parent.write(name, data)
+
+
+    def add(self, prefix, tileset_json):
+        """one window's tileset.json, its content uris relative to prefix/"""
+        root = tileset_json["root"]
+        if ("implicitTiling" in root):
+            raise ValueError("implicit (octree) tilesets cannot be consolidated")
+        nodes = [root]
+        while nodes:
+            node = nodes.pop()
+            if ("content" in node):
+                node["content"] = dict(node["content"], uri="{}/{}".format(prefix, node["content"]["uri"]))
+            nodes.extend(node.get("children", []))
+
+        properties = tileset_json.get("properties", {})
+        interval = self.intervals.get(prefix)
+        availability = interval
+        for child in root.get("children", []):
+            if (interval):
+                child["availability"] = interval  # <--on every tile of the window, as the other writers do
+            else:
+                availability = union_availability(availability, child.get("availability"))
+        window = dict(root)
+        if (availability):
+            window["availability"] = availability
+        if ("statistics" in tileset_json.get("extras", {})):
+            window["extras"] = {"statistics": tileset_json["extras"]["statistics"]}  # <--merged by assemble, see stats
+        if ("epoch" in properties):
+            self.epochs[prefix] = properties["epoch"]  # <--"time" batch values count from it
+        self.windows.append(window)
+        self.refined.extend("{}/{}".format(prefix, uri) for uri in properties.get("refined", []))
+        if (self.properties is None):
+            self.properties = {name: value for name, value in properties.items() if (name != "refined")}
+        if (tileset_json["asset"]["version"] > self.version):
+            self.version = tileset_json["asset"]["version"]  # <--glb content needs 3D Tiles 1.1
+
+
+    def availability(self):
+        availability = None
+        for window in self.windows:
+            availability = union_availability(availability, window.get("availability"))
+        return availability
+
+
+    def tileset(self):
+        """the consolidated tileset.json, windows balanced by availability under root"""
+        region = []
+        for window in self.windows:
+            region = union_region(region, window["boundingVolume"]["region"])
+        tileset_json = {
+            "asset": {
+                "version": self.version,
+                "type": self.instr
+            },
+            "root": {
+                "geometricError": region_error(region) if (region) else 0,
+                "refine": "REPLACE",
+                "boundingVolume": {
+                    "region": region
+                },
+                "children": self.windows
+            },
+            "properties": dict(self.properties or {}, refined=self.refined, epochs=self.epochs)
+        }
+        return assemble(tileset_json)
+
+
+    def czml(self, name, uri):
+        """minimal CZML: the document clock and one packet for the consolidated tileset at uri"""
+        availability = self.availability()
+        document = {"id": "document", "name": name, "version": "1.0"}
+        packet = {"id": "tileset", "tileset": {"uri": uri}}
+        if (availability):
+            document["clock"] = {"interval": availability, "currentTime": availability.split("/")[0]}
+            packet["availability"] = availability
+        return [document, packet]
+
+
+    def flush(self):
+        self.parent.flush()
+
+
+    def close(self):
+        """write the consolidated tileset.json, the parent is closed by its owner"""
+        if (self.windows):
+            self.parent.write(self.filename, json.dumps(self.tileset()))
+        self.parent.flush()
@@ -0,0 +1,88 @@
+import numpy as np
+
+# ------ Voxel-grid decimation ------------------------------------------
+# - points are binned into a 3D grid of `size` meters (one edge or one  -
+#   per axis), each occupied voxel gives one point: the mean of the     -
+#   positions (centroid) and of the other arrays, and the mean or max   -
+#   of the value                                                        -
+# - a dense echo core collapses to a few points while sparse echoes     -
+#   keep theirs, unlike a [::step] stride                               -
+# - voxels come out in the order of their first point, so time-sorted   -
+#   input stays (nearly) time-sorted                                    -
+# - Decimator(voxel) grows the edge with the LOD stride: step * voxel   -
+# ---------------------------------------------------------------------
+
+reduces = ("mean", "max")
+
+
+def voxel_groups(points, size):
+    """
+    Group (n, 3) points in meters by voxel.
+    Returns (order, starts, counts): points[order] are grouped by voxel, group i starts at
+    starts[i] and has counts[i] points, groups are in the order of their first point.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    cell = np.floor((points - points.min(axis=0)) / size).astype(np.int64)
+    dims = cell.max(axis=0) + 1
+    key = (cell[:, 0] * dims[1] + cell[:, 1]) * dims[2] + cell[:, 2]
+
+    order = np.argsort(key, kind='stable')
+    key = key[order]
+    boundary = np.r_[True, key[1:] != key[:-1]]
+    group = np.cumsum(boundary) - 1
+    rank = np.empty(group[-1] + 1, dtype=np.int64)
+    rank[np.argsort(order[boundary], kind='stable')] = np.arange(rank.size)  # <--by each voxel's first point
+
+    order = order[np.argsort(rank[group], kind='stable')]
+    counts = np.bincount(rank[group], minlength=rank.size)
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    return order, starts, counts
+
+
+def aggregate(array, order, starts, counts, reduce="mean"):
+    """reduce array over the voxel groups, cast back to its dtype (rounded for integers)"""
+    array = np.asarray(array)
+    if (reduce == "max"):
+        return np.maximum.reduceat(array[order], starts, axis=0)
+    total = np.add.reduceat(array[order].astype(np.float64), starts, axis=0)
+    mean = total / (counts if (total.ndim == 1) else counts[:, None])
+    if (array.dtype.kind in "iu"):
+        mean = np.rint(mean)
+    return mean.astype(array.dtype)
+
+
+def decimate(points, size, value, *arrays, reduce="mean"):
+    """
+    One point per voxel of (n, 3) points in meters.
+    Returns (value, *arrays) aggregated: value by reduce ("mean" or "max"), the
+    other arrays (positions, time, ...) by their mean.
+    """
+    if (reduce not in reduces):
+        raise ValueError("unknown reduce {}, one of {}".format(reduce, reduces))
+    if (np.size(value) == 0):
+        return (value,) + arrays
+    order, starts, counts = voxel_groups(points, size)
+    return ((aggregate(value, order, starts, counts, reduce),) +
+            tuple(aggregate(array, order, starts, counts) for array in arrays))
+
+
+class Decimator:
+    def __init__(self, voxel=125.0, reduce="mean"):
+        """
+        Coarse LOD levels by voxel averaging.
+         voxel: edge in meters (or (x, y, z) edges) at stride 1, a level of stride step uses step * voxel
+         reduce: "mean" or "max" of the value in a voxel
+        """
+        if (reduce not in reduces):
+            raise ValueError("unknown reduce {}, one of {}".format(reduce, reduces))
+        self.voxel = voxel
+        self.reduce = reduce
+
+
+    def size(self, step):
+        return np.asarray(self.voxel, dtype=np.float64) * step
+
+
+    def level(self, step, points, value, *arrays):
+        """(value, *arrays) of the level of stride step, see decimate"""
+        return decimate(points, self.size(step), value, *arrays, reduce=self.reduce)